@@ -0,0 +1,31 @@
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'tests')
+import extract_transactions
+from imap_server import LocalIMAPServer, SyntheticMailbox
+from local_extraction import point_extraction_at
+
+#Mailbox sizes to sync, e.g. python benchmarks/bench_extract.py 10000 100000 1000000
+VOLUMES = [int(arg) for arg in sys.argv[1:]] or [10_000]
+
+print("=== EXTRACTION BENCHMARK (local IMAP stand-in) ===")
+print(f"{'messages':>10} {'seconds':>9} {'msgs/sec':>10} {'MB sent':>9} {'MB recv':>9} {'round-trips':>12}")
+
+for volume in VOLUMES:
+    with tempfile.TemporaryDirectory() as tmp_dir, LocalIMAPServer(SyntheticMailbox(volume)) as server:
+        point_extraction_at(server, Path(tmp_dir))
+
+        #Per-email progress lines would dominate the timing at these volumes
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            extract_transactions.extract_all_transactions()
+        elapsed = time.perf_counter() - start
+
+        stats = server.stats
+        print(f"{volume:>10} {elapsed:>9.2f} {volume / elapsed:>10.0f} {stats['bytes_sent'] / 1e6:>9.2f} "
+              f"{stats['bytes_received'] / 1e6:>9.2f} {stats['round_trips']:>12}")
@@ -0,0 +1,71 @@
+import random
+import sys
+import time
+import pandas as pd
+sys.path.insert(0, 'src/transform')
+sys.path.insert(0, 'tests')
+from feature_pipeline import amount_bucket
+from test_feature_pipeline import per_row_features
+from transform_transactions import load_ml_model
+
+#Batch sizes to featurize, e.g. python benchmarks/bench_feature_pipeline.py 1000 100000
+VOLUMES = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+SINGLE_ROW_ROUNDS = 2000
+
+def synthetic_frame(vocabulary, rows, seed=7):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'merchant_name': [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))) for _ in range(rows)],
+        'amount': [rng.choice([None, 0.0, 4.5, 12.0, 80.25, 420.0]) for _ in range(rows)],
+        'card_name': [rng.choice(['Chase', 'Discover', 'CapitalOne', None]) for _ in range(rows)],
+        'transaction_date': [f"January {rng.randint(1, 28)}, 2025" for _ in range(rows)],
+    })
+
+def rows_per_sec(rows, seconds):
+    return f"{rows / seconds:>12,.0f}"
+
+model, pipeline = load_ml_model()
+vocabulary = sorted(pipeline.vectorizer.vocabulary_)
+
+print("=== FEATURE PIPELINE BENCHMARK (rows/sec) ===")
+frame = synthetic_frame(vocabulary, SINGLE_ROW_ROUNDS)
+records = frame.to_dict('records')
+
+start = time.perf_counter()
+for record in records:
+    per_row_features(pipeline, record)
+legacy = time.perf_counter() - start
+
+start = time.perf_counter()
+for record in records:
+    keys, _ = pipeline.keys([record['merchant_name']], [record['amount']], [record['card_name']],
+                            [record['transaction_date']])
+    pipeline.transform_keys(keys)
+single = time.perf_counter() - start
+
+print(f"{'single row':>12} {'per-row hstack':>15} {rows_per_sec(SINGLE_ROW_ROUNDS, legacy)}")
+print(f"{'single row':>12} {'pipeline':>15} {rows_per_sec(SINGLE_ROW_ROUNDS, single)}")
+
+print(f"\n{'rows':>12} {'per-row hstack':>15} {'pipeline':>12} {'+ predict':>12} {'speedup':>8}")
+for volume in VOLUMES:
+    frame = synthetic_frame(vocabulary, volume)
+
+    #Per-row assembly is only timed on the first 10k rows; it is linear in rows
+    sample = frame.head(10_000).to_dict('records')
+    start = time.perf_counter()
+    for record in sample:
+        per_row_features(pipeline, record)
+    legacy = (time.perf_counter() - start) * volume / len(sample)
+
+    start = time.perf_counter()
+    features = pipeline.transform(frame)
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.predict(features)
+    predict = time.perf_counter() - start
+
+    print(f"{volume:>12,} {rows_per_sec(volume, legacy):>15} {rows_per_sec(volume, batch)} "
+          f"{rows_per_sec(volume, batch + predict)} {legacy / batch:>7.1f}x")
+
+assert amount_bucket(None) == amount_bucket(0) == pipeline.transform(frame.head(1).assign(amount=[None]))[0, -3]
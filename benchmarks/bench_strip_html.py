@@ -0,0 +1,23 @@
+import email
+import sys
+import timeit
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+from email_parser import strip_html_tags, strip_html_tags_slow
+
+FIXTURES = Path('tests/fixtures')
+ROUNDS = 2000
+
+print("=== HTML STRIPPING BENCHMARK ===")
+print(f"{'fixture':25} {'HTMLParser':>12} {'fast path':>12} {'speedup':>8}")
+
+for eml in sorted(FIXTURES.glob('*.eml')):
+    msg = email.message_from_bytes(eml.read_bytes())
+    html = next(part for part in msg.walk() if part.get_content_type() == 'text/html').get_payload(decode=True).decode()
+
+    assert strip_html_tags(html) == strip_html_tags_slow(html), f"Output differs for {eml.name}"
+
+    slow = timeit.timeit(lambda: strip_html_tags_slow(html), number=ROUNDS) / ROUNDS
+    fast = timeit.timeit(lambda: strip_html_tags(html), number=ROUNDS) / ROUNDS
+
+    print(f"{eml.name:25} {slow * 1e6:10.1f}us {fast * 1e6:10.1f}us {slow / fast:7.1f}x")
@@ -124,14 +124,14 @@ def load_top_merchants_mtd():
     engine = get_engine()
     return pd.read_sql("""
         SELECT
-            merchant_name,
+            COALESCE(canonical_merchant, merchant_name) AS merchant_name,
             category,
             COUNT(*) AS visits,
             SUM(amount) AS total_spent
         FROM silver.transactions
         WHERE transaction_date >= DATE_TRUNC('month', CURRENT_DATE)
         AND transaction_date <= CURRENT_DATE
-        GROUP BY merchant_name, category
+        GROUP BY COALESCE(canonical_merchant, merchant_name), category
         ORDER BY total_spent DESC
         LIMIT 10
     """, engine)
@@ -206,7 +206,7 @@ def load_summary_stats():
             SELECT
                 COUNT(*) as total_transactions,
                 SUM(amount) as total_spent,
-                COUNT(DISTINCT merchant_name) as unique_merchants,
+                COUNT(DISTINCT COALESCE(canonical_merchant, merchant_name)) as unique_merchants,
                 MIN(transaction_date) as earliest,
                 MAX(transaction_date) as latest
             FROM silver.transactions
@@ -0,0 +1,33 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temp path to write path's new contents to, then fsync it and rename it over path
+
+    Readers see either the old file or the complete new one, even after a crash.
+    The temp file is hidden (dot-prefixed) so dataset readers scanning the
+    directory skip it, and it is removed if writing fails.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def write_atomic(path, data):
+    """Replace path with data (str or bytes) atomically"""
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+
+def write_json_atomic(path, data, indent=2):
+    """Replace path with data as JSON atomically"""
+    write_atomic(path, json.dumps(data, indent=indent))
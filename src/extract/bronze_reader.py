@@ -0,0 +1,131 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+import pandas as pd
+from bronze_store import BRONZE_DIR, list_bronze_inputs
+from raw_archive import content_hash
+
+#What transform, training and labeling need; everything else (raw_email_data, ids) is left out
+TRANSACTION_FIELDS = ['transaction_date', 'merchant_name', 'amount', 'card_name']
+#What identifies the alert behind a record, for dropping the same alert saved twice
+EMAIL_KEY_FIELDS = ['email_id', 'raw_email_hash']
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+JSON_FILES_PER_CHUNK = 500
+
+def segment_tasks(path, start=0, end=None, chunk_bytes=READ_CHUNK_BYTES):
+    """Split a segment's bytes [start, end) into line-aligned ranges to decode independently
+
+    end defaults to the file size; a torn final line is dropped when the last
+    range is decoded.
+    """
+    end = os.path.getsize(path) if end is None else end
+    tasks = []
+    with open(path, 'rb') as f:
+        while start < end:
+            f.seek(min(start + chunk_bytes, end))
+            if f.tell() < end:
+                f.readline()
+            stop = min(f.tell(), end)
+            tasks.append(('segment', str(path), start, stop))
+            start = stop
+    return tasks
+
+def json_tasks(paths, files_per_chunk=JSON_FILES_PER_CHUNK):
+    """Group legacy per-email JSON files into decode tasks"""
+    paths = [str(path) for path in paths]
+    return [('json', paths[i:i + files_per_chunk]) for i in range(0, len(paths), files_per_chunk)]
+
+def bronze_read_tasks(bronze_dir=BRONZE_DIR, chunk_bytes=READ_CHUNK_BYTES):
+    """Decode tasks covering all of bronze, in the same order as iter_bronze_records"""
+    inputs = list_bronze_inputs(bronze_dir)
+    tasks = json_tasks([path for path in inputs if path.suffix != '.jsonl'])
+    for path in inputs:
+        if path.suffix == '.jsonl':
+            tasks.extend(segment_tasks(path, chunk_bytes=chunk_bytes))
+    return tasks
+
+def _iter_task_records(task):
+    if task[0] == 'json':
+        for path in task[1]:
+            with open(path, 'r') as f:
+                yield json.load(f)
+        return
+
+    _, path, start, end = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    for line in data[:data.rfind(b'\n') + 1].splitlines():
+        yield json.loads(line)
+
+def _field(record, field):
+    """A record's field; legacy JSON records embed the email instead of its hash, so hash it here"""
+    if field == 'raw_email_hash' and record.get('raw_email_hash') is None and record.get('raw_email_data') is not None:
+        return content_hash(record['raw_email_data'])
+    return record.get(field)
+
+def decode_task(task, fields=None):
+    """Decode one task into ({field: values}, row count), keeping only fields (all if None)
+
+    With fields given, each record is projected as soon as it is decoded, so only
+    one full record (email HTML included) is alive at a time. A projected
+    raw_email_hash is filled in for legacy records from their embedded email.
+    """
+    if fields is None:
+        records = list(_iter_task_records(task))
+        fields = list(dict.fromkeys(key for record in records for key in record))
+        return {field: [record.get(field) for record in records] for field in fields}, len(records)
+
+    columns = {field: [] for field in fields}
+    count = 0
+    for record in _iter_task_records(task):
+        for field in fields:
+            columns[field].append(_field(record, field))
+        count += 1
+    return columns, count
+
+def read_bronze_tasks(tasks, fields=None, workers=None):
+    """Decode tasks across a process pool and assemble one DataFrame, in task order
+
+    A single task, or workers=1, is decoded in-process, since a pool only pays
+    off once there is more than one chunk of bronze to decode.
+    """
+    workers = workers or os.cpu_count()
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            parts = list(executor.map(decode_task, tasks, repeat(fields)))
+    else:
+        parts = [decode_task(task, fields) for task in tasks]
+
+    if fields is None:
+        fields = list(dict.fromkeys(field for columns, _ in parts for field in columns))
+    columns = {field: [] for field in fields}
+    for part, count in parts:
+        for field in fields:
+            columns[field].extend(part.get(field, [None] * count))
+    return pd.DataFrame(columns, columns=fields)
+
+def read_bronze(bronze_dir=BRONZE_DIR, fields=None, workers=None, chunk_bytes=READ_CHUNK_BYTES):
+    """Read all of bronze into a DataFrame with one column per field, decoding in parallel
+
+    Pass fields (e.g. TRANSACTION_FIELDS) to keep only those columns; records are
+    projected inside the workers, so large fields like raw_email_data never reach
+    this process. A field a record lacks is None.
+    """
+    return read_bronze_tasks(bronze_read_tasks(Path(bronze_dir), chunk_bytes), fields, workers)
+
+def drop_repeated_emails(records, seen_ids=(), seen_hashes=()):
+    """Keep the first record per alert, dropping any whose email_id or raw_email_hash was already seen
+
+    The same alert reaches bronze twice when an extract is retried, or when mail
+    saved as legacy per-email JSON is fetched again under a UID-based email_id;
+    the body hash catches the second case. seen_ids and seen_hashes are keys
+    already kept downstream. Records missing a key are never matched on it.
+    """
+    repeated = pd.Series(False, index=records.index)
+    for field, seen in zip(EMAIL_KEY_FIELDS, [seen_ids, seen_hashes]):
+        keys = records[field]
+        repeated |= keys.notna() & (keys.duplicated() | keys.isin(seen))
+    return records[~repeated].reset_index(drop=True)
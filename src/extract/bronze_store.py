@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from atomic_write import write_json_atomic
+
+BRONZE_DIR = 'data/bronze'
+SEGMENT_DIR = 'segments'
+MANIFEST_FILE = 'manifest.json'
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+def load_manifest(bronze_dir=BRONZE_DIR):
+    """Load the segment manifest, or an empty one if bronze has no segments yet"""
+    manifest_path = Path(bronze_dir) / MANIFEST_FILE
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    return {'segments': []}
+
+class BronzeWriter:
+    """Appends transactions to rotating JSONL segment files in data/bronze/segments/
+
+    Segments are append-only. manifest.json lists every segment in write order and
+    marks all but the newest as sealed. A crash can at worst leave a torn last line
+    in the open segment, which is trimmed the next time a writer opens it and is
+    skipped by readers. One writer per bronze directory at a time; append() is
+    thread-safe.
+    """
+
+    def __init__(self, bronze_dir=BRONZE_DIR, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.bronze_dir = Path(bronze_dir)
+        self.segment_dir = self.bronze_dir / SEGMENT_DIR
+        self.manifest_path = self.bronze_dir / MANIFEST_FILE
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        self.manifest = None
+        self.segment = None
+        self.file = None
+
+    def _open(self):
+        """Open the newest unsealed segment for appending, recovering it if needed"""
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = load_manifest(self.bronze_dir)
+
+        segments = self.manifest['segments']
+        if segments and not segments[-1]['sealed']:
+            self.segment = segments[-1]
+            self._recover(self.segment_dir / self.segment['name'])
+        else:
+            self._start_segment()
+
+        self.file = open(self.segment_dir / self.segment['name'], 'ab')
+
+    def _recover(self, path):
+        """Trim a torn final line left by a crash and recount the segment"""
+        if not path.exists():
+            path.touch()
+
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+
+        self.segment['records'] = data[:end].count(b'\n')
+        self.segment['bytes'] = end
+
+    def _start_segment(self):
+        """Register a new empty segment in the manifest before any record lands in it"""
+        number = len(self.manifest['segments']) + 1
+        self.segment = {'name': f"segment-{number:06d}.jsonl", 'records': 0, 'bytes': 0, 'sealed': False}
+        self.manifest['segments'].append(self.segment)
+        write_json_atomic(self.manifest_path, self.manifest)
+
+    def _rotate(self):
+        """Seal the current segment and start the next one"""
+        self._sync()
+        self.file.close()
+
+        self.segment['sealed'] = True
+        self._start_segment()
+        self.file = open(self.segment_dir / self.segment['name'], 'ab')
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, transaction, email_id):
+        """Append one transaction record to the open segment and return the record written"""
+        record = {
+            'email_id': email_id,
+            'extracted_at': datetime.now().isoformat(timespec='seconds'),
+            **transaction
+        }
+        line = (json.dumps(record) + '\n').encode()
+
+        with self.lock:
+            if self.file is None:
+                self._open()
+            if self.segment['bytes'] and self.segment['bytes'] + len(line) > self.max_segment_bytes:
+                self._rotate()
+
+            self.file.write(line)
+            self.segment['records'] += 1
+            self.segment['bytes'] += len(line)
+
+        return record
+
+    def flush(self):
+        """Make every appended record durable (one fsync) and update the manifest"""
+        with self.lock:
+            if self.file is None:
+                return
+            self._sync()
+            write_json_atomic(self.manifest_path, self.manifest)
+
+    def close(self):
+        """Flush and close the open segment"""
+        self.flush()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def iter_segment(path):
+    """Stream records from one segment file, skipping a torn final line"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            yield json.loads(line)
+
+def list_bronze_inputs(bronze_dir=BRONZE_DIR):
+    """Return bronze input files in read order: legacy per-email JSON files, then segments"""
+    bronze_dir = Path(bronze_dir)
+    inputs = [path for path in sorted(bronze_dir.glob("*.json")) if path.name != MANIFEST_FILE]
+
+    for segment in load_manifest(bronze_dir)['segments']:
+        path = bronze_dir / SEGMENT_DIR / segment['name']
+        if path.exists():
+            inputs.append(path)
+
+    return inputs
+
+def iter_bronze_records(bronze_dir=BRONZE_DIR):
+    """Stream every bronze transaction: legacy per-email JSON files, then segments in order"""
+    for path in list_bronze_inputs(bronze_dir):
+        if path.suffix == '.jsonl':
+            yield from iter_segment(path)
+        else:
+            with open(path, 'r') as f:
+                yield json.load(f)
@@ -1,5 +1,8 @@
 import re
 from datetime import datetime 
+from email.utils import parseaddr
+from functools import lru_cache
+from html import unescape
 from html.parser import HTMLParser
 
 class MLStripper(HTMLParser):
@@ -18,143 +21,201 @@ class MLStripper(HTMLParser):
     def get_data(self):
         return ''.join(self.text)
     
-def strip_html_tags(html):
-    """Remove HTML tagas from a string"""
+# One alternative per markup construct HTMLParser recognizes. script/style bodies are
+# CDATA to HTMLParser, so they are captured and kept verbatim instead of unescaped.
+# An unclosed script/style tag matches nothing, which sends the document to the slow path.
+# Start tags only match when every quote opens an attribute value and no '<' or quoted
+# '>' appears inside; HTMLParser's recovery from those differs, so they go slow too.
+MARKUP_PATTERN = re.compile(r"""
+      <(?P<cdata_tag>script|style)(?=[\t\n\r\f\x20/>])(?:[^>"'=<]++|=\s*+(?:"[^">]*+"|'[^'>]*+')?)*+(?<!/)>
+        (?P<cdata>.*?)</\s*(?P=cdata_tag)\s*>
+    | <!--.*?--\s*>
+    | </[a-zA-Z][^>]*+>
+    | <(?!(?:script|style)[\t\n\r\f\x20/>])[a-zA-Z](?:[^>"'=<]++|=\s*+(?:"[^">]*+"|'[^'>]*+')?)*+>
+    | <(?:script|style)(?=[\t\n\r\f\x20/>])(?:[^>"'=<]++|=\s*+(?:"[^">]*+"|'[^'>]*+')?)*+(?<=/)>
+    | <!(?!--|\[)[^>]*+>
+    | <\?[^>]*+>
+""", re.DOTALL | re.IGNORECASE | re.VERBOSE)
+
+TRAILING_ENTITY_END = re.compile(r'[\s;]')
+
+def strip_html_tags_slow(html):
+    """Remove HTML tags with HTMLParser (reference implementation)"""
     s = MLStripper()
     s.feed(html)
     return s.get_data()
-    
-class DiscoverParser:
-    """Parser for Discover card transaction emails"""
 
-    def __init__(self):
-        self.card_name = "Discover"
-
-    def can_parse(self, email_from, email_subject):
-        """Check if this email is a Discover transaction"""
-        return email_from == 'Discover Card <discover@services.discover.com>' and email_subject == 'Transaction Alert'
+def strip_html_tags(html):
+    """Remove HTML tags from a string
+
+    A single regex split over the markup, producing what MLStripper does (checked
+    against it on randomized input). Anything the fast path doesn't model (a stray
+    '<', an unclosed tag, comment or script/style block, a malformed quote in a
+    tag) falls back to HTMLParser.
+    """
+    pieces = MARKUP_PATTERN.split(html)
+    chunks = pieces[0::3]
+    cdata = pieces[2::3]
+
+    if '<' in ''.join(chunks):
+        return strip_html_tags_slow(html)
+
+    #HTMLParser holds back trailing text that might end in a half-fed entity
+    trailing = chunks.pop()
+    ampersand = html.rfind('&', max(len(html) - len(trailing), len(html) - 34))
+    if ampersand >= 0 and not TRAILING_ENTITY_END.search(html, ampersand):
+        trailing = ''
+
+    text = [None] * (len(chunks) * 2 + 1)
+    text[0:-1:2] = [unescape(chunk) for chunk in chunks]
+    text[1::2] = [block or '' for block in cdata]
+    text[-1] = unescape(trailing)
+    return ''.join(text)
+
+def get_email_body(msg):
+    """Extract email body from message (handles multipart)"""
+    email_body_text = None 
+    email_body_html = None 
+
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type == "text/plain":
+                email_body_text = part.get_payload(decode=True).decode()
+            elif content_type == "text/html":
+                email_body_html = part.get_payload(decode=True).decode()
+    else: 
+        email_body = msg.get_payload(decode=True).decode()
+        if msg.get_content_type() == "text/plain":
+            email_body_text = email_body 
+        else: 
+            email_body_html = email_body
     
-    def parse(self, email_body):
-        """Extract transaction data from email body"""
-        
-        clean_body = strip_html_tags(email_body)
-
-        merchant_name = None 
-        transaction_date = None 
-        amount = None
-
-        #Extract merchant name
-        merchant_match = re.search(r'Merchant:\s*(.+)', clean_body)
-        if merchant_match:
-            merchant_name = merchant_match.group(1).strip()
-
-        #Extract transaction date    
-        date_match = re.search(r'Date:\s*(.+)', clean_body)
-        if date_match:
-            transaction_date = date_match.group(1).strip()
-
-        #Extract amount    
-        amount_match = re.search(r'\$(\d+\.\d{2})', clean_body)
-        if amount_match:
-            amount = float(amount_match.group(1))
-
-        #Build the transaction dictionary with the extracted values
-        transaction = {
-            'card_name':self.card_name,
-            'merchant_name': merchant_name,
-            'transaction_date': transaction_date,
-            'amount': amount,
-            'raw_email_data': email_body
-        }
-
-        return transaction
-
-class ChaseParser:
-    """Parser for Chase card transaction emails"""
-
-    def __init__(self):
-        self.card_name = "Chase"
+    return email_body_html if email_body_html else email_body_text
+
+@lru_cache(maxsize=256)
+def normalize_sender(email_from):
+    """Reduce a From header to its lowercased address, e.g. 'chase <A@B.com>' -> 'a@b.com'"""
+    return parseaddr(email_from or '')[1].lower()
+
+def field_pattern(**fields):
+    """Compile one pattern that captures every field in a single match() call
+
+    Each field regex is wrapped in its own optional lookahead, so fields can appear
+    in any order and a missing field just leaves its group as None. Within a
+    lookahead the field is found exactly where re.search would find it.
+    """
+    lookaheads = ''.join(f'(?=(?:.*?{regex})?)' for regex in fields.values())
+    return re.compile(lookaheads, re.DOTALL)
+
+class TransactionParser:
+    """Base class for card transaction email parsers
+
+    Subclasses declare card_name, sender (the normalized From address), the
+    alert subject as either subject (exact) or subject_prefix, and a
+    precompiled pattern with merchant_name, transaction_date and amount groups.
+    """
+    card_name = None
+    sender = None
+    subject = None
+    subject_prefix = None
+    pattern = None
+
+    def matches_subject(self, email_subject):
+        """Check if the subject is a transaction alert for this sender"""
+        if self.subject is not None:
+            return email_subject == self.subject
+        return self.subject_prefix is not None and email_subject.startswith(self.subject_prefix)
 
     def can_parse(self, email_from, email_subject):
-        """Check if this email is a Chase transaction"""
-        return email_from == 'Chase <no.reply.alerts@chase.com>' and email_subject.startswith('You made a')
-    
+        """Check if this email is a transaction from this card"""
+        return normalize_sender(email_from) == self.sender and self.matches_subject(email_subject or '')
+
     def parse(self, email_body):
         """Extract transaction data from email body"""
         
         clean_body = strip_html_tags(email_body)
+        fields = self.pattern.match(clean_body)
 
-        merchant_name = None 
-        transaction_date = None 
-        amount = None
-
-        #Extract merchant name
-        merchant_match = re.search(r'Merchant\s*(.+)', clean_body)
-        if merchant_match:
-            merchant_name = merchant_match.group(1).strip()
-
-        #Extract transaction date    
-        date_match = re.search(r'Date\s*(.+)', clean_body)
-        if date_match:
-            transaction_date = date_match.group(1).strip()
-
-        #Extract amount    
-        amount_match = re.search(r'\$(\d+\.\d{2})', clean_body)
-        if amount_match:
-            amount = float(amount_match.group(1))
+        merchant_name = fields['merchant_name']
+        transaction_date = fields['transaction_date']
+        amount = fields['amount']
 
         #Build the transaction dictionary with the extracted values
         transaction = {
             'card_name':self.card_name,
-            'merchant_name': merchant_name,
-            'transaction_date': transaction_date,
-            'amount': amount,
+            'merchant_name': merchant_name.strip() if merchant_name else None,
+            'transaction_date': transaction_date.strip() if transaction_date else None,
+            'amount': float(amount) if amount else None,
             'raw_email_data': email_body
         }
 
         return transaction
 
-class CapitalOneParser:
+class DiscoverParser(TransactionParser):
+    """Parser for Discover card transaction emails"""
+    card_name = "Discover"
+    sender = 'discover@services.discover.com'
+    subject = 'Transaction Alert'
+    pattern = field_pattern(
+        merchant_name=r'Merchant:\s*(?P<merchant_name>[^\n]+)',
+        transaction_date=r'Date:\s*(?P<transaction_date>[^\n]+)',
+        amount=r'\$(?P<amount>\d+\.\d{2})',
+    )
+
+class ChaseParser(TransactionParser):
+    """Parser for Chase card transaction emails"""
+    card_name = "Chase"
+    sender = 'no.reply.alerts@chase.com'
+    subject_prefix = 'You made a'
+    pattern = field_pattern(
+        merchant_name=r'Merchant\s*(?P<merchant_name>[^\n]+)',
+        transaction_date=r'Date\s*(?P<transaction_date>[^\n]+)',
+        amount=r'\$(?P<amount>\d+\.\d{2})',
+    )
+
+class CapitalOneParser(TransactionParser):
     """Parser for CapitalOne card transaction emails"""
-
-    def __init__(self):
-        self.card_name = "CapitalOne"
-
-    def can_parse(self, email_from, email_subject):
-        """Check if this email is a CapitalOne transaction"""
-        return email_from == '"Capital One | Savor" <capitalone@notification.capitalone.com>' and email_subject == 'A new transaction was charged to your account'
-    
-    def parse(self, email_body):
-        """Extract transaction data from email body"""
-        
-        clean_body = strip_html_tags(email_body)
-
-        merchant_name = None 
-        transaction_date = None 
-        amount = None
-
-        #Extract merchant name
-        merchant_match = re.search(r', at (.+?), a pending', clean_body)
-        if merchant_match:
-            merchant_name = merchant_match.group(1).strip()
-
-        #Extract transaction date    
-        date_match = re.search(r'on (.+?), at', clean_body)
-        if date_match:
-            transaction_date = date_match.group(1).strip()
-
-        #Extract amount    
-        amount_match = re.search(r'amount of \$(\d+\.\d{2})', clean_body)
-        if amount_match:
-            amount = float(amount_match.group(1))
-
-        #Build the transaction dictionary with the extracted values
-        transaction = {
-            'card_name':self.card_name,
-            'merchant_name': merchant_name,
-            'transaction_date': transaction_date,
-            'amount': amount,
-            'raw_email_data': email_body
-        }
-
-        return transaction
\ No newline at end of file
+    card_name = "CapitalOne"
+    sender = 'capitalone@notification.capitalone.com'
+    subject = 'A new transaction was charged to your account'
+    pattern = field_pattern(
+        merchant_name=r', at (?P<merchant_name>[^\n]+?), a pending',
+        transaction_date=r'on (?P<transaction_date>[^\n]+?), at',
+        amount=r'amount of \$(?P<amount>\d+\.\d{2})',
+    )
+
+class ParserRegistry:
+    """Routes emails to parsers by normalized sender address, then subject
+
+    Lookup is a single dict hit per email no matter how many issuers are registered.
+    """
+
+    def __init__(self, parsers=()):
+        self.parsers_by_sender = {}
+        for parser in parsers:
+            self.register(parser)
+
+    def register(self, parser):
+        """Add a parser under its sender address"""
+        self.parsers_by_sender.setdefault(parser.sender, []).append(parser)
+
+    @property
+    def senders(self):
+        """Sender addresses with at least one registered parser"""
+        return list(self.parsers_by_sender)
+
+    def find_parser(self, email_from, email_subject):
+        """Return the parser that handles this sender/subject, or None"""
+        for parser in self.parsers_by_sender.get(normalize_sender(email_from), ()):
+            if parser.matches_subject(email_subject or ''):
+                return parser
+        return None
+
+    def parser_for_card(self, card_name):
+        """Return the parser that produces transactions for card_name, or None"""
+        for parsers in self.parsers_by_sender.values():
+            for parser in parsers:
+                if parser.card_name == card_name:
+                    return parser
+        return None
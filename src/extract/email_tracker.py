@@ -1,26 +1,268 @@
-import os 
+import os
+import json
+import sqlite3
+import threading
+from atomic_write import write_atomic, write_json_atomic
 
-class EmailTracker:
-    """Tracks which emails have been processed to avoid duplicates"""
-    
-    def __init__(self, tracker_file='data/processed_emails.txt'):
-       self.tracker_file = tracker_file
-       self.processed_ids = self._load_processed_ids()
+TRACKER_BACKEND = os.getenv('EMAIL_TRACKER_BACKEND', 'sqlite')
+QUERY_CHUNK_SIZE = 500  # stay under SQLite's bound-parameter limit
+
+def split_email_id(email_id):
+    """Split a '<uidvalidity>-<uid>' tracker ID into ints, or (None, None) for legacy IDs"""
+    uidvalidity, _, uid = email_id.partition('-')
+    if uid and uidvalidity.isdigit() and uid.isdigit():
+        return int(uidvalidity), int(uid)
+    return None, None
+
+def is_covered(email_id, checkpoints):
+    """Check if a checkpoint already guarantees this email will never be fetched again"""
+    uidvalidity, uid = split_email_id(email_id)
+    if uidvalidity is None:
+        return True
+    last_uids = [c['last_uid'] for c in checkpoints.values() if c['uidvalidity'] == uidvalidity]
+    #IDs from a UIDVALIDITY no mailbox uses any more are dead too
+    return not last_uids or uid <= max(last_uids)
+
+class SQLiteTrackerBackend:
+    """Processed IDs and sync checkpoints in an indexed SQLite database
+
+    Runs in WAL mode with synchronous=NORMAL, so each batch commit is a cheap
+    append to the log and the fsync happens once at checkpoint/close.
+    """
+
+    def __init__(self, db_file='data/processed_emails.db', legacy_tracker_file='data/processed_emails.txt',
+                 legacy_checkpoint_file='data/sync_checkpoints.json'):
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS processed_emails (
+                    email_id TEXT PRIMARY KEY,
+                    uidvalidity INTEGER,
+                    uid INTEGER
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                    mailbox TEXT PRIMARY KEY,
+                    uidvalidity INTEGER NOT NULL,
+                    last_uid INTEGER NOT NULL
+                )
+            """)
+        self._migrate(legacy_tracker_file, legacy_checkpoint_file)
+
+    def _migrate(self, legacy_tracker_file, legacy_checkpoint_file):
+        """Import the old text-file tracker and JSON checkpoints once"""
+        if legacy_tracker_file and os.path.exists(legacy_tracker_file):
+            with open(legacy_tracker_file, 'r') as f:
+                self.add_many([line.strip() for line in f if line.strip()])
+            os.replace(legacy_tracker_file, f"{legacy_tracker_file}.migrated")
+
+        if legacy_checkpoint_file and os.path.exists(legacy_checkpoint_file):
+            with open(legacy_checkpoint_file, 'r') as f:
+                for mailbox, checkpoint in json.load(f).items():
+                    self.set_checkpoint(mailbox, checkpoint['uidvalidity'], checkpoint['last_uid'])
+            os.replace(legacy_checkpoint_file, f"{legacy_checkpoint_file}.migrated")
+
+    def contains_many(self, email_ids):
+        """Return the subset of email_ids already marked processed"""
+        email_ids = list(email_ids)
+        found = set()
+        with self.lock:
+            for start in range(0, len(email_ids), QUERY_CHUNK_SIZE):
+                chunk = email_ids[start:start + QUERY_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT email_id FROM processed_emails WHERE email_id IN ({placeholders})", chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def add_many(self, email_ids):
+        """Mark email_ids processed in a single transaction"""
+        rows = [(email_id, *split_email_id(email_id)) for email_id in email_ids]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO processed_emails VALUES (?, ?, ?)", rows)
+
+    def load_checkpoints(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT mailbox, uidvalidity, last_uid FROM sync_checkpoints")
+            return {mailbox: {'uidvalidity': uidvalidity, 'last_uid': last_uid} for mailbox, uidvalidity, last_uid in rows}
+
+    def set_checkpoint(self, mailbox, uidvalidity, last_uid):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_checkpoints VALUES (?, ?, ?)", (mailbox, uidvalidity, last_uid)
+            )
+
+    def compact(self, checkpoints):
+        """Drop IDs the checkpoints already cover"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM processed_emails WHERE uidvalidity IS NULL")
+            valid = [c['uidvalidity'] for c in checkpoints.values()]
+            placeholders = ','.join('?' * len(valid))
+            self.conn.execute(f"DELETE FROM processed_emails WHERE uidvalidity NOT IN ({placeholders})", valid)
+            for checkpoint in checkpoints.values():
+                self.conn.execute(
+                    "DELETE FROM processed_emails WHERE uidvalidity = ? AND uid <= ?",
+                    (checkpoint['uidvalidity'], checkpoint['last_uid'])
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.close()
+
+class FileTrackerBackend:
+    """Processed IDs in an append-only text log, checkpoints in a JSON file
+
+    Appends are buffered and written once per batch; the log is fsynced on close
+    and rewritten by compact() so it only holds IDs the checkpoints don't cover.
+    """
+
+    def __init__(self, tracker_file='data/processed_emails.txt', checkpoint_file='data/sync_checkpoints.json'):
+        os.makedirs(os.path.dirname(tracker_file) or '.', exist_ok=True)
+        self.tracker_file = tracker_file
+        self.checkpoint_file = checkpoint_file
+        self.lock = threading.Lock()
+        self.processed_ids = self._load_processed_ids()
+        self.log = open(tracker_file, 'a')
 
     def _load_processed_ids(self):
-        """Load previously processed email IDs from file"""
-        if os.path.exists(self.tracker_file):
-            with open(self.tracker_file, 'r') as f:
-                return set(line.strip() for line in f)
-        return set() 
-    
+        """Load previously processed email IDs from file, trimming a torn last line"""
+        if not os.path.exists(self.tracker_file):
+            return set()
+
+        with open(self.tracker_file, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            f.truncate(end)
+        return set(data[:end].decode().split())
+
+    def contains_many(self, email_ids):
+        with self.lock:
+            return {email_id for email_id in email_ids if email_id in self.processed_ids}
+
+    def add_many(self, email_ids):
+        with self.lock:
+            new_ids = [email_id for email_id in email_ids if email_id not in self.processed_ids]
+            self.processed_ids.update(new_ids)
+            self.log.write(''.join(f"{email_id}\n" for email_id in new_ids))
+            self.log.flush()
+
+    def load_checkpoints(self):
+        """Load per-mailbox UID sync checkpoints from file"""
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def set_checkpoint(self, mailbox, uidvalidity, last_uid):
+        with self.lock:
+            checkpoints = self.load_checkpoints()
+            checkpoints[mailbox] = {'uidvalidity': uidvalidity, 'last_uid': last_uid}
+
+            #Write to a temp file first so a crash can't leave a half-written checkpoint
+            write_json_atomic(self.checkpoint_file, checkpoints)
+
+    def compact(self, checkpoints):
+        """Rewrite the log without IDs the checkpoints already cover"""
+        with self.lock:
+            live_ids = {email_id for email_id in self.processed_ids if not is_covered(email_id, checkpoints)}
+            if len(live_ids) == len(self.processed_ids):
+                return
+
+            self.log.close()
+            write_atomic(self.tracker_file, ''.join(f"{email_id}\n" for email_id in sorted(live_ids)))
+
+            self.processed_ids = live_ids
+            self.log = open(self.tracker_file, 'a')
+
+    def close(self):
+        with self.lock:
+            self.log.flush()
+            os.fsync(self.log.fileno())
+            self.log.close()
+
+def create_backend(name=TRACKER_BACKEND):
+    """Build the tracker backend named by EMAIL_TRACKER_BACKEND ('sqlite' or 'file')"""
+    if name == 'file':
+        return FileTrackerBackend()
+    if name == 'sqlite':
+        return SQLiteTrackerBackend()
+    raise ValueError(f"Unknown tracker backend: {name}")
+
+class EmailTracker:
+    """Tracks which emails have been processed to avoid duplicates
+
+    Storage is delegated to a backend (SQLite by default). Safe to share across
+    extraction threads.
+    """
+
+    def __init__(self, backend=None):
+       self.backend = backend
+       self.checkpoints = None
+       self.lock = threading.Lock()
+
+    def _ensure_backend(self):
+        #Opened lazily so importing extract_transactions doesn't touch data/
+        with self.lock:
+            if self.backend is None:
+                self.backend = create_backend()
+            if self.checkpoints is None:
+                self.checkpoints = self.backend.load_checkpoints()
+
     def is_processed(self, email_id):
         """Check if an email has already been processed"""
-        return email_id in self.processed_ids
-    
+        return bool(self.processed_among([email_id]))
+
+    def processed_among(self, email_ids):
+        """Return which of email_ids have already been processed, in one lookup"""
+        self._ensure_backend()
+        return self.backend.contains_many(email_ids)
+
+    def filter_unprocessed(self, email_ids):
+        """Keep only the email_ids that haven't been processed, preserving order"""
+        email_ids = list(email_ids)
+        processed = self.processed_among(email_ids)
+        return [email_id for email_id in email_ids if email_id not in processed]
+
     def mark_processed(self, email_id):
         """Mark an email as processed"""
-        if email_id not in self.processed_ids:
-            self.processed_ids.add(email_id)
-            with open(self.tracker_file, 'a') as f:
-                f.write(f"{email_id}\n")
\ No newline at end of file
+        self.mark_processed_many([email_id])
+
+    def mark_processed_many(self, email_ids):
+        """Mark a batch of emails as processed in one write"""
+        self._ensure_backend()
+        self.backend.add_many(email_ids)
+
+    def get_checkpoint(self, mailbox, uidvalidity):
+        """Return the highest UID already synced for a mailbox, or 0 if UIDVALIDITY changed"""
+        self._ensure_backend()
+        checkpoint = self.checkpoints.get(mailbox)
+        if checkpoint and checkpoint['uidvalidity'] == uidvalidity:
+            return checkpoint['last_uid']
+        return 0
+
+    def set_checkpoint(self, mailbox, uidvalidity, last_uid):
+        """Persist the (UIDVALIDITY, highest UID synced) checkpoint for a mailbox"""
+        self._ensure_backend()
+        self.backend.set_checkpoint(mailbox, uidvalidity, last_uid)
+        self.checkpoints[mailbox] = {'uidvalidity': uidvalidity, 'last_uid': last_uid}
+
+    def compact(self):
+        """Forget processed IDs at or below the sync checkpoints so storage stays bounded"""
+        self._ensure_backend()
+        if self.checkpoints:
+            self.backend.compact(self.checkpoints)
+
+    def close(self):
+        """Flush the backend to disk"""
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+            self.checkpoints = None
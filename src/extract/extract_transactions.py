@@ -1,128 +1,271 @@
 import imaplib
 import email
+import json
 import os 
-import json 
-from datetime import datetime 
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from email_parser import DiscoverParser, ChaseParser, CapitalOneParser
+from email_parser import DiscoverParser, ChaseParser, CapitalOneParser, ParserRegistry, get_email_body
 from email_tracker import EmailTracker
+from bronze_store import BronzeWriter
+from raw_archive import RawArchive
+from transaction_record import Transaction
+from imap_client import (
+    IMAPConnectionPool, get_mailbox_state, search_new_uids, fetch_headers, fetch_bodies, fetch_messages, decode_part
+)
 
 load_dotenv()
 
 EMAIL = os.getenv('EMAIL_ADDRESS')
 PASSWORD = os.getenv('EMAIL_PASSWORD')
 IMAP_SERVER = os.getenv('IMAP_SERVER')
-IMAP_PORT = int(os.getenv('IMAP_PORT'))
+IMAP_PORT = int(os.getenv('IMAP_PORT', '993'))
+IMAP_SSL = os.getenv('IMAP_SSL', 'true').lower() != 'false'
+FETCH_BATCH_SIZE = int(os.getenv('IMAP_FETCH_BATCH_SIZE', '500'))
+IMAP_POOL_SIZE = int(os.getenv('IMAP_POOL_SIZE', '3'))
+#Alerts that fail to decode or parse are logged here and marked processed, so they don't hold back the checkpoint
+QUARANTINE_FILE = 'data/unparseable_emails.jsonl'
 
-parsers = [
+parsers = ParserRegistry([
     DiscoverParser(),
     ChaseParser(),
     CapitalOneParser()
-]
+])
 
 tracker = EmailTracker()
-
-def get_email_body(msg):
-    """Extract email body from message (handles multipart)"""
-    email_body_text = None 
-    email_body_html = None 
-
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            if content_type == "text/plain":
-                email_body_text = part.get_payload(decode=True).decode()
-            elif content_type == "text/html":
-                email_body_html = part.get_payload(decode=True).decode()
-    else: 
-        email_body = msg.get_payload(decode=True).decode()
-        if msg.get_content_type() == "text/plain":
-            email_body_text = email_body 
-        else: 
-            email_body_html = email_body
-    
-    return email_body_html if email_body_html else email_body_text
+bronze = BronzeWriter()
+raw_archive = RawArchive()
 
 def save_transaction(transaction, email_id):
-    """Save transaction to JSON file in data/bronze/"""
-    os.makedirs('data/bronze', exist_ok=True)
+    """Archive the raw email in data/raw/ and append the transaction to data/bronze/
+
+    Returns the saved Transaction, which refers to the email by hash rather than holding it.
+    """
+    record = dict(transaction)
+    raw_email = record.pop('raw_email_data')
+    record['raw_email_hash'] = raw_archive.put(raw_email) if raw_email is not None else None
+
+    record = bronze.append(record, email_id)
+    
+    print(f"Saved: {transaction['card_name']} transaction from email {email_id}")
+    return Transaction.from_record(record)
 
-    card_name = transaction['card_name'].lower().replace(' ', '_')
-    date_str = datetime.now().strftime('%Y%m%d')
+def parse_email(raw_email):
+    """Parse a raw email with the parser its sender and subject match, returning the transaction or None"""
+    msg = email.message_from_bytes(raw_email)
 
-    filename = f"transaction_{date_str}_{card_name}_{email_id}.json"
-    filepath = os.path.join('data','bronze', filename)
+    email_from = msg['From']
+    email_subject = msg['Subject']
 
-    with open(filepath, 'w') as f:
-        json.dump(transaction, f, indent=2)
+    # Find the correct parser
+    matched_parser = parsers.find_parser(email_from, email_subject)
     
-    print(f"Saved: {filename}")
+    if matched_parser:
+        return matched_parser.parse(get_email_body(msg))
+    return None
 
-def extract_all_transactions(): 
-    """Main extraction function"""
-    print("Connecting to Gmail...")
-    mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
+quarantine_lock = threading.Lock()
+
+def quarantine(email_id, error):
+    """Log an alert that can't be parsed to QUARANTINE_FILE
+
+    Parsing fails the same way on every retry, so the email is marked processed
+    instead of being left to pin the checkpoint; the log says which UIDs to
+    re-fetch once the parser is fixed.
+    """
+    print(f"Error parsing email {email_id}, quarantined: {error}")
+    entry = {'email_id': email_id, 'error': f"{type(error).__name__}: {error}", 'at': datetime.now().isoformat()}
+    with quarantine_lock:
+        os.makedirs(os.path.dirname(QUARANTINE_FILE) or '.', exist_ok=True)
+        with open(QUARANTINE_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+def connect(mailbox):
+    """Open an authenticated IMAP connection with the mailbox selected"""
+    #Plain IMAP is only for local test servers (see tests/imap_server.py)
+    imap_class = imaplib.IMAP4_SSL if IMAP_SSL else imaplib.IMAP4
+    mail = imap_class(IMAP_SERVER, IMAP_PORT)
     mail.login(EMAIL,PASSWORD)
-    mail.select('inbox')
-    
-    search_queries = [
-        'FROM "discover@services.discover.com"',
-        'FROM "no.reply.alerts@chase.com"',
-        'FROM "capitalone@notification.capitalone.com"'
-    ]
-
-    total_processed = 0
-    total_skipped = 0
-
-    for query in search_queries:
-        print(f"\nSearching: {query}")
-        status, messages = mail.search(None, query)
-        email_ids = messages[0].split()
-
-        print(f"Found {len(email_ids)} emails")
-
-        for email_id in email_ids:
-            email_id_str = email_id.decode()
-
-            #Skip if already processed 
-            if tracker.is_processed(email_id_str):
-                total_skipped += 1
-                continue
-
-            try:
-                status, msg_data = mail.fetch(email_id, '(RFC822)')
-                raw_email = msg_data[0][1]
-
-                msg = email.message_from_bytes(raw_email)
-
-                email_from = msg['From']
-                email_subject = msg['Subject']
-                email_body = get_email_body(msg)
-
-                # Find the correct parser
-                matched_parser = None 
-                for parser in parsers:
-                    if parser.can_parse(email_from, email_subject):
-                        matched_parser = parser 
-                        break
-                
-                if matched_parser:
-                    transaction = matched_parser.parse(email_body)
-                    save_transaction(transaction, email_id_str)
-                else: 
+    mail.select(mailbox)
+    return mail
+
+def process_batch(pool, uidvalidity, uids, batch_size):
+    """Route, fetch and parse one batch of UIDs on a pooled connection
+
+    Returns the set of UIDs that were fully handled, the Transactions saved and
+    the UIDs quarantined as unparseable (which count as handled). A fetch or save
+    error leaves its UID unhandled, to be retried next run.
+    """
+    completed_uids = set()
+    quarantined_uids = set()
+    records = []
+
+    try:
+        with pool.connection() as mail:
+            #Phase one: route on From/Subject only, so unmatched mail never downloads a body
+            body_parts = {}
+            matched_parsers = {}
+            fallback_uids = []
+
+            for uid, email_from, email_subject, body_part in fetch_headers(mail, uids, batch_size):
+                if email_from is None:
+                    fallback_uids.append(uid)
+                    continue
+
+                matched_parser = parsers.find_parser(email_from, email_subject)
+                if matched_parser is None:
+                    print(f"No parser matched for email {uidvalidity}-{uid}")
+                    completed_uids.add(uid)
+                elif body_part is None:
+                    fallback_uids.append(uid)
+                else:
+                    body_parts[uid] = body_part
+                    matched_parsers[uid] = matched_parser
+
+            #Phase two: fetch just the text part of matched messages
+            for uid, raw_part in fetch_bodies(mail, body_parts, batch_size):
+                email_id_str = f"{uidvalidity}-{uid}"
+
+                try:
+                    email_body = decode_part(raw_part, body_parts[uid][1]).decode()
+                    transaction = matched_parsers[uid].parse(email_body)
+                except Exception as e:
+                    quarantine(email_id_str, e)
+                    quarantined_uids.add(uid)
+                    completed_uids.add(uid)
+                    continue
+
+                try:
+                    records.append(save_transaction(transaction, email_id_str))
+                except Exception as e: 
+                    print(f"Error processing email {email_id_str}: {e}")
+                    continue
+
+                completed_uids.add(uid)
+
+            #Anything the header pass couldn't route falls back to a full download
+            for uid, raw_email in fetch_messages(mail, fallback_uids, batch_size):
+                email_id_str = f"{uidvalidity}-{uid}"
+
+                try:
+                    transaction = parse_email(raw_email)
+                except Exception as e:
+                    quarantine(email_id_str, e)
+                    quarantined_uids.add(uid)
+                    completed_uids.add(uid)
+                    continue
+
+                if transaction is None:
                     print(f"No parser matched for email {email_id_str}")
-            except Exception as e: 
-                print(f"Error processing email {email_id_str}: {e}")
-                continue
-            
-            tracker.mark_processed(email_id_str)
-            total_processed +=1 
+                    completed_uids.add(uid)
+                    continue
+
+                try:
+                    records.append(save_transaction(transaction, email_id_str))
+                except Exception as e: 
+                    print(f"Error processing email {email_id_str}: {e}")
+                    continue
+
+                completed_uids.add(uid)
+    finally:
+        #Bronze must be durable before the tracker says these emails are done. This also
+        #runs when the connection aborts mid-batch: records already appended would reach
+        #disk with a later flush anyway, so their UIDs are marked now or the retry appends them again
+        raw_archive.flush()
+        bronze.flush()
+        tracker.mark_processed_many(f"{uidvalidity}-{uid}" for uid in sorted(completed_uids))
+
+    return completed_uids, records, quarantined_uids
+
+def stream_transactions(batch_size=FETCH_BATCH_SIZE, mailbox='inbox', pool_size=IMAP_POOL_SIZE, stats=None):
+    """Sync new mail, yielding each batch's Transactions as soon as they are durable
+
+    The checkpoint is written once every batch is done, even if the consumer closes
+    the generator early. If stats is given it is filled with processed/skipped/
+    quarantined/failed counts.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(processed=0, skipped=0, quarantined=0, failed=0)
+
+    print(f"Connecting to Gmail ({pool_size} connections)...")
+    pool = IMAPConnectionPool(lambda: connect(mailbox), pool_size)
+
+    uidvalidity, uidnext = get_mailbox_state(pool.first_connection, mailbox)
+    last_uid = tracker.get_checkpoint(mailbox, uidvalidity)
+    print(f"UIDVALIDITY {uidvalidity}, syncing UIDs after {last_uid}")
     
-    mail.logout()
+    search_queries = [f'FROM "{sender}"' for sender in parsers.senders]
+
+    def search(query):
+        with pool.connection() as mail:
+            return search_new_uids(mail, query, last_uid)
+
+    failed_uids = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            #Issuer searches run side by side, then every fetch batch is spread across the pool
+            new_uids = []
+            for query, uids in zip(search_queries, executor.map(search, search_queries)):
+                print(f"\nSearched: {query}")
+                print(f"Found {len(uids)} new emails")
+
+                #Skip if already processed 
+                processed = tracker.processed_among(f"{uidvalidity}-{uid}" for uid in uids)
+                unprocessed = [uid for uid in uids if f"{uidvalidity}-{uid}" not in processed]
+                stats['skipped'] += len(uids) - len(unprocessed)
+                new_uids.extend(unprocessed)
+
+            batches = [new_uids[start:start + batch_size] for start in range(0, len(new_uids), batch_size)]
+            futures = [
+                (batch, executor.submit(process_batch, pool, uidvalidity, batch, batch_size))
+                for batch in batches
+            ]
+
+            consumer_open = True
+            for batch, future in futures:
+                try:
+                    completed_uids, records, quarantined_uids = future.result()
+                except Exception as e:
+                    print(f"Error processing batch of {len(batch)} emails: {e}")
+                    completed_uids, records, quarantined_uids = set(), [], set()
+
+                stats['processed'] += len(completed_uids) - len(quarantined_uids)
+                stats['quarantined'] += len(quarantined_uids)
+                failed_uids.extend(uid for uid in batch if uid not in completed_uids)
+
+                if records and consumer_open:
+                    try:
+                        yield records
+                    except GeneratorExit:
+                        #The consumer stopped early; later batches are still saved to bronze
+                        consumer_open = False
+
+        #Everything below UIDNEXT at select time has been searched; stop short of any failures so they retry
+        checkpoint = uidnext - 1
+        if failed_uids:
+            checkpoint = min(checkpoint, min(failed_uids) - 1)
+        tracker.set_checkpoint(mailbox, uidvalidity, max(checkpoint, last_uid))
+        tracker.compact()
+        stats['failed'] = len(failed_uids)
+    finally:
+        pool.close()
+        raw_archive.close()
+        bronze.close()
+        tracker.close()
+
+def extract_all_transactions(batch_size=FETCH_BATCH_SIZE, mailbox='inbox', pool_size=IMAP_POOL_SIZE): 
+    """Main extraction function"""
+    stats = {}
+    for _ in stream_transactions(batch_size, mailbox, pool_size, stats):
+        pass
 
     print(f"\n=== EXTRACTION COMPLETE ===")
-    print(f"Processed: {total_processed} new transactions")
-    print(f"Skipped: {total_skipped} already processed")
+    print(f"Processed: {stats['processed']} new transactions")
+    print(f"Skipped: {stats['skipped']} already processed")
+    print(f"Unparseable: {stats['quarantined']} (logged to {QUARANTINE_FILE})")
+    print(f"Failed: {stats['failed']} (will retry next run)")
 
 if __name__ == "__main__":
-    extract_all_transactions()
+    extract_all_transactions()
\ No newline at end of file
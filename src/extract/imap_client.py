@@ -0,0 +1,297 @@
+import base64
+import email
+import imaplib
+import queue
+import quopri
+import re
+from contextlib import contextmanager
+
+HEADER_ITEM = 'BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)]'
+
+class IMAPConnectionPool:
+    """A fixed-size pool of logged-in IMAP connections, each with the mailbox selected"""
+
+    def __init__(self, connect, size):
+        self.connect = connect
+        self.size = size
+        self.connections = queue.Queue()
+
+        #Open every connection up front so their SELECT snapshots predate any search
+        self.first_connection = None
+        for _ in range(size):
+            mail = connect()
+            if self.first_connection is None:
+                self.first_connection = mail
+            self.connections.put(mail)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, replacing it if the server dropped it"""
+        mail = self.connections.get()
+        try:
+            yield mail
+        except imaplib.IMAP4.abort:
+            try:
+                mail.shutdown()
+            except Exception:
+                pass
+            mail = self.connect()
+            raise
+        finally:
+            self.connections.put(mail)
+
+    def close(self):
+        """Log out of every pooled connection"""
+        while not self.connections.empty():
+            mail = self.connections.get()
+            try:
+                mail.logout()
+            except Exception:
+                pass
+
+def build_message_set(uids):
+    """Compress UIDs into an IMAP message set (e.g. 1:500,502,510:512)"""
+    numbers = sorted(int(uid) for uid in uids)
+    ranges = []
+
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+
+    return ','.join(f"{start}:{end}" if start != end else str(start) for start, end in ranges)
+
+def parse_fetch_response(msg_data):
+    """Group a raw UID FETCH response into (uid, metadata, literals) per message
+
+    literals is a list of (prefix, data) pairs, where prefix is the response text
+    that introduced the literal (e.g. b'1 (UID 5 RFC822 {1234}').
+    """
+    messages = []
+
+    for part in msg_data:
+        if part is None:
+            continue
+
+        prefix = part[0] if isinstance(part, tuple) else part
+
+        #A new message starts with "<seq> (", everything else continues the previous one
+        if re.match(rb'\d+ \(', prefix):
+            messages.append([None, b'', []])
+        elif not messages:
+            continue
+
+        messages[-1][1] += prefix
+        if isinstance(part, tuple):
+            messages[-1][2].append((prefix, part[1]))
+
+    parsed = []
+    for _, metadata, literals in messages:
+        #Servers may send the UID item before or after the literal, so search all metadata
+        uid_match = re.search(rb'UID (\d+)', metadata)
+        if uid_match:
+            parsed.append((int(uid_match.group(1)), metadata, literals))
+
+    return parsed
+
+def find_literal(literals, item_pattern):
+    """Return the literal whose response item matches item_pattern (a bytes regex)"""
+    for prefix, data in literals:
+        if re.search(item_pattern + rb' \{\d+\}$', prefix.rstrip(), re.IGNORECASE):
+            return data
+    return None
+
+def get_mailbox_state(mail, mailbox):
+    """Return (UIDVALIDITY, UIDNEXT) for the selected mailbox"""
+    _, uidvalidity = mail.response('UIDVALIDITY')
+    _, uidnext = mail.response('UIDNEXT')
+
+    #Not every server sends both with SELECT, so fall back to STATUS
+    if not uidvalidity or uidvalidity[0] is None or not uidnext or uidnext[0] is None:
+        status, data = mail.status(mailbox, '(UIDVALIDITY UIDNEXT)')
+        uidvalidity = [re.search(rb'UIDVALIDITY (\d+)', data[0]).group(1)]
+        uidnext = [re.search(rb'UIDNEXT (\d+)', data[0]).group(1)]
+
+    return int(uidvalidity[-1]), int(uidnext[-1])
+
+def search_new_uids(mail, query, last_uid):
+    """Search for UIDs above the checkpoint that match the query"""
+    status, messages = mail.uid('SEARCH', None, f'UID {last_uid + 1}:*', query)
+    uids = [int(uid) for uid in messages[0].split()] if messages[0] else []
+
+    #"n:*" always matches the newest message, even when its UID is below n
+    return [uid for uid in uids if uid > last_uid]
+
+def uid_fetch_batches(mail, uids, items, batch_size):
+    """Run UID FETCH over uids in batches, yielding parsed (uid, metadata, literals)
+
+    A failed batch is retried one message at a time so a single bad message can't
+    sink the rest of the batch.
+    """
+    for start in range(0, len(uids), batch_size):
+        batch = uids[start:start + batch_size]
+
+        try:
+            status, msg_data = mail.uid('FETCH', build_message_set(batch), items)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"UID FETCH returned {status}")
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error as e:
+            print(f"Batch fetch failed ({e}), retrying {len(batch)} emails individually")
+            for uid in batch:
+                try:
+                    status, msg_data = mail.uid('FETCH', str(uid), items)
+                    yield from parse_fetch_response(msg_data)
+                except imaplib.IMAP4.abort:
+                    raise
+                except Exception as e:
+                    print(f"Error fetching email {uid}: {e}")
+            continue
+
+        yield from parse_fetch_response(msg_data)
+
+def fetch_messages(mail, uids, batch_size):
+    """Fetch full RFC822 messages by UID in batches, yielding (uid, raw_email) pairs"""
+    for uid, _, literals in uid_fetch_batches(mail, uids, '(RFC822)', batch_size):
+        raw_email = find_literal(literals, rb'RFC822')
+        if raw_email is not None:
+            yield uid, raw_email
+
+def tokenize_sexp(data):
+    """Split an IMAP parenthesized list into tokens"""
+    return re.findall(rb'\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}|[^\s()"]+', data)
+
+def parse_sexp(tokens, pos=0):
+    """Parse tokens from tokenize_sexp into nested lists, returning (value, next position)"""
+    token = tokens[pos]
+
+    if token == b'(':
+        values = []
+        pos += 1
+        while pos < len(tokens) and tokens[pos] != b')':
+            value, pos = parse_sexp(tokens, pos)
+            values.append(value)
+        return values, pos + 1
+
+    if token.startswith(b'"'):
+        return re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode(errors='replace'), pos + 1
+    if token.upper() == b'NIL' or token.startswith(b'{'):
+        #Literals inside BODYSTRUCTURE only appear in names we never use
+        return None, pos + 1
+    return token.decode(errors='replace'), pos + 1
+
+def parse_bodystructure(metadata):
+    """Extract and parse the BODYSTRUCTURE item from FETCH metadata"""
+    match = re.search(rb'BODYSTRUCTURE \(', metadata, re.IGNORECASE)
+    if not match:
+        return None
+
+    tokens = tokenize_sexp(metadata[match.end() - 1:])
+    structure, _ = parse_sexp(tokens)
+    return structure
+
+def _join_part(prefix, index):
+    return f"{prefix}.{index}" if prefix else str(index)
+
+def _walk_body(node, prefix, found):
+    """Collect (part number, content type, encoding) for every leaf under node"""
+    if isinstance(node[0], list):
+        for index, child in enumerate(_multipart_children(node), 1):
+            _walk_part(child, _join_part(prefix, index), found)
+    else:
+        _walk_part(node, _join_part(prefix, 1), found)
+
+def _multipart_children(node):
+    #Multipart extension data after the subtype can also be lists, so stop at the subtype
+    children = []
+    for child in node:
+        if not isinstance(child, list):
+            break
+        children.append(child)
+    return children
+
+def _walk_part(node, part_number, found):
+    if isinstance(node[0], list):
+        for index, child in enumerate(_multipart_children(node), 1):
+            _walk_part(child, f"{part_number}.{index}", found)
+        return
+
+    content_type = f"{node[0]}/{node[1]}".lower()
+    encoding = (node[5] or '7bit').lower()
+    found.append((part_number, content_type, encoding))
+
+    #Attached messages are walked too, matching email.message.Message.walk()
+    if content_type == 'message/rfc822' and len(node) > 8 and isinstance(node[8], list):
+        _walk_body(node[8], part_number, found)
+
+def select_body_part(structure):
+    """Pick the part get_email_body would use: the last text/html, else the last text/plain
+
+    Returns (part number, encoding) or None if the structure has no usable part.
+    """
+    if not structure:
+        return None
+
+    if not isinstance(structure[0], list):
+        #Single-part messages are read whatever their type, like get_email_body does
+        return '1', (structure[5] or '7bit').lower()
+
+    found = []
+    _walk_body(structure, '', found)
+
+    html_part = None
+    text_part = None
+    for part_number, content_type, encoding in found:
+        if content_type == 'text/html':
+            html_part = (part_number, encoding)
+        elif content_type == 'text/plain':
+            text_part = (part_number, encoding)
+
+    return html_part or text_part
+
+def decode_part(data, encoding):
+    """Undo a part's Content-Transfer-Encoding, mirroring get_payload(decode=True)"""
+    if encoding == 'base64':
+        return base64.b64decode(data)
+    if encoding == 'quoted-printable':
+        return quopri.decodestring(data)
+    return data
+
+def fetch_headers(mail, uids, batch_size):
+    """Fetch only From/Subject and BODYSTRUCTURE, yielding (uid, from, subject, body part)"""
+    items = f'(BODYSTRUCTURE {HEADER_ITEM})'
+
+    for uid, metadata, literals in uid_fetch_batches(mail, uids, items, batch_size):
+        header = find_literal(literals, rb'BODY\[HEADER[^\]]*\]')
+        if header is None:
+            yield uid, None, None, None
+            continue
+
+        msg = email.message_from_bytes(header)
+        try:
+            body_part = select_body_part(parse_bodystructure(metadata))
+        except (IndexError, TypeError):
+            body_part = None
+
+        yield uid, msg['From'], msg['Subject'], body_part
+
+def fetch_bodies(mail, body_parts, batch_size):
+    """Fetch only the selected body part of each message, yielding (uid, raw part)
+
+    body_parts maps uid -> (part number, encoding). Messages that share a part number
+    are fetched together so the daily run stays one round-trip per batch.
+    """
+    uids_by_part = {}
+    for uid, (part_number, encoding) in body_parts.items():
+        uids_by_part.setdefault(part_number, []).append(uid)
+
+    for part_number, uids in uids_by_part.items():
+        items = f'(BODY.PEEK[{part_number}])'
+        item_pattern = re.escape(f'BODY[{part_number}]'.encode())
+
+        for uid, _, literals in uid_fetch_batches(mail, uids, items, batch_size):
+            data = find_literal(literals, item_pattern)
+            if data is not None:
+                yield uid, data
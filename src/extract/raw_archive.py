@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from atomic_write import write_atomic
+
+RAW_DIR = 'data/raw'
+INDEX_FILE = 'index.jsonl'
+MAX_PACK_BYTES = 256 * 1024 * 1024
+DICT_TRAINING_SAMPLES = 50
+MAX_DICT_BYTES = 32 * 1024  # zlib only looks back 32KB, so a bigger dictionary is wasted
+
+def content_hash(body):
+    """SHA-256 of an email body, used as its archive key"""
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def train_dictionary(samples):
+    """Build a zlib preset dictionary from lines that recur across sample bodies
+
+    Alert templates differ only in a handful of fields, so the boilerplate lines
+    they share make a good dictionary. Lines are ordered least to most common
+    because zlib finds matches near the end of the dictionary most cheaply.
+    """
+    line_counts = Counter()
+    for sample in samples:
+        line_counts.update(set(sample.splitlines(keepends=True)))
+
+    shared = [line for line, count in line_counts.most_common() if count > 1]
+    dictionary = b''
+    for line in shared:
+        encoded = line.encode()
+        if len(dictionary) + len(encoded) > MAX_DICT_BYTES:
+            break
+        dictionary = encoded + dictionary
+
+    return dictionary
+
+class RawArchive:
+    """Compressed, content-addressed store for raw email bodies in data/raw/
+
+    Bodies are deduplicated by SHA-256, zlib-compressed against a dictionary trained
+    on the first bodies archived, and appended to pack files. index.jsonl maps each
+    hash to its pack, offset and length. Lookups are lazy, so callers only pay for
+    the HTML they actually read back. put() is thread-safe.
+    """
+
+    def __init__(self, archive_dir=RAW_DIR, max_pack_bytes=MAX_PACK_BYTES):
+        self.archive_dir = Path(archive_dir)
+        self.index_path = self.archive_dir / INDEX_FILE
+        self.max_pack_bytes = max_pack_bytes
+        self.lock = threading.Lock()
+        self.index = None
+        self.pack_sizes = {}
+        self.pack_name = None
+        self.dictionaries = {}
+        self.dict_id = None
+        self.samples = []
+        self.pack_file = None
+        self.index_file = None
+
+    def _load(self):
+        """Load the index and dictionaries, dropping entries a crash left dangling"""
+        self.index = {}
+        self.pack_sizes = {}
+
+        if self.index_path.exists():
+            with open(self.index_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    entry = json.loads(line)
+                    self.index[entry['hash']] = entry
+
+        for dict_path in self.archive_dir.glob('dict-*.bin'):
+            self.dictionaries[dict_path.stem[len('dict-'):]] = dict_path.read_bytes()
+
+        for pack_path in self.archive_dir.glob('pack-*.bin'):
+            self.pack_sizes[pack_path.name] = pack_path.stat().st_size
+
+        self.index = {
+            body_hash: entry for body_hash, entry in self.index.items()
+            if entry['offset'] + entry['length'] <= self.pack_sizes.get(entry['pack'], 0)
+        }
+
+        #Keep compressing with the newest dictionary the archive has used
+        for entry in self.index.values():
+            if entry['dict']:
+                self.dict_id = entry['dict']
+
+    def _ensure_loaded(self):
+        if self.index is None:
+            self._load()
+
+    def _open_for_append(self):
+        """Open the newest pack (or a new one if it is full) and the index for appending"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+        packs = sorted(self.pack_sizes)
+        if not packs or self.pack_sizes[packs[-1]] >= self.max_pack_bytes:
+            packs.append(f"pack-{len(packs) + 1:06d}.bin")
+            self.pack_sizes[packs[-1]] = 0
+
+        self.pack_name = packs[-1]
+        self.pack_file = open(self.archive_dir / self.pack_name, 'ab')
+
+        #Trim a torn index line so the next entry starts on a fresh line
+        if self.index_path.exists():
+            with open(self.index_path, 'rb+') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+        self.index_file = open(self.index_path, 'ab')
+
+    def _train(self):
+        """Train and persist a dictionary from the bodies seen so far"""
+        dictionary = train_dictionary(self.samples)
+        self.samples = []
+        if not dictionary:
+            return
+
+        dict_id = hashlib.sha256(dictionary).hexdigest()[:12]
+        dict_path = self.archive_dir / f"dict-{dict_id}.bin"
+        write_atomic(dict_path, dictionary)
+
+        self.dictionaries[dict_id] = dictionary
+        self.dict_id = dict_id
+
+    def put(self, body):
+        """Archive an email body (if new) and return its content hash"""
+        body_hash = content_hash(body)
+
+        with self.lock:
+            self._ensure_loaded()
+            if body_hash in self.index:
+                return body_hash
+
+            if self.pack_file is None:
+                self._open_for_append()
+            if self.pack_sizes[self.pack_name] >= self.max_pack_bytes:
+                self._flush()
+                self.pack_file.close()
+                self.index_file.close()
+                self._open_for_append()
+
+            if self.dict_id is None:
+                self.samples.append(body)
+                if len(self.samples) >= DICT_TRAINING_SAMPLES:
+                    self._train()
+
+            if self.dict_id:
+                compressor = zlib.compressobj(9, zdict=self.dictionaries[self.dict_id])
+            else:
+                compressor = zlib.compressobj(9)
+            data = compressor.compress(body.encode()) + compressor.flush()
+
+            entry = {
+                'hash': body_hash,
+                'pack': self.pack_name,
+                'offset': self.pack_sizes[self.pack_name],
+                'length': len(data),
+                'dict': self.dict_id
+            }
+            self.pack_file.write(data)
+            self.index_file.write((json.dumps(entry) + '\n').encode())
+            self.pack_sizes[self.pack_name] += len(data)
+            self.index[body_hash] = entry
+
+        return body_hash
+
+    def get(self, body_hash):
+        """Load and decompress an archived email body"""
+        with self.lock:
+            self._ensure_loaded()
+            entry = self.index[body_hash]
+            if self.pack_file is not None and entry['pack'] == self.pack_name:
+                self.pack_file.flush()
+
+        with open(self.archive_dir / entry['pack'], 'rb') as f:
+            f.seek(entry['offset'])
+            data = f.read(entry['length'])
+
+        if entry['dict']:
+            decompressor = zlib.decompressobj(zdict=self.dictionaries[entry['dict']])
+        else:
+            decompressor = zlib.decompressobj()
+        return (decompressor.decompress(data) + decompressor.flush()).decode()
+
+    def __contains__(self, body_hash):
+        with self.lock:
+            self._ensure_loaded()
+            return body_hash in self.index
+
+    def _flush(self):
+        #Fsync the pack before the index so an index entry never outlives its data
+        if self.pack_file is None:
+            return
+        self.pack_file.flush()
+        os.fsync(self.pack_file.fileno())
+        self.index_file.flush()
+        os.fsync(self.index_file.fileno())
+
+    def flush(self):
+        """Make every archived body durable"""
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the open pack and index"""
+        with self.lock:
+            self._flush()
+            if self.pack_file is not None:
+                self.pack_file.close()
+                self.index_file.close()
+                self.pack_file = None
+                self.index_file = None
+
+def load_raw_email(record, archive=None):
+    """Return a bronze record's raw email HTML, reading it from the archive if needed
+
+    Older bronze records embed raw_email_data directly; newer ones store only
+    raw_email_hash.
+    """
+    if record.get('raw_email_data') is not None:
+        return record['raw_email_data']
+    if not record.get('raw_email_hash'):
+        return None
+    return (archive or RawArchive()).get(record['raw_email_hash'])
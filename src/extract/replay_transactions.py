@@ -0,0 +1,228 @@
+import argparse
+import email
+import hashlib
+import mailbox
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from email_parser import DiscoverParser, ChaseParser, CapitalOneParser, ParserRegistry, get_email_body
+from email_tracker import EmailTracker, SQLiteTrackerBackend
+from bronze_reader import read_bronze
+from bronze_store import BronzeWriter, BRONZE_DIR, load_manifest, iter_bronze_records
+from raw_archive import RawArchive, RAW_DIR, content_hash, load_raw_email
+
+REPLAY_TRACKER_FILE = 'data/replayed_emails.db'
+REPLAY_CHUNK_SIZE = 200
+
+parsers = ParserRegistry([
+    DiscoverParser(),
+    ChaseParser(),
+    CapitalOneParser()
+])
+
+def replay_email_id(raw_email):
+    """Stable ID for a message that has no IMAP UID: a hash of its raw bytes"""
+    return f"replay-{hashlib.sha256(raw_email).hexdigest()[:32]}"
+
+def parse_messages(messages):
+    """Parse a chunk of (email_id, raw RFC822 bytes) in a worker process
+
+    Returns (email_id, transaction, error) per message; transaction is None when
+    no parser matched.
+    """
+    results = []
+    for email_id, raw_email in messages:
+        try:
+            msg = email.message_from_bytes(raw_email)
+            matched_parser = parsers.find_parser(msg['From'], msg['Subject'])
+            transaction = matched_parser.parse(get_email_body(msg)) if matched_parser else None
+            results.append((email_id, transaction, None))
+        except Exception as e:
+            results.append((email_id, None, str(e)))
+    return results
+
+def reparse_bodies(items):
+    """Re-run the card's parser over a chunk of (email_id, card_name, archived body)"""
+    results = []
+    for email_id, card_name, email_body in items:
+        try:
+            matched_parser = parsers.parser_for_card(card_name)
+            transaction = matched_parser.parse(email_body) if matched_parser else None
+            results.append((email_id, transaction, None))
+        except Exception as e:
+            results.append((email_id, None, str(e)))
+    return results
+
+def chunked(items, chunk_size):
+    """Group an iterable into lists of at most chunk_size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def map_chunks(executor, worker, chunks, max_pending):
+    """Like executor.map, but only keeps max_pending chunks in flight so huge exports stream"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(worker, chunk))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def open_mailbox(path):
+    """Open a Maildir directory or an mbox file read-only"""
+    if os.path.isdir(path):
+        return mailbox.Maildir(path, factory=None, create=False)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No mbox or Maildir at {path}")
+    return mailbox.mbox(path, create=False)
+
+def iter_unreplayed(box, tracker, chunk_size):
+    """Stream (email_id, raw bytes) for messages not replayed before, one tracker lookup per chunk"""
+    for keys in chunked(box.iterkeys(), chunk_size):
+        messages = []
+        for key in keys:
+            raw_email = box.get_bytes(key)
+            messages.append((replay_email_id(raw_email), raw_email))
+
+        replayed = tracker.processed_among(email_id for email_id, _ in messages)
+        yield [(email_id, raw_email) for email_id, raw_email in messages if email_id not in replayed]
+
+def write_results(results, bronze, raw_archive, stats, known_hashes=None):
+    """Archive raw HTML and append parsed transactions to bronze, returning the handled IDs
+
+    With known_hashes (body hashes already in bronze), a transaction whose email
+    body is in it or in the raw archive was extracted before and is counted as a
+    duplicate instead of saved.
+    """
+    handled = []
+    for email_id, transaction, error in results:
+        if error is not None:
+            print(f"Error processing email {email_id}: {error}")
+            stats['errors'] += 1
+            continue
+
+        handled.append(email_id)
+        if transaction is None:
+            stats['unmatched'] += 1
+            continue
+
+        record = dict(transaction)
+        raw_email = record.pop('raw_email_data')
+        if known_hashes is not None and raw_email is not None:
+            body_hash = content_hash(raw_email)
+            if body_hash in known_hashes or body_hash in raw_archive:
+                stats['duplicates'] += 1
+                continue
+        record['raw_email_hash'] = raw_archive.put(raw_email) if raw_email is not None else None
+        bronze.append(record, email_id)
+        stats['saved'] += 1
+
+    #Bronze must be durable before the tracker says these emails are done
+    raw_archive.flush()
+    bronze.flush()
+    return handled
+
+def replay_mailbox(path, bronze_dir=BRONZE_DIR, raw_dir=RAW_DIR, tracker=None,
+                   workers=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """Parse a local mbox/Maildir export into bronze without touching IMAP
+
+    Messages are deduplicated by content hash in a replay tracker of their own,
+    so re-running over the same export (or an overlapping one) only adds new mail.
+    Alerts whose body is already in the raw archive or in bronze (legacy records
+    embed it) were extracted before, over IMAP or by an earlier replay, and are
+    skipped rather than saved twice.
+    """
+    box = open_mailbox(path)
+    tracker = tracker or EmailTracker(SQLiteTrackerBackend(REPLAY_TRACKER_FILE, None, None))
+    bronze = BronzeWriter(bronze_dir)
+    raw_archive = RawArchive(raw_dir)
+    stats = {'saved': 0, 'unmatched': 0, 'duplicates': 0, 'errors': 0}
+
+    workers = workers or os.cpu_count()
+    known_hashes = set(read_bronze(bronze_dir, fields=['raw_email_hash'], workers=workers)['raw_email_hash'].dropna())
+
+    print(f"Replaying {path} with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = (chunk for chunk in iter_unreplayed(box, tracker, chunk_size) if chunk)
+        for results in map_chunks(executor, parse_messages, chunks, workers * 2):
+            tracker.mark_processed_many(write_results(results, bronze, raw_archive, stats, known_hashes))
+
+    box.close()
+    raw_archive.close()
+    bronze.close()
+    tracker.close()
+
+    print(f"\n=== REPLAY COMPLETE ===")
+    print(f"Saved: {stats['saved']} transactions")
+    print(f"No parser matched: {stats['unmatched']}")
+    print(f"Already extracted: {stats['duplicates']}")
+    print(f"Failed: {stats['errors']}")
+    return stats
+
+def replay_archive(source_dir=BRONZE_DIR, bronze_dir='data/bronze_replay', raw_dir=RAW_DIR,
+                   workers=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """Re-parse every archived alert with the current parsers into a fresh bronze directory
+
+    Use this after fixing a parser: the output keeps each record's email_id, so it
+    can be swapped in for the source bronze once it looks right.
+    """
+    if Path(source_dir).resolve() == Path(bronze_dir).resolve():
+        raise ValueError("Replay output must not be the bronze directory being replayed")
+    if load_manifest(bronze_dir)['segments']:
+        raise ValueError(f"{bronze_dir} already has bronze segments, pick an empty directory")
+
+    bronze = BronzeWriter(bronze_dir)
+    raw_archive = RawArchive(raw_dir)
+    stats = {'saved': 0, 'unmatched': 0, 'errors': 0}
+
+    def items():
+        for record in iter_bronze_records(source_dir):
+            email_body = load_raw_email(record, raw_archive)
+            if email_body is None:
+                print(f"No archived email for {record.get('email_id')}, skipping")
+                stats['errors'] += 1
+                continue
+
+            #Legacy per-email JSON records predate email_id, so key them by content
+            email_id = record.get('email_id') or replay_email_id(email_body.encode())
+            yield email_id, record['card_name'], email_body
+
+    workers = workers or os.cpu_count()
+
+    print(f"Re-parsing archived emails from {source_dir} into {bronze_dir} with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in map_chunks(executor, reparse_bodies, chunked(items(), chunk_size), workers * 2):
+            write_results(results, bronze, raw_archive, stats)
+
+    raw_archive.close()
+    bronze.close()
+
+    print(f"\n=== REPLAY COMPLETE ===")
+    print(f"Saved: {stats['saved']} transactions")
+    print(f"No parser for card: {stats['unmatched']}")
+    print(f"Failed: {stats['errors']}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract transactions from local email exports instead of IMAP")
+    parser.add_argument('source', nargs='?', help="mbox file or Maildir directory to replay")
+    parser.add_argument('--from-archive', action='store_true',
+                        help="re-parse the raw email archive behind data/bronze instead of a mail export")
+    parser.add_argument('--bronze-dir', help="bronze directory to write (default: data/bronze, "
+                                             "or data/bronze_replay with --from-archive)")
+    parser.add_argument('--workers', type=int, default=None, help="parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.from_archive:
+        replay_archive(bronze_dir=args.bronze_dir or 'data/bronze_replay', workers=args.workers)
+    elif args.source:
+        replay_mailbox(args.source, bronze_dir=args.bronze_dir or BRONZE_DIR, workers=args.workers)
+    else:
+        parser.error("give an mbox/Maildir path or --from-archive")
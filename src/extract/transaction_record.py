@@ -0,0 +1,38 @@
+from raw_archive import RawArchive
+
+class Transaction:
+    """One parsed card transaction: the structured fields plus a reference to its raw email
+
+    Slotted, so a batch of them costs a fraction of the equivalent bronze dicts,
+    and the email HTML stays in the raw archive until raw_email() asks for it.
+    """
+    __slots__ = ('email_id', 'card_name', 'merchant_name', 'transaction_date', 'amount', 'raw_email_hash')
+
+    def __init__(self, card_name=None, merchant_name=None, transaction_date=None, amount=None, email_id=None,
+                 raw_email_hash=None):
+        self.email_id = email_id
+        self.card_name = card_name
+        self.merchant_name = merchant_name
+        self.transaction_date = transaction_date
+        self.amount = amount
+        self.raw_email_hash = raw_email_hash
+
+    @classmethod
+    def from_record(cls, record):
+        """Build from a bronze record, leaving out raw_email_data and any other fields"""
+        return cls(**{field: record.get(field) for field in cls.__slots__})
+
+    def to_record(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def raw_email(self, archive=None):
+        """Fetch the raw email HTML from the archive, or None if it wasn't archived"""
+        if not self.raw_email_hash:
+            return None
+        return (archive or RawArchive()).get(self.raw_email_hash)
+
+    def __eq__(self, other):
+        return isinstance(other, Transaction) and self.to_record() == other.to_record()
+
+    def __repr__(self):
+        return f"Transaction({', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)})"
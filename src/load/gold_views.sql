@@ -20,7 +20,7 @@ ORDER BY month DESC, total_spent DESC;
 -- Shows which merchants you spend the most money at
 CREATE OR REPLACE VIEW gold.top_merchants AS
 SELECT
-    merchant_name,
+    COALESCE(canonical_merchant, merchant_name) AS merchant_name,
     category,
     COUNT(*) AS visit_count,
     SUM(amount) AS total_spent,
@@ -28,7 +28,7 @@ SELECT
     MIN(transaction_date) AS first_visit,
     MAX(transaction_date) AS last_visit
 FROM silver.transactions
-GROUP BY merchant_name, category
+GROUP BY COALESCE(canonical_merchant, merchant_name), category
 ORDER BY total_spent DESC;
 
 -- VIEW 3: Card Usage Statistics
@@ -39,7 +39,7 @@ SELECT
     COUNT(*) AS transaction_count,
     SUM(amount) AS total_spent,
     AVG(amount) AS avg_transaction,
-    COUNT(DISTINCT merchant_name) AS unique_merchants,
+    COUNT(DISTINCT COALESCE(canonical_merchant, merchant_name)) AS unique_merchants,
     COUNT(DISTINCT category) AS categories_used,
     MIN(transaction_date) AS first_transaction,
     MAX(transaction_date) AS last_transaction
@@ -83,7 +83,7 @@ SELECT
     COUNT(*) AS transaction_count,
     SUM(amount) AS total_spent,
     AVG(amount) AS avg_transaction,
-    COUNT(DISTINCT merchant_name) AS unique_merchants,
+    COUNT(DISTINCT COALESCE(canonical_merchant, merchant_name)) AS unique_merchants,
     COUNT(DISTINCT category) AS categories_used
 FROM silver.transactions
 GROUP BY DATE_TRUNC('month', transaction_date)
@@ -9,6 +9,7 @@ CREATE TABLE silver.transactions (
     id SERIAL PRIMARY KEY,
     transaction_date DATE NOT NULL,
     merchant_name VARCHAR(255) NOT NULL,
+    canonical_merchant VARCHAR(255),
     amount NUMERIC(10, 2) NOT NULL,
     card_name VARCHAR(50) NOT NULL,
     category VARCHAR(50) NOT NULL,
@@ -20,4 +21,5 @@ CREATE INDEX idx_transaction_date ON silver.transactions(transaction_date);
 CREATE INDEX idx_category ON silver.transactions(category);
 CREATE INDEX idx_card_name ON silver.transactions(card_name);
 CREATE INDEX idx_merchant_name ON silver.transactions(merchant_name);
+CREATE INDEX idx_canonical_merchant ON silver.transactions(canonical_merchant);
 
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import sys
+from collections import OrderedDict
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+from atomic_write import write_json_atomic
+
+CACHE_FILE = 'data/cache/categorization_cache.json'
+MAX_CACHE_ENTRIES = 50_000
+
+def model_version(model_files):
+    """Fingerprint the model artifacts, so retraining invalidates cached categories"""
+    digest = hashlib.sha256()
+    for path in model_files:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+class CategorizationCache:
+    """LRU cache of model predictions keyed by the exact feature tuple
+
+    Keys are (merchant, amount bucket, card index, day), so a hit returns exactly
+    what the model would predict. The cache is tagged with the model version and
+    persisted as JSON between runs; a file written for another model version is
+    ignored. Holds at most max_entries, evicting the least recently used.
+    """
+
+    def __init__(self, version, path=CACHE_FILE, max_entries=MAX_CACHE_ENTRIES):
+        self.version = version
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except ValueError:
+            print(f"   Ignoring unreadable categorization cache {self.path}")
+            return
+
+        if data.get('model_version') != self.version:
+            print("   Model changed since the categorization cache was written, starting fresh")
+            return
+
+        #Entries are stored least recently used first
+        for merchant, bucket, card_idx, day, category in data['entries'][-self.max_entries:]:
+            self.entries[(merchant, bucket, card_idx, day)] = category
+
+    def get(self, key):
+        """Return the cached category for a feature tuple, or None"""
+        category = self.entries.get(key)
+        if category is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return category
+
+    def put(self, key, category):
+        self.entries[key] = category
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """Persist the cache atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'model_version': self.version,
+            'entries': [[*key, category] for key, category in self.entries.items()]
+        }
+        write_json_atomic(self.path, data, indent=None)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,58 @@
+import json
+import os
+from merchant_normalizer import canonical_merchant
+
+LABELED_FILE = 'data/labeled_transactions.json'
+OVERRIDES_FILE = 'data/category_overrides.json'
+#Every category a label can take, in the order the labeling tool numbers them
+CATEGORIES = ['Groceries', 'Dining', 'Transportation', 'Shopping', 'Entertainment', 'Bills', 'Travel',
+              'Subscriptions', 'Other']
+
+def load_merchant_map(path):
+    """Load a {merchant: category} JSON file, or {} if it doesn't exist"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+class MerchantLookup:
+    """O(1) merchant -> category lookup, exact first, then by canonical merchant
+
+    Canonical merchants that different raw names map to different categories are
+    dropped, so a loose match never has to guess.
+    """
+
+    def __init__(self, mapping):
+        self.exact = {merchant.strip(): category for merchant, category in mapping.items()}
+        self.normalized = {}
+        ambiguous = set()
+
+        for merchant, category in self.exact.items():
+            key = canonical_merchant(merchant)
+            if self.normalized.setdefault(key, category) != category:
+                ambiguous.add(key)
+
+        for key in ambiguous:
+            del self.normalized[key]
+        self.normalized.pop('', None)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def get(self, merchant):
+        """Return (category, matched exactly) or None"""
+        if not merchant:
+            return None
+        merchant = merchant.strip()
+        if merchant in self.exact:
+            return self.exact[merchant], True
+
+        category = self.normalized.get(canonical_merchant(merchant))
+        return (category, False) if category is not None else None
+
+def load_category_lookups(overrides_file=OVERRIDES_FILE, labeled_file=LABELED_FILE):
+    """Return the (tier name, MerchantLookup) tiers consulted before the model, highest priority first"""
+    return [
+        ('override', MerchantLookup(load_merchant_map(overrides_file))),
+        ('labeled', MerchantLookup(load_merchant_map(labeled_file))),
+    ]
@@ -0,0 +1,116 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from transaction_dates import parse_dates
+
+AMOUNT_BUCKET_EDGES = [2.0, 10.0, 30.0, 75.0, 150.0]
+#Bucket for a missing or zero amount, so neither reads as a tiny charge
+UNKNOWN_AMOUNT_BUCKET = 2
+UNKNOWN_CARD = 'Unknown'
+
+def amount_bucket(amt):
+    """Categorize amounts into meaninful buckets"""
+    if amt is None or amt == 0 or amt != amt:
+        return UNKNOWN_AMOUNT_BUCKET
+    if amt < 2.0:
+        return 0 #Tiny (gas authorization, parking)
+    elif amt < 10.0:
+        return 1 #Small (some food, sweet treats)
+    elif amt < 30.0:
+        return 2 #Medium (dining at restaraunt, small shopping)
+    elif amt < 75.0:
+        return 3 #Large (groceries, full gas fillup)
+    elif amt < 150.0:
+        return 4 #Very Large (shopping, travel, some bills)
+    else:
+        return 5 #Huge (large shopping, travel)
+
+def amount_buckets(amounts):
+    """Vectorized amount_bucket over a list, array or Series of amounts (None and NaN allowed)"""
+    values = np.asarray(amounts, dtype=float)
+    buckets = np.digitize(values, AMOUNT_BUCKET_EDGES)
+    buckets[np.isnan(values) | (values == 0)] = UNKNOWN_AMOUNT_BUCKET
+    return buckets
+
+def _card(card):
+    return UNKNOWN_CARD if card is None or card != card else card
+
+class FeaturePipeline:
+    """Turns transaction columns into categorizer features, a whole batch at a time
+
+    Features are the merchant vectorizer's columns followed by amount bucket,
+    card index and day of month. The pipeline holds the fitted vectorizer and
+    the card mapping and is pickled next to the model, so training and
+    transform build features with the same code. Merchants are expected to be
+    canonical already unless canonical_merchants is off, which marks a model
+    trained on raw descriptors.
+    """
+
+    #Class default, so pipelines pickled before the flag existed (all trained on canonical names) read True
+    canonical_merchants = True
+
+    def __init__(self, vectorizer, card_mapping=None, canonical_merchants=True):
+        self.vectorizer = vectorizer
+        self.card_mapping = dict(card_mapping or {})
+        self.canonical_merchants = canonical_merchants
+
+    def fit(self, merchants, card_names):
+        """Fit the vectorizer on merchants and give cards it hasn't seen the next free indexes"""
+        self.vectorizer.fit(merchants)
+        self.add_cards(card_names)
+        return self
+
+    def add_cards(self, card_names):
+        """Map new cards to the next free indexes, leaving existing ones where a model learned them"""
+        for card in sorted({_card(card) for card in card_names} - self.card_mapping.keys()):
+            self.card_mapping[card] = len(self.card_mapping)
+
+    def card_indexes(self, card_names):
+        """Card index per row; a missing card counts as 'Unknown' and unmapped cards as index 0"""
+        return np.array([self.card_mapping.get(_card(card), 0) for card in card_names], dtype=int)
+
+    def keys(self, merchants, amounts, card_names, date_strs):
+        """Feature tuples (merchant, amount bucket, card index, day) per row, plus the ParsedDates behind them
+
+        Equal tuples get equal features, which is what the prediction cache keys on.
+        """
+        parsed = parse_dates(date_strs)
+        buckets = amount_buckets(amounts).tolist()
+        cards = self.card_indexes(card_names).tolist()
+        return list(zip(merchants, buckets, cards, parsed.days.tolist())), parsed
+
+    def transform_keys(self, keys):
+        """Feature matrix for feature tuples from keys()"""
+        return self._stack([key[0] for key in keys], np.array([key[1:] for key in keys], dtype=int).reshape(-1, 3))
+
+    def transform(self, transactions):
+        """Feature matrix for a DataFrame with merchant_name, amount, card_name and transaction_date columns"""
+        numeric = np.column_stack([
+            amount_buckets(transactions['amount']),
+            self.card_indexes(transactions['card_name']),
+            parse_dates(transactions['transaction_date']).days
+        ])
+        return self._stack(transactions['merchant_name'], numeric)
+
+    def _stack(self, merchants, numeric):
+        """Append the numeric columns to each row of the vectorized merchants, building the CSR arrays directly
+
+        Same matrix as hstack([text, csr_matrix(numeric)]), without its per-call
+        COO round trip, which dominates single-row featurizing.
+        """
+        text = self.vectorizer.transform(merchants).tocsr()
+        rows, text_columns = text.shape
+        numeric = np.asarray(numeric, dtype=float).reshape(rows, -1)
+        width = numeric.shape[1]
+
+        indptr = text.indptr + width * np.arange(rows + 1)
+        numeric_positions = ((indptr[:-1] + np.diff(text.indptr))[:, None] + np.arange(width)).ravel()
+        text_positions = np.ones(indptr[-1], dtype=bool)
+        text_positions[numeric_positions] = False
+
+        data = np.empty(indptr[-1])
+        indices = np.empty(indptr[-1], dtype=text.indices.dtype)
+        data[text_positions] = text.data
+        indices[text_positions] = text.indices
+        data[numeric_positions] = numeric.ravel()
+        indices[numeric_positions] = np.tile(np.arange(text_columns, text_columns + width), rows)
+        return csr_matrix((data, indices, indptr), shape=(rows, text_columns + width))
@@ -1,10 +1,20 @@
 import json 
 import os 
-from pathlib import Path 
+import sys
+sys.path.insert(0, 'src/extract')
+from bronze_reader import drop_repeated_emails, read_bronze
+from category_lookup import CATEGORIES, MerchantLookup
+from email_parser import strip_html_tags
+from merchant_normalizer import canonical_merchant
+from raw_archive import RawArchive
 
 def load_unlabeled_transactions():
-    """Load all transactions that haven't been labeled yet"""
-    bronze_dir = Path("data/bronze")
+    """Load all transactions that haven't been labeled yet, grouped by canonical merchant
+
+    Returns ({canonical merchant: DataFrame of its transactions}, labeled). A
+    merchant counts as labeled if any store of it is. Only the merchant, amount
+    and raw email hash are read; email bodies stay in the raw archive.
+    """
     labeled_file = "data/labeled_transactions.json"
 
     labeled = {}
@@ -12,61 +22,56 @@ def load_unlabeled_transactions():
         with open(labeled_file, 'r') as f:
             labeled = json.load(f)
         
-    unlabeled = []
-    for json_file in bronze_dir.glob("*.json"):
-        with open(json_file, 'r') as f:
-            transaction = json.load(f)
-            merchant = transaction.get('merchant_name', '').strip()
-
-            if merchant and merchant not in labeled:
-                unlabeled.append(transaction)
+    lookup = MerchantLookup(labeled)
+    transactions = drop_repeated_emails(read_bronze(fields=['merchant_name', 'amount', 'email_id', 'raw_email_hash']))
+    transactions['merchant_name'] = transactions['merchant_name'].fillna('').str.strip()
+
+    merchants = transactions['merchant_name'].unique()
+    unlabeled_merchants = [merchant for merchant in merchants if merchant and lookup.get(merchant) is None]
+    transactions = transactions[transactions['merchant_name'].isin(unlabeled_merchants)]
+
+    canonical = transactions['merchant_name'].map(canonical_merchant)
+    unlabeled = {merchant: group for merchant, group in transactions.groupby(canonical, sort=False)}
     
     return unlabeled, labeled 
 
+def email_preview(transactions, archive):
+    """Text of one archived alert email behind a merchant's transactions"""
+    hashes = [body_hash for body_hash in transactions['raw_email_hash'].dropna() if body_hash in archive]
+    if not hashes:
+        return "(no archived email for this merchant)"
+    return strip_html_tags(archive.get(hashes[0]))
+
 def label_interactive():
     """"Interactive labeling tool"""
-    categories = [
-        "1. Groceries", 
-        "2. Dining",
-        "3. Transportation",
-        "4. Shopping",
-        "5. Entertainment",
-        "6. Bills",
-        "7. Travel",
-        "8. Subscriptions",
-        "9. Other"
-    ]
-
-    category_map = {
-        "1": "Groceries", "2": "Dining", "3": "Transportation", "4":"Shopping",
-        "5":"Entertainment","6":"Bills", "7":"Travel", "8":"Subscriptions",
-        "9":"Other"
-    }
+    category_map = {str(number): category for number, category in enumerate(CATEGORIES, 1)}
 
     unlabeled, labeled = load_unlabeled_transactions()
+    archive = RawArchive()
 
     print(f"\n=== MERCHANT LABELING TOOL ===")
-    print(f"Unlabeled transactions: {len(unlabeled)}")
+    print(f"Unlabeled transactions: {sum(len(group) for group in unlabeled.values())} "
+          f"from {len(unlabeled)} merchants")
     print(f"Already labeled: {len(labeled)}")
     print(f"\nCategories:")
-    for cat in categories:
-        print(f" {cat}")
-    print(f"\nPress 'q' to quit and save\n")
+    for number, category in category_map.items():
+        print(f" {number}. {category}")
+    print(f"\nPress 'v' to read an alert email, 'q' to quit and save\n")
 
     labeled_count = 0 
 
-    for transaction in unlabeled: 
-        merchant = transaction.get('merchant_name', '').strip()
-        amount = transaction.get('amount', 0)
-
-        if not merchant: 
-            continue 
+    for merchant, transactions in unlabeled.items(): 
+        raw_names = sorted(transactions['merchant_name'].unique())
 
-        print(f"\n--- Transaction #{labeled_count + 1} ---")
+        print(f"\n--- Merchant #{labeled_count + 1} ---")
         print(f"Merchant: {merchant}")
-        print(f"Amount: ${amount}")
+        print(f"Seen as: {', '.join(raw_names[:3])}{' ...' if len(raw_names) > 3 else ''}")
+        print(f"Transactions: {len(transactions)}, e.g. ${transactions['amount'].iloc[0]}")
 
-        choice = input("Category (1-9) or 'q' to quit: ").strip()
+        choice = input("Category (1-9), 'v' to view an email or 'q' to quit: ").strip()
+        while choice.lower() == 'v':
+            print(email_preview(transactions, archive))
+            choice = input("Category (1-9) or 'q' to quit: ").strip()
 
         if choice.lower() == 'q':
             break
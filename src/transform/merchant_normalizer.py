@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+
+#Card processors that put their own name in front of the merchant's: "SQ *BLUE BOTTLE", "TST* BULL CITY BURGER"
+PROCESSOR_PREFIX = re.compile(r'^(SQ|TST|SP|PAYPAL|PP|PY|DD|IC|CKE|BT|FS|SEAMLSS|LEVELUP|TOAST|CLOVER)\s?\*\s*')
+#Order / terminal ids glued on with a star: "AMZN MKTP US*2K4AB1ZX2"
+STAR_REFERENCE = re.compile(r'\*\s*[A-Z0-9]*\d[A-Z0-9]*\b')
+#A token that is a store number or reference code rather than part of the name: "#1180", "22093", "P39261"
+CODE_TOKEN = re.compile(r'#?[A-Z]{0,2}\d[A-Z0-9]*|#')
+APOSTROPHE = re.compile(r"['’]")
+WHITESPACE = re.compile(r'\s+')
+
+US_STATES = frozenset(
+    'AL AK AZ AR CA CO CT DE DC FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE NV NH NJ NM NY NC ND '
+    'OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY'.split()
+)
+TRAILING_NOISE = US_STATES | {'STORE', 'STORES', 'INC', 'LLC', 'CORP'}
+
+MERCHANT_ALIASES = [
+    (re.compile(r'^AMZN MKTP\b.*|^AMAZON MKTPL.*'), 'AMAZON MKTPLACE'),
+    (re.compile(r'^WHOLEFDS\b.*'), 'WHOLE FOODS'),
+    (re.compile(r'^WM SUPERCENTER\b.*|^WAL-MART\b.*'), 'WALMART'),
+]
+
+@lru_cache(maxsize=65536)
+def canonical_merchant(merchant):
+    """Map a raw card descriptor to the merchant behind it
+
+    Processor prefixes, store numbers, reference codes and everything after them
+    (usually the city and state) are dropped: 'SQ *BLUE BOTTLE #12 OAKLAND CA' and
+    'Blue Bottle 0041' both become 'BLUE BOTTLE'. Canonical names map to
+    themselves. Memoized, since the same few hundred merchants repeat all year.
+    """
+    if not merchant:
+        return ''
+
+    name = WHITESPACE.sub(' ', APOSTROPHE.sub('', merchant.upper())).strip()
+    processor = None
+    match = PROCESSOR_PREFIX.match(name)
+    if match:
+        processor = match.group(1)
+        name = name[match.end():]
+    name = STAR_REFERENCE.sub(' ', name).replace('*', ' ')
+
+    kept = []
+    for token in name.split():
+        #A leading number is part of the name ("7-ELEVEN", "76") unless a processor prefix came before it
+        if token == '-' or ((kept or processor) and CODE_TOKEN.fullmatch(token)):
+            break
+        kept.append(token)
+
+    while len(kept) > 1 and kept[-1] in TRAILING_NOISE:
+        kept.pop()
+
+    canonical = ' '.join(kept).strip(' ,.-')
+    for pattern, alias in MERCHANT_ALIASES:
+        if pattern.match(canonical):
+            return alias
+    return canonical or processor or WHITESPACE.sub(' ', merchant.upper()).strip()
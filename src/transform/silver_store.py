@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+sys.path.insert(0, 'src/extract')
+from atomic_write import atomic_output, write_json_atomic
+from bronze_reader import EMAIL_KEY_FIELDS, TRANSACTION_FIELDS, json_tasks, read_bronze_tasks, segment_tasks
+from bronze_store import BRONZE_DIR, list_bronze_inputs
+
+SILVER_DIR = 'data/silver/transactions'
+MANIFEST_FILE = '_manifest.json'  # leading underscore keeps Parquet dataset readers off it
+LEGACY_SILVER_FILE = 'transactions.parquet'
+
+#Bump when SILVER_SCHEMA or the file layout changes, so existing silver is rebuilt rather than mixed with new files
+SILVER_SCHEMA_VERSION = 5
+SILVER_SCHEMA = pa.schema([
+    ('transaction_date', pa.string()),
+    ('merchant_name', pa.string()),
+    ('canonical_merchant', pa.string()),
+    ('amount', pa.float64()),
+    ('card_name', pa.string()),
+    ('category', pa.string()),
+    ('email_id', pa.string()),
+    ('raw_email_hash', pa.string()),
+])
+DICTIONARY_COLUMNS = ['merchant_name', 'canonical_merchant', 'card_name', 'category']
+ROW_GROUP_ROWS = 64_000
+#Rows without a transaction date; the leading underscore keeps Hive dataset discovery from mixing them in
+UNDATED_PARTITION = '_undated'
+
+def empty_manifest():
+    return {'schema_version': SILVER_SCHEMA_VERSION, 'inputs': {}, 'partitions': {}}
+
+def load_silver_manifest(silver_dir=SILVER_DIR):
+    """Load the record of which bronze inputs silver already covers, or None if there is none"""
+    manifest_path = Path(silver_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def save_silver_manifest(manifest, silver_dir=SILVER_DIR):
+    write_json_atomic(Path(silver_dir) / MANIFEST_FILE, manifest)
+
+def clear_silver(silver_dir=SILVER_DIR):
+    """Delete every silver output, including older flat layouts, so the next transform starts from scratch"""
+    silver_dir = Path(silver_dir)
+    for path in [*silver_dir.glob('year=*'), silver_dir / UNDATED_PARTITION]:
+        if path.exists():
+            shutil.rmtree(path)
+    for path in [*silver_dir.glob('part-*.parquet'), silver_dir / LEGACY_SILVER_FILE, silver_dir / MANIFEST_FILE]:
+        if path.exists():
+            path.unlink()
+
+def remove_orphan_parts(manifest, silver_dir=SILVER_DIR):
+    """Delete partition files the manifest doesn't name: left by a crashed run, or replaced but not yet removed"""
+    silver_dir = Path(silver_dir)
+    for path in [*silver_dir.glob('year=*/month=*/*'), *silver_dir.glob(f'{UNDATED_PARTITION}/*')]:
+        key = path.parent.relative_to(silver_dir).as_posix()
+        if manifest['partitions'].get(key) != path.name:
+            print(f"   Removing unrecorded silver file {key}/{path.name}")
+            path.unlink()
+
+def partition_key(date_str):
+    """Hive partition directory for an ISO transaction date, e.g. 'year=2025/month=01'"""
+    if not date_str:
+        return UNDATED_PARTITION
+    return f"year={date_str[:4]}/month={date_str[5:7]}"
+
+def _input_key(path, bronze_dir):
+    return Path(path).relative_to(bronze_dir).as_posix()
+
+def _stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _hash_prefixes(path, offset, end, block_bytes=1024 * 1024):
+    """SHA-256 of a file's first offset bytes and of its first end bytes, in one blockwise pass"""
+    digest = hashlib.sha256()
+    prefix = None
+    position = 0
+    with open(path, 'rb') as f:
+        while position < end:
+            if position == offset:
+                prefix = digest.hexdigest()
+            block = f.read(min(block_bytes, (offset if position < offset else end) - position))
+            if not block:
+                break
+            digest.update(block)
+            position += len(block)
+    return prefix if prefix is not None else digest.hexdigest(), digest.hexdigest()
+
+def _last_line_end(path, size, block_bytes=1024 * 1024):
+    """Offset just past a file's last newline, reading backwards from the end"""
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            start = max(0, position - block_bytes)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+def read_new_bronze(manifest, bronze_dir=BRONZE_DIR, fields=TRANSACTION_FIELDS, workers=None):
+    """Collect bronze records the manifest doesn't cover yet
+
+    Legacy JSON files are tracked by name and SHA-256 (re-hashed only when their
+    size or mtime moves). Segments are append-only, so they are tracked by how far
+    they have been consumed plus a hash of that prefix; a segment that grew has its
+    prefix re-verified and only the new lines read. Decoding the new records is
+    fanned out over a process pool by read_bronze_tasks.
+
+    Returns (records, inputs, changed): records is a DataFrame of fields, inputs
+    is the updated manifest 'inputs' map, and changed lists inputs that were
+    rewritten since they were transformed and need a full rebuild.
+    """
+    bronze_dir = Path(bronze_dir)
+    inputs = dict(manifest['inputs'])
+    new_json = []
+    new_ranges = []
+    changed = []
+
+    for path in list_bronze_inputs(bronze_dir):
+        key = _input_key(path, bronze_dir)
+        entry = inputs.get(key)
+        size, mtime_ns = _stat(path)
+
+        if path.suffix == '.jsonl':
+            if entry and size == entry['offset']:
+                continue
+
+            offset = entry['offset'] if entry else 0
+            end = _last_line_end(path, size)
+            if entry and size < offset:
+                changed.append(key)
+                continue
+
+            prefix_sha256, sha256 = _hash_prefixes(path, offset, max(end, offset))
+            if entry and prefix_sha256 != entry['sha256']:
+                changed.append(key)
+                continue
+            if end <= offset:
+                continue
+            new_ranges.append((path, offset, end))
+            inputs[key] = {'offset': end, 'sha256': sha256}
+        else:
+            if entry and (size, mtime_ns) == (entry['size'], entry['mtime_ns']):
+                continue
+
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            if entry and digest != entry['sha256']:
+                changed.append(key)
+                continue
+
+            if not entry:
+                new_json.append(path)
+            inputs[key] = {'sha256': digest, 'size': size, 'mtime_ns': mtime_ns}
+
+    tasks = json_tasks(new_json)
+    for path, offset, end in new_ranges:
+        tasks.extend(segment_tasks(path, offset, end))
+    return read_bronze_tasks(tasks, fields, workers), inputs, changed
+
+def write_silver_partitions(df, manifest, silver_dir=SILVER_DIR):
+    """Merge new silver rows into their month partitions, rewriting only the months they touch
+
+    Each partition is one Parquet file, sorted by transaction_date so row-group
+    statistics can prune date ranges, zstd-compressed, with dictionary-encoded
+    text columns. New files are named in manifest['partitions']. Returns
+    (partition keys written, paths of the files they replace); the replaced files
+    should be deleted once the manifest is saved.
+    """
+    silver_dir = Path(silver_dir)
+    table = pa.Table.from_pandas(df[SILVER_SCHEMA.names], schema=SILVER_SCHEMA, preserve_index=False)
+    keys = pa.array([partition_key(date_str) for date_str in df['transaction_date']])
+    written = pc.unique(keys).to_pylist()
+    stale = []
+
+    for key in written:
+        partition_dir = silver_dir / key
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        rows = table.filter(pc.equal(keys, key))
+
+        old_name = manifest['partitions'].get(key)
+        if old_name:
+            rows = pa.concat_tables([pq.read_table(partition_dir / old_name, schema=SILVER_SCHEMA), rows])
+            stale.append(partition_dir / old_name)
+        rows = rows.sort_by([('transaction_date', 'ascending')])
+
+        name = f"part-{datetime.now():%Y%m%dT%H%M%S%f}.parquet"
+        with atomic_output(partition_dir / name) as tmp_path:
+            pq.write_table(rows, tmp_path, compression='zstd', use_dictionary=DICTIONARY_COLUMNS,
+                           row_group_size=ROW_GROUP_ROWS)
+        manifest['partitions'][key] = name
+
+    return written, stale
+
+def _in_range(key, start, end):
+    if key == UNDATED_PARTITION:
+        return False
+    year, month = (part.split('=', 1)[1] for part in key.split('/'))
+    return (start is None or f"{year}-{month}" >= start[:7]) and (end is None or f"{year}-{month}" <= end[:7])
+
+def silver_email_keys(manifest, silver_dir=SILVER_DIR):
+    """(email_ids, raw email hashes) already in the partitions the manifest lists, reading only those columns"""
+    paths = [str(Path(silver_dir) / key / name) for key, name in manifest['partitions'].items()]
+    if not paths:
+        return set(), set()
+    table = ds.dataset(paths, schema=SILVER_SCHEMA, format='parquet').to_table(columns=EMAIL_KEY_FIELDS)
+    return tuple(set(pc.unique(table[field]).drop_null().to_pylist()) for field in EMAIL_KEY_FIELDS)
+
+def read_silver(silver_dir=SILVER_DIR, start=None, end=None):
+    """Read the silver rows the manifest lists, optionally only those dated within [start, end]
+
+    start and end are ISO dates. Whole months outside the range are skipped by
+    partition, and row groups inside a month by their min/max statistics. Rows
+    without a date are only returned when no range is given.
+    """
+    manifest = load_silver_manifest(silver_dir)
+    if manifest is None:
+        return SILVER_SCHEMA.empty_table().to_pandas()
+
+    paths = [
+        str(Path(silver_dir) / key / name)
+        for key, name in sorted(manifest.get('partitions', {}).items())
+        if (start is None and end is None) or _in_range(key, start, end)
+    ]
+    condition = None
+    if start is not None:
+        condition = pc.field('transaction_date') >= start
+    if end is not None:
+        upper = pc.field('transaction_date') <= end
+        condition = upper if condition is None else condition & upper
+
+    return ds.dataset(paths, schema=SILVER_SCHEMA, format='parquet').to_table(filter=condition).to_pandas()
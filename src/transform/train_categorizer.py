@@ -1,184 +1,261 @@
+import argparse
 import json
+import os
 import pickle
+import sys
+import time
 from pathlib import Path
-from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import classification_report, accuracy_score, f1_score
 import numpy as np
-from scipy.sparse import hstack, csr_matrix
+import pandas as pd
+sys.path.insert(0, 'src/extract')
+from bronze_store import BRONZE_DIR
+from category_lookup import CATEGORIES, LABELED_FILE, MerchantLookup
+from feature_pipeline import FeaturePipeline
+from merchant_normalizer import canonical_merchant
+from training_cache import TRAINING_CACHE_DIR, load_labeled_rows, load_labels
+from transaction_dates import parse_dates
+
+MODELS_DIR = "models"
+MODEL_FILE = "merchant_categorizer.pkl"
+FEATURE_PIPELINE_FILE = "feature_pipeline.pkl"
+#The labels the model in models/ was last trained on, so --incremental knows what is new
+TRAINING_STATE_FILE = "training_state.json"
+HASHING_FEATURES = 2 ** 18
+INCREMENTAL_EPOCHS = 20
+#Already-trained rows replayed per newly labeled row, so folding in new merchants doesn't drown the old ones
+REHEARSAL_RATIO = 4
+
+def load_training_data(labeled_file=LABELED_FILE, bronze_dir=BRONZE_DIR, trained_labels=None,
+                       cache_dir=TRAINING_CACHE_DIR):
+    """Load labeled merchants and merge with transaction data from bronze into a DataFrame
+
+    Bronze is read through the training cache, so only bronze added since the
+    last run is scanned. Returns (transactions, labeled merchants). With
+    trained_labels (the labels a previous run trained on), a new_label column
+    marks the rows whose category those labels didn't already give.
+    """
 
-def load_training_data():
-    """Load labeled merchants and merge with full transaction data from bronze"""
-    
     print("Loading labeled merchants...")
-    with open("data/labeled_transactions.json", 'r') as f:
-        labeled_merchants = json.load(f)
-    
+    labeled_merchants, labels_sha256 = load_labels(labeled_file)
     print(f"Found {len(labeled_merchants)} labeled merchants")
-    
+
     print("Loading transactions from bronze layer...")
-    bronze_dir = Path("data/bronze")
-    transactions = []
-    
-    for json_file in bronze_dir.glob("*.json"):
-        with open(json_file, 'r') as f:
-            transaction = json.load(f)
-            merchant = transaction.get('merchant_name', '').strip()
-            
-            if merchant in labeled_merchants:
-                transactions.append({
-                    'merchant_name': merchant,
-                    'amount': transaction.get('amount', 0),
-                    'card_name': transaction.get('card_name', 'Unknown'),
-                    'transaction_date': transaction.get('transaction_date', ''),
-                    'category': labeled_merchants[merchant]
-                })
-    
+    rows = load_labeled_rows(labeled_merchants, labels_sha256, bronze_dir, cache_dir)
+
+    #Labels apply to every store of the canonical merchant, and the model learns from canonical names
+    transactions = rows.assign(merchant_name=rows['canonical_merchant']).drop(columns='canonical_merchant')
+    if trained_labels is not None:
+        previous = MerchantLookup(trained_labels)
+        new_labels = set()
+        for merchant, category in rows[['merchant_name', 'category']].drop_duplicates().itertuples(index=False):
+            trained = previous.get(merchant)
+            if trained is None or trained[0] != category:
+                new_labels.add(merchant)
+        transactions['new_label'] = rows['merchant_name'].isin(new_labels)
+
     print(f"Found {len(transactions)} transactions matching labeled merchants\n")
-    return transactions
+    return transactions, labeled_merchants
+
+def fit_full(transactions, card_names):
+    """Fit a TF-IDF vocabulary and logistic regression on transactions from scratch"""
+    pipeline = FeaturePipeline(TfidfVectorizer(lowercase=True, ngram_range=(1, 2)))
+    pipeline.fit(transactions['merchant_name'], card_names)
+    model = LogisticRegression(
+        class_weight='balanced',
+        max_iter=2000,
+        random_state=42
+    )
+    model.fit(pipeline.transform(transactions), transactions['category'])
+    return model, pipeline
+
+def online_vectorizer():
+    """Stateless merchant featurizer: there is no vocabulary to refit when new merchants are labeled"""
+    return HashingVectorizer(lowercase=True, ngram_range=(1, 2), n_features=HASHING_FEATURES, alternate_sign=False)
+
+def is_online_model(model, pipeline):
+    return isinstance(model, SGDClassifier) and isinstance(getattr(pipeline, 'vectorizer', None), HashingVectorizer)
 
-def extract_date_features(date_str):
-    """Extract day of month from transaction date"""
-    if not date_str:
-        return 15
-    
+def fit_online(transactions, pipeline=None, model=None, epochs=INCREMENTAL_EPOCHS):
+    """Fold transactions into an SGD model with partial_fit, starting a new model if none is given"""
+    pipeline = pipeline or FeaturePipeline(online_vectorizer())
+    pipeline.add_cards(transactions['card_name'])
+    model = model or SGDClassifier(loss='log_loss', random_state=42)
+    features = pipeline.transform(transactions)
+    labels = transactions['category'].to_numpy()
+    rng = np.random.default_rng(42)
+    for _ in range(epochs):
+        order = rng.permutation(len(labels))
+        model.partial_fit(features[order], labels[order], classes=CATEGORIES)
+    return model, pipeline
+
+def load_trained_model(models_dir=MODELS_DIR):
+    """(model, feature pipeline, training state) from models_dir, or Nones if there's no model with a pipeline yet"""
+    models_dir = Path(models_dir)
     try:
-        formats = [
-            "%B %d, %Y",
-            "%b %d, %Y at %I:%M %p ET",
-        ]
-        
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(date_str.strip(), fmt)
-                return dt.day
-            except ValueError:
-                continue
-        return 15
-    except:
-        return 15
-
-def amount_bucket(amt):
-    """Categorize amounts into meaninful buckets"""
-    if amt < 2.0:
-        return 0 #Tiny (gas authorization, parking )
-    elif amt < 10.0:
-        return 1  #Small (some food, sweet treats)
-    elif amt < 30.0:
-        return 2 #Medium (dining at restaraunt, small shopping)
-    elif amt < 75.0:
-        return 3 #Large (groceries, full gas fillup)
-    elif amt < 150.0: 
-        return 4 # Very Large (shopping, travel, some bills)
-    else: 
-        return 5 # Huge (large shopping, travel)
-    
-def train_model():
+        artifacts = []
+        for name in [MODEL_FILE, FEATURE_PIPELINE_FILE]:
+            with open(models_dir / name, 'rb') as f:
+                artifacts.append(pickle.load(f))
+    except FileNotFoundError:
+        return None, None, {}
+    state_file = models_dir / TRAINING_STATE_FILE
+    state = json.loads(state_file.read_text()) if state_file.exists() else {}
+    return (*artifacts, state)
+
+def save_model(model, pipeline, labeled_merchants, models_dir=MODELS_DIR):
+    """Write the model and feature pipeline transform loads, plus the labels they were trained on"""
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    for name, artifact in [(MODEL_FILE, model), (FEATURE_PIPELINE_FILE, pipeline)]:
+        with open(models_dir / name, 'wb') as f:
+            pickle.dump(artifact, f)
+    (models_dir / TRAINING_STATE_FILE).write_text(json.dumps({'labels': labeled_merchants}, indent=2))
+
+    print(f"Model saved to {models_dir / MODEL_FILE}")
+    print(f"Feature pipeline saved to {models_dir / FEATURE_PIPELINE_FILE}")
+
+def train_model(models_dir=MODELS_DIR, labeled_file=LABELED_FILE, bronze_dir=BRONZE_DIR,
+                cache_dir=TRAINING_CACHE_DIR):
     """Train merchant categorization model with enhanced features"""
-    
-    transactions = load_training_data()
-    
+
+    transactions, labeled_merchants = load_training_data(labeled_file, bronze_dir, cache_dir=cache_dir)
+
     if len(transactions) < 50:
         print("ERROR: Not enough transactions found.")
         return
-    
-    merchant_names = [t['merchant_name'] for t in transactions]
-    amounts = [float(t['amount']) if t['amount'] else 0.0 for t in transactions]
-    amount_buckets = [amount_bucket(amt) for amt in amounts]
-    card_names = [t['card_name'] for t in transactions]
-    dates = [extract_date_features(t['transaction_date']) for t in transactions]
-    categories = [t['category'] for t in transactions]
-    
+
+    merchant_names = transactions['merchant_name'].tolist()
+    amounts = transactions['amount'].fillna(0.0).astype(float).tolist()
+    card_names = transactions['card_name'].tolist()
+    parsed_dates = parse_dates(transactions['transaction_date'])
+    categories = transactions['category'].tolist()
+
     print("=== FEATURE SUMMARY ===")
     print(f"Total transactions: {len(transactions)}")
     print(f"Unique merchants: {len(set(merchant_names))}")
     print(f"Unique cards: {set(card_names)}")
     print(f"Amount range: ${min(amounts):.2f} - ${max(amounts):.2f}")
+    if parsed_dates.unparseable:
+        example = transactions['transaction_date'].iloc[parsed_dates.unparseable[0]]
+        print(f"Unparseable dates: {len(parsed_dates.unparseable)} (e.g. {example!r}), using day 15 for them")
     print(f"\nCategory distribution:")
     for cat in set(categories):
         count = categories.count(cat)
         print(f"  {cat}: {count}")
-    
-    indices = list(range(len(transactions)))
-    train_idx, test_idx = train_test_split(
-        indices, test_size=0.2, random_state=42, stratify=categories
+
+    train, test = train_test_split(
+        transactions, test_size=0.2, random_state=42, stratify=categories
     )
-    
-    print("\nVectorizing merchant names...")
-    vectorizer = TfidfVectorizer(lowercase=True, ngram_range=(1, 2))
-    
-    merchant_train = [merchant_names[i] for i in train_idx]
-    merchant_test = [merchant_names[i] for i in test_idx]
-    
-    X_merchant_train = vectorizer.fit_transform(merchant_train)
-    X_merchant_test = vectorizer.transform(merchant_test)
-    
-    print("Encoding card names...")
-    unique_cards = list(set(card_names))
-    card_to_idx = {card: idx for idx, card in enumerate(unique_cards)}
-    
-    card_train = np.array([[card_to_idx[card_names[i]]] for i in train_idx])
-    card_test = np.array([[card_to_idx[card_names[i]]] for i in test_idx])
-    
-    amount_train = np.array([[amount_buckets[i]] for i in train_idx])
-    amount_test = np.array([[amount_buckets[i]] for i in test_idx])
-    
-    date_train = np.array([[dates[i]] for i in train_idx])
-    date_test = np.array([[dates[i]] for i in test_idx])
-    
-    print("Combining features...")
-    X_train = hstack([
-        X_merchant_train,
-        csr_matrix(amount_train),
-        csr_matrix(card_train),
-        csr_matrix(date_train)
-    ])
-    
-    X_test = hstack([
-        X_merchant_test,
-        csr_matrix(amount_test),
-        csr_matrix(card_test),
-        csr_matrix(date_test)
-    ])
-    
-    y_train = [categories[i] for i in train_idx]
-    y_test = [categories[i] for i in test_idx]
-    
-    print(f"\nTraining set: {len(train_idx)} transactions")
-    print(f"Test set: {len(test_idx)} transactions")
-    
+
+    print(f"\nTraining set: {len(train)} transactions")
+    print(f"Test set: {len(test)} transactions")
+
     print("\nTraining model...")
-    model = LogisticRegression(
-        class_weight='balanced',
-        max_iter=2000,
-        random_state=42
-    )
-    model.fit(X_train, y_train)
-    
+    model, pipeline = fit_full(train, card_names)
+
     print("\n=== MODEL EVALUATION ===")
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
+    y_pred = model.predict(pipeline.transform(test))
+    accuracy = accuracy_score(test['category'], y_pred)
     print(f"Accuracy: {accuracy:.2%}")
-    
+
     print("\nDetailed Report:")
-    print(classification_report(y_test, y_pred))
-    
+    print(classification_report(test['category'], y_pred))
+
     print("\nSaving model...")
-    with open("models/merchant_categorizer.pkl", 'wb') as f:
-        pickle.dump(model, f)
-    
-    with open("models/vectorizer.pkl", 'wb') as f:
-        pickle.dump(vectorizer, f)
-    
-    with open("models/card_mapping.pkl", 'wb') as f:
-        pickle.dump(card_to_idx, f)
-    
-    print("Model saved to models/merchant_categorizer.pkl")
-    print("Vectorizer saved to models/vectorizer.pkl")
-    print("Card mapping saved to models/card_mapping.pkl")
-    
+    save_model(model, pipeline, labeled_merchants, models_dir)
+    print_sample_predictions(model, pipeline)
+
+def train_incremental(models_dir=MODELS_DIR, labeled_file=LABELED_FILE, bronze_dir=BRONZE_DIR,
+                      cache_dir=TRAINING_CACHE_DIR):
+    """Fold merchants labeled since the last run into the online model in models_dir
+
+    The first run (or the first after a full retrain) trains a new SGD model on
+    every labeled transaction. Later runs only partial_fit the rows whose label
+    is new or changed, plus a sample of already-trained rows. Deleted labels are
+    not unlearned; run a full retrain for that.
+    """
+    model, pipeline, state = load_trained_model(models_dir)
+    if not is_online_model(model, pipeline):
+        model, pipeline, state = None, None, {}
+
+    transactions, labeled_merchants = load_training_data(labeled_file, bronze_dir, state.get('labels', {}), cache_dir)
+    unknown = ~transactions['category'].isin(CATEGORIES)
+    if unknown.any():
+        print(f"Skipping {unknown.sum()} transactions with unknown categories: "
+              f"{sorted(transactions['category'][unknown].unique())}")
+        transactions = transactions[~unknown]
+
+    if model is None:
+        print("No incremental model in models/, training one on all labeled transactions")
+        batch = transactions
+    else:
+        new = transactions[transactions['new_label']]
+        if new.empty:
+            print("No newly labeled merchants since the last training run")
+            return
+        old = transactions[~transactions['new_label']]
+        rehearsal = old.sample(n=min(len(old), REHEARSAL_RATIO * len(new)), random_state=42)
+        print(f"Folding in {new['merchant_name'].nunique()} newly labeled merchants ({len(new)} transactions) "
+              f"with {len(rehearsal)} already-trained transactions")
+        batch = pd.concat([new, rehearsal])
+
+    if batch.empty:
+        print("ERROR: Not enough transactions found.")
+        return
+
+    start = time.perf_counter()
+    model, pipeline = fit_online(batch, pipeline, model)
+    print(f"Trained on {len(batch)} transactions in {time.perf_counter() - start:.2f}s\n")
+
+    save_model(model, pipeline, labeled_merchants, models_dir)
+    print_sample_predictions(model, pipeline)
+
+def compare_modes(labeled_file=LABELED_FILE, bronze_dir=BRONZE_DIR, cache_dir=TRAINING_CACHE_DIR):
+    """Report accuracy and training time of a full retrain against incremental updates on the same split
+
+    The incremental model is trained the way it is used: on half of the
+    training merchants, then with the other half folded in as newly labeled.
+    Nothing is saved.
+    """
+    transactions, _ = load_training_data(labeled_file, bronze_dir, cache_dir=cache_dir)
+    transactions = transactions[transactions['category'].isin(CATEGORIES)]
+    if len(transactions) < 50:
+        print("ERROR: Not enough transactions found.")
+        return
+
+    train, test = train_test_split(
+        transactions, test_size=0.2, random_state=42, stratify=transactions['category']
+    )
+    merchants = train['merchant_name'].unique()
+    later = set(np.random.default_rng(42).permutation(merchants)[:len(merchants) // 2])
+    new = train[train['merchant_name'].isin(later)]
+    old = train[~train['merchant_name'].isin(later)]
+
+    results = []
+    start = time.perf_counter()
+    model, pipeline = fit_full(train, transactions['card_name'])
+    results.append(("full", model, pipeline, time.perf_counter() - start, ""))
+
+    model, pipeline = fit_online(old, FeaturePipeline(online_vectorizer(), pipeline.card_mapping))
+    rehearsal = old.sample(n=min(len(old), REHEARSAL_RATIO * len(new)), random_state=42)
+    start = time.perf_counter()
+    model, pipeline = fit_online(pd.concat([new, rehearsal]), pipeline, model)
+    results.append(("incremental", model, pipeline, time.perf_counter() - start,
+                    f" to fold in {len(later)} merchants"))
+
+    print(f"=== MODE COMPARISON ({len(train)} train / {len(test)} test transactions) ===")
+    print(f"{'Mode':<12} {'Accuracy':>9} {'Macro F1':>9} {'Train time':>11}")
+    for mode, model, pipeline, seconds, note in results:
+        y_pred = model.predict(pipeline.transform(test))
+        accuracy = accuracy_score(test['category'], y_pred)
+        macro_f1 = f1_score(test['category'], y_pred, average='macro', zero_division=0)
+        print(f"{mode:<12} {accuracy:>9.2%} {macro_f1:>9.3f} {seconds:>10.2f}s{note}")
+
+def print_sample_predictions(model, pipeline):
     print("\n=== SAMPLE PREDICTIONS ===")
     test_samples = [
         ("STARBUCKS STORE 22093", 5.47, "Discover", 15),
@@ -187,21 +264,38 @@ def train_model():
         ("CHIPOTLE 2129", 11.45, "CapitalOne", 5),
         ("SPOTIFY", 9.99, "Discover", 1),
     ]
-    
-    for merchant, amount, card, day in test_samples:
-        merchant_vec = vectorizer.transform([merchant])
-        card_idx = card_to_idx.get(card, 0)
-        bucket = amount_bucket(amount)
-        features = hstack([
-            merchant_vec,
-            csr_matrix([[bucket]]),
-            csr_matrix([[card_idx]]),
-            csr_matrix([[day]])
-        ])
-        prediction = model.predict(features)[0]
+
+    samples = pd.DataFrame({
+        'merchant_name': [canonical_merchant(merchant) for merchant, _, _, _ in test_samples],
+        'amount': [amount for _, amount, _, _ in test_samples],
+        'card_name': [card for _, _, card, _ in test_samples],
+        'transaction_date': [f"January {day}, 2025" for _, _, _, day in test_samples]
+    })
+    predictions = model.predict(pipeline.transform(samples))
+    for (merchant, amount, card, _), prediction in zip(test_samples, predictions):
         print(f"{merchant} (${amount}, {card}) → {prediction}")
 
 if __name__ == "__main__":
-    import os
-    os.makedirs("models", exist_ok=True)
-    train_model()
\ No newline at end of file
+    from tune_categorizer import TUNE_SAMPLES, tune
+
+    parser = argparse.ArgumentParser(description="Train the merchant categorization model")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help="Fold newly labeled merchants into the online model instead of retraining from scratch")
+    mode.add_argument('--compare', action='store_true',
+                      help="Compare full and incremental training accuracy on a held-out split without saving")
+    mode.add_argument('--tune', action='store_true',
+                      help="Cross-validate featurizer and regularization settings and report accuracy vs latency")
+    parser.add_argument('--samples', type=int, default=TUNE_SAMPLES,
+                        help="Configurations --tune samples from the grid (0 for the full grid)")
+    args = parser.parse_args()
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    if args.tune:
+        tune(samples=args.samples)
+    elif args.compare:
+        compare_modes()
+    elif args.incremental:
+        train_incremental()
+    else:
+        train_model()
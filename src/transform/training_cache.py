@@ -0,0 +1,171 @@
+import hashlib
+import json
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+sys.path.insert(0, 'src/extract')
+from atomic_write import atomic_output, write_json_atomic
+from bronze_reader import EMAIL_KEY_FIELDS, TRANSACTION_FIELDS, drop_repeated_emails
+from bronze_store import BRONZE_DIR
+from category_lookup import LABELED_FILE, MerchantLookup
+from merchant_normalizer import canonical_merchant
+from silver_store import MANIFEST_FILE, read_new_bronze
+
+TRAINING_CACHE_DIR = 'data/cache/training'
+#Bump when INPUT_SCHEMA or how rows are derived from bronze changes, so the cache is rebuilt
+TRAINING_CACHE_VERSION = 3
+#Every bronze transaction, ready to label: raw merchant_name for label matching, canonical_merchant for the model
+INPUT_SCHEMA = pa.schema([
+    ('merchant_name', pa.string()),
+    ('canonical_merchant', pa.string()),
+    ('amount', pa.float64()),
+    ('card_name', pa.string()),
+    ('transaction_date', pa.string()),
+    ('email_id', pa.string()),
+    ('raw_email_hash', pa.string()),
+])
+LABELED_SCHEMA = INPUT_SCHEMA.append(pa.field('category', pa.string()))
+#Input parts are merged into one once there are more than this many
+MAX_INPUT_PARTS = 16
+
+def _new_manifest():
+    return {'schema_version': TRAINING_CACHE_VERSION, 'inputs': {}, 'parts': [], 'labeled': None, 'labels_sha256': None}
+
+def _load_manifest(cache_dir):
+    manifest_path = cache_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def _save_manifest(manifest, cache_dir):
+    write_json_atomic(cache_dir / MANIFEST_FILE, manifest)
+
+def _clear(cache_dir):
+    if cache_dir.exists():
+        shutil.rmtree(cache_dir)
+    cache_dir.mkdir(parents=True)
+
+def _remove_unrecorded(manifest, cache_dir):
+    """Delete Parquet files the manifest doesn't name, written by a run that crashed before saving it"""
+    recorded = {*manifest['parts'], manifest['labeled']}
+    for path in cache_dir.glob('*.parquet'):
+        if path.name not in recorded:
+            path.unlink()
+
+def _write_table(table, path):
+    with atomic_output(path) as tmp_path:
+        pq.write_table(table, tmp_path, compression='zstd')
+
+def _read_parts(cache_dir, parts):
+    if not parts:
+        return INPUT_SCHEMA.empty_table().to_pandas()
+    return pq.read_table([cache_dir / part for part in parts], schema=INPUT_SCHEMA).to_pandas()
+
+def _cached_email_keys(cache_dir, parts):
+    if not parts:
+        return set(), set()
+    table = pq.read_table([cache_dir / part for part in parts], columns=EMAIL_KEY_FIELDS)
+    return tuple(set(table[field].drop_null().to_pylist()) for field in EMAIL_KEY_FIELDS)
+
+def training_inputs(records):
+    """Project bronze records onto INPUT_SCHEMA, normalizing each distinct merchant once"""
+    merchants = records['merchant_name'].fillna('').astype(str).str.strip()
+    canonical = {merchant: canonical_merchant(merchant) for merchant in merchants.unique()}
+    return pd.DataFrame({
+        'merchant_name': merchants,
+        'canonical_merchant': merchants.map(canonical),
+        'amount': pd.to_numeric(records['amount'], errors='coerce'),
+        'card_name': records['card_name'].fillna('Unknown'),
+        'transaction_date': records['transaction_date'],
+        **{field: records[field] if field in records else None for field in EMAIL_KEY_FIELDS}
+    })
+
+def label_rows(inputs, labeled_merchants):
+    """Keep the input rows a label applies to (exactly or by canonical merchant), with their category"""
+    labels = MerchantLookup(labeled_merchants)
+    categories = {}
+    for merchant in inputs['merchant_name'].unique():
+        match = labels.get(merchant)
+        if match is not None:
+            categories[merchant] = match[0]
+    matched = inputs['merchant_name'].isin(categories.keys())
+    return inputs[matched].assign(category=inputs['merchant_name'][matched].map(categories)).reset_index(drop=True)
+
+def load_labeled_rows(labeled_merchants, labels_sha256, bronze_dir=BRONZE_DIR, cache_dir=TRAINING_CACHE_DIR):
+    """Every bronze transaction a label applies to, from the cache, reading only bronze it doesn't cover yet
+
+    The cache holds the projected rows of all bronze (as append-only Parquet
+    parts, tracked by a manifest of bronze inputs like silver's) and the labeled
+    rows for the label file hash in its manifest. New bronze is projected and
+    labeled on its own and appended; a new label hash re-labels the cached rows
+    without touching bronze. Bronze inputs rewritten since they were cached, or a
+    cache from an older TRAINING_CACHE_VERSION, rebuild it from scratch.
+    """
+    cache_dir = Path(cache_dir)
+    manifest = _load_manifest(cache_dir)
+    if manifest is None or manifest.get('schema_version') != TRAINING_CACHE_VERSION:
+        _clear(cache_dir)
+        manifest = _new_manifest()
+    else:
+        _remove_unrecorded(manifest, cache_dir)
+
+    fields = TRANSACTION_FIELDS + EMAIL_KEY_FIELDS
+    records, inputs, changed = read_new_bronze(manifest, bronze_dir, fields=fields)
+    if changed:
+        print(f"{len(changed)} bronze inputs changed since they were cached, rebuilding the training cache")
+        _clear(cache_dir)
+        manifest = _new_manifest()
+        records, inputs, _ = read_new_bronze(manifest, bronze_dir, fields=fields)
+
+    #An alert saved to bronze twice must not land in both the train and test split
+    if not records.empty:
+        records = drop_repeated_emails(records, *_cached_email_keys(cache_dir, manifest['parts']))
+    new_rows = training_inputs(records)
+    if not new_rows.empty:
+        part = f"part-{datetime.now():%Y%m%dT%H%M%S%f}.parquet"
+        _write_table(pa.Table.from_pandas(new_rows, schema=INPUT_SCHEMA, preserve_index=False), cache_dir / part)
+        manifest['parts'].append(part)
+
+    stale = []
+    if len(manifest['parts']) > MAX_INPUT_PARTS:
+        part = f"part-{datetime.now():%Y%m%dT%H%M%S%f}-merged.parquet"
+        _write_table(pq.read_table([cache_dir / name for name in manifest['parts']], schema=INPUT_SCHEMA),
+                     cache_dir / part)
+        stale = [cache_dir / name for name in manifest['parts']]
+        manifest['parts'] = [part]
+
+    current = manifest['labeled'] if manifest['labels_sha256'] == labels_sha256 else None
+    if current:
+        labeled = pq.read_table(cache_dir / current, schema=LABELED_SCHEMA).to_pandas()
+        if not new_rows.empty:
+            labeled = pd.concat([labeled, label_rows(new_rows, labeled_merchants)], ignore_index=True)
+    else:
+        labeled = label_rows(_read_parts(cache_dir, manifest['parts']), labeled_merchants)
+
+    #The labeled rows get a new file each time, named in the manifest along with the inputs they cover, so a
+    #crash before the manifest is saved leaves the old pair in place rather than new rows under old inputs
+    if not new_rows.empty or not current:
+        name = f"labeled-{datetime.now():%Y%m%dT%H%M%S%f}.parquet"
+        _write_table(pa.Table.from_pandas(labeled, schema=LABELED_SCHEMA, preserve_index=False), cache_dir / name)
+        if manifest['labeled']:
+            stale.append(cache_dir / manifest['labeled'])
+        manifest['labeled'] = name
+    manifest['inputs'] = inputs
+    manifest['labels_sha256'] = labels_sha256
+    _save_manifest(manifest, cache_dir)
+    for path in stale:
+        path.unlink()
+    return labeled
+
+def load_labels(labeled_file=LABELED_FILE):
+    """(labeled merchants, SHA-256 of the label file), {} and None if there is no label file yet"""
+    labeled_file = Path(labeled_file)
+    if not labeled_file.exists():
+        return {}, None
+    data = labeled_file.read_bytes()
+    return json.loads(data), hashlib.sha256(data).hexdigest()
@@ -0,0 +1,54 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+#(format, suffix routing a string to it): each string is only tried against the one format it can match
+DATE_FORMATS = [
+    ("%b %d, %Y at %I:%M %p ET", " ET"),  # Chase: "Jan 10, 2025 at 8:14 AM ET"
+    ("%B %d, %Y", ""),  # Discover, CapitalOne: "January 5, 2025"
+]
+DEFAULT_DAY = 15
+MEMO_SIZE = 100_000
+
+ParsedDates = namedtuple('ParsedDates', ['dates', 'iso', 'days', 'unparseable'])
+
+#Raw date string -> (ISO date or None, day of month or None), shared across calls
+_memo = {}
+
+def _parse_new(values):
+    """Parse distinct stripped strings, one whole-array pass per format"""
+    values = pd.Series(values, dtype=object)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    unrouted = pd.Series(True, index=values.index)
+    for fmt, suffix in DATE_FORMATS:
+        route = unrouted & values.str.endswith(suffix)
+        unrouted &= ~route
+        if route.any():
+            parsed[route] = pd.to_datetime(values[route], format=fmt, errors='coerce')
+
+    known = parsed.notna()
+    iso = parsed.dt.strftime('%Y-%m-%d').where(known, None)
+    days = parsed.dt.day.where(known, None)
+    return {value: (date, day) if ok else (None, None) for value, date, day, ok in zip(values, iso, days, known)}
+
+def parse_dates(date_strs):
+    """Parse a column of raw bronze dates in one pass
+
+    Returns ParsedDates: dates (numpy datetime64[D], NaT if unknown), iso
+    ('YYYY-MM-DD' strings or None, as parse_date gives), days (day of month,
+    DEFAULT_DAY if unknown) and unparseable (row positions that had a date string
+    matching no format). Each distinct string is parsed once and remembered for
+    later calls.
+    """
+    keys = [date_str.strip() if isinstance(date_str, str) else '' for date_str in date_strs]
+    new = [key for key in dict.fromkeys(keys) if key and key not in _memo]
+    if new:
+        if len(_memo) + len(new) > MEMO_SIZE:
+            _memo.clear()
+        _memo.update(_parse_new(new))
+
+    parsed = [_memo[key] if key else (None, None) for key in keys]
+    iso = [date for date, _ in parsed]
+    days = np.array([DEFAULT_DAY if day is None else day for _, day in parsed], dtype=int)
+    unparseable = [i for i, (key, (date, _)) in enumerate(zip(keys, parsed)) if key and date is None]
+    return ParsedDates(np.array(iso, dtype='datetime64[D]'), iso, days, unparseable)
@@ -1,41 +1,57 @@
-import json
+import argparse
+import os
 import pickle
-from pathlib import Path
+import sys
 from datetime import datetime
 import pandas as pd
-import numpy as np
-from scipy.sparse import hstack, csr_matrix
 from collections import Counter
+sys.path.insert(0, 'src/extract')
+from bronze_reader import EMAIL_KEY_FIELDS, TRANSACTION_FIELDS, drop_repeated_emails
+from bronze_store import BRONZE_DIR
+from categorization_cache import CACHE_FILE, CategorizationCache, model_version
+from category_lookup import load_category_lookups
+from feature_pipeline import FeaturePipeline
+from merchant_normalizer import canonical_merchant
+from silver_store import (
+    SILVER_DIR, SILVER_SCHEMA_VERSION, empty_manifest, load_silver_manifest, save_silver_manifest, clear_silver,
+    remove_orphan_parts, read_new_bronze, silver_email_keys, write_silver_partitions
+)
+
+MODEL_FILE = "models/merchant_categorizer.pkl"
+FEATURE_PIPELINE_FILE = "models/feature_pipeline.pkl"
+#Models trained before the feature pipeline was saved with them keep the vectorizer and card mapping separately
+VECTORIZER_FILE = "models/vectorizer.pkl"
+CARD_MAPPING_FILE = "models/card_mapping.pkl"
+CATEGORIZE_CHUNK_SIZE = 5000
+
+def model_files():
+    if os.path.exists(FEATURE_PIPELINE_FILE):
+        return [MODEL_FILE, FEATURE_PIPELINE_FILE]
+    return [MODEL_FILE, VECTORIZER_FILE, CARD_MAPPING_FILE]
 
 def load_ml_model():
+    """Load (model, feature pipeline) from models/"""
     print("Loading ML model...")
     
-    with open("models/merchant_categorizer.pkl", 'rb') as f:
+    with open(MODEL_FILE, 'rb') as f:
         model = pickle.load(f)
     
-    with open("models/vectorizer.pkl", 'rb') as f:
+    if os.path.exists(FEATURE_PIPELINE_FILE):
+        with open(FEATURE_PIPELINE_FILE, 'rb') as f:
+            return model, pickle.load(f)
+
+    with open(VECTORIZER_FILE, 'rb') as f:
         vectorizer = pickle.load(f)
     
-    with open("models/card_mapping.pkl", 'rb') as f:
+    with open(CARD_MAPPING_FILE, 'rb') as f:
         card_mapping = pickle.load(f)
     
-    return model, vectorizer, card_mapping
-
-def amount_bucket(amt):
-    if amt is None or amt == 0:
-        return 2
-    if amt < 2.0:
-        return 0
-    elif amt < 10.0:
-        return 1
-    elif amt < 30.0:
-        return 2
-    elif amt < 75.0:
-        return 3
-    elif amt < 150.0:
-        return 4
-    else:
-        return 5
+    #Models from before the pipeline was saved were trained on raw descriptors, so keep feeding them those
+    return model, FeaturePipeline(vectorizer, card_mapping, canonical_merchants=False)
+
+def load_categorization_cache(path=CACHE_FILE):
+    """Open the persistent prediction cache for the model currently in models/"""
+    return CategorizationCache(model_version(model_files()), path)
 
 def parse_date(date_str):
     if not date_str:
@@ -55,68 +71,185 @@ def parse_date(date_str):
     
     return None
 
-def categorize_transaction(transaction, model, vectorizer, card_mapping):
+def categorize_transaction(transaction, model, pipeline):
     merchant = transaction.get('merchant_name', '')
+    canonical = canonical_merchant(merchant)
     amount = transaction.get('amount', 0)
     card = transaction.get('card_name', 'Unknown')
     date_str = parse_date(transaction.get('transaction_date', ''))
 
-    merchant_vec = vectorizer.transform([merchant])
-    card_idx = card_mapping.get(card, 0)
-    bucket = amount_bucket(amount)
-
-    try:
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        day = dt.day
-    except:
-        day = 15
-
-    features = hstack([
-        merchant_vec,
-        csr_matrix([[bucket]]),
-        csr_matrix([[card_idx]]),
-        csr_matrix([[day]])
-    ])
-
-    category = model.predict(features)[0]
+    model_merchant = canonical if pipeline.canonical_merchants else merchant
+    keys, _ = pipeline.keys([model_merchant], [amount], [card], [transaction.get('transaction_date', '')])
+    category = model.predict(pipeline.transform_keys(keys))[0]
     
     return {
         'transaction_date': date_str,
         'merchant_name': str(merchant),
+        'canonical_merchant': canonical,
         'amount': float(amount) if amount else 0.0,
         'card_name': str(card),
         'category': str(category)
     }
 
-def transform_transactions():
+def transaction_columns(transactions):
+    """Return (merchants, amounts, cards, date strings) lists from bronze records, Transactions or a bronze DataFrame
+
+    Missing fields get the same defaults as categorize_transaction, and DataFrame
+    nulls come back as None.
+    """
+    defaults = [('merchant_name', ''), ('amount', 0), ('card_name', 'Unknown'), ('transaction_date', '')]
+    if isinstance(transactions, pd.DataFrame):
+        return [
+            transactions[field].astype(object).where(transactions[field].notna(), None).tolist()
+            if field in transactions else [default] * len(transactions)
+            for field, default in defaults
+        ]
+    return [
+        [t.get(field, default) if isinstance(t, dict) else getattr(t, field) for t in transactions]
+        for field, default in defaults
+    ]
+
+def categorize_transactions(transactions, model, pipeline, chunk_size=CATEGORIZE_CHUNK_SIZE,
+                            cache=None, lookups=(), tier_counts=None, unparseable_dates=None):
+    """Categorize bronze transactions in tiers: merchant lookups, then cache, then the model
+
+    The model and cache see the canonical merchant, not the raw descriptor, so
+    every store of a chain shares one feature tuple; a legacy model trained on raw
+    descriptors (pipeline.canonical_merchants off) still gets the raw ones. lookups is a list of (tier
+    name, MerchantLookup) checked in order, e.g. user overrides then human
+    labels. Feature tuples found in cache (a
+    CategorizationCache) skip the model. Everything else goes through the model in
+    one batch per chunk: one pipeline.transform_keys over the distinct missing
+    feature tuples and a single model.predict. Without lookups the results are identical to
+    categorize_transaction per row.
+
+    transactions is a list of bronze records or Transactions, or a DataFrame
+    from the bronze reader. If tier_counts (a Counter) is given, it is updated with how many rows
+    each tier categorized. If unparseable_dates (a list) is given, date strings
+    matching no known format are appended to it; those rows get a null date and
+    the default day feature.
+    """
+    categorized = []
+
+    for start in range(0, len(transactions), chunk_size):
+        merchants, amounts, cards, raw_dates = transaction_columns(transactions[start:start + chunk_size])
+        canonicals = [canonical_merchant(merchant) for merchant in merchants]
+        keys, parsed = pipeline.keys(canonicals if pipeline.canonical_merchants else merchants,
+                                     amounts, cards, raw_dates)
+        dates = parsed.iso
+        if unparseable_dates is not None:
+            unparseable_dates.extend(raw_dates[i] for i in parsed.unparseable)
+
+        categories = [None] * len(keys)
+        tiers = [None] * len(keys)
+        for i, merchant in enumerate(merchants):
+            for tier, lookup in lookups:
+                match = lookup.get(merchant)
+                if match is not None:
+                    categories[i] = match[0]
+                    tiers[i] = tier if match[1] else f"{tier}_normalized"
+                    break
+
+        model_keys = [key for key, category in zip(keys, categories) if category is None]
+
+        predicted = {}
+        if cache is not None:
+            for key in model_keys:
+                if key not in predicted:
+                    category = cache.get(key)
+                    if category is not None:
+                        predicted[key] = category
+        cached_keys = set(predicted)
+
+        missing = list(dict.fromkeys(key for key in model_keys if key not in predicted))
+        if missing:
+            for key, category in zip(missing, model.predict(pipeline.transform_keys(missing))):
+                predicted[key] = str(category)
+                if cache is not None:
+                    cache.put(key, predicted[key])
+
+        for i, key in enumerate(keys):
+            if categories[i] is None:
+                categories[i] = predicted[key]
+                tiers[i] = 'cache' if key in cached_keys else 'model'
+
+        if tier_counts is not None:
+            tier_counts.update(tiers)
+
+        categorized.extend(
+            {
+                'transaction_date': date_str,
+                'merchant_name': str(merchant),
+                'canonical_merchant': canonical,
+                'amount': float(amount) if amount else 0.0,
+                'card_name': str(card),
+                'category': str(category)
+            }
+            for merchant, canonical, amount, card, date_str, category
+            in zip(merchants, canonicals, amounts, cards, dates, categories)
+        )
+
+    return categorized
+
+def transform_transactions(full_rebuild=False, bronze_dir=BRONZE_DIR, silver_dir=SILVER_DIR, cache_file=CACHE_FILE):
+    """Categorize bronze records silver doesn't have yet and merge them into the month partitions they fall in
+
+    With full_rebuild (or on the first run, or when the silver schema changed) all
+    silver output is deleted and every bronze record is re-categorized, e.g. after
+    retraining the model.
+    """
     print("=" * 60)
     print("BUDGET TRACKER - TRANSFORM LAYER")
     print("=" * 60)
 
-    model, vectorizer, card_mapping = load_ml_model()
+    manifest = load_silver_manifest(silver_dir)
+    if manifest is not None and manifest.get('schema_version', 1) != SILVER_SCHEMA_VERSION:
+        print("\nSilver was written with an older schema")
+        full_rebuild = True
 
-    print("\n1. Reading and categorizing bronze data...")
-    bronze_dir = Path("data/bronze")
-    json_files = list(bronze_dir.glob("*.json"))
-    
-    print(f"   Found {len(json_files)} files")
-    
-    categorized = []
-    
-    for i, file in enumerate(json_files):
-        if (i + 1) % 100 == 0:
-            print(f"   Processed {i + 1}/{len(json_files)}...")
-        
-        with open(file, 'r') as f:
-            transaction = json.load(f)
-        
-        clean = categorize_transaction(transaction, model, vectorizer, card_mapping)
-        categorized.append(clean)
+    if full_rebuild or manifest is None:
+        print("\nFull rebuild: clearing silver layer")
+        clear_silver(silver_dir)
+        manifest = empty_manifest()
+    else:
+        remove_orphan_parts(manifest, silver_dir)
+
+    print("\n1. Reading new bronze data...")
+    transactions, inputs, changed = read_new_bronze(manifest, bronze_dir, fields=TRANSACTION_FIELDS + EMAIL_KEY_FIELDS)
+    read_count = len(transactions)
+    transactions = drop_repeated_emails(transactions, *silver_email_keys(manifest, silver_dir))
+    if len(transactions) < read_count:
+        print(f"   Skipping {read_count - len(transactions)} bronze records for emails already transformed")
+
+    if changed:
+        print(f"   WARNING: {len(changed)} bronze inputs changed after they were transformed: {', '.join(changed)}")
+        print("   Run with --full-rebuild to re-categorize them")
+
+    if transactions.empty:
+        manifest['inputs'] = inputs
+        save_silver_manifest(manifest, silver_dir)
+        print("   No new bronze records, silver is up to date")
+        return
+
+    print(f"   Found {len(transactions)} new records")
+
+    model, pipeline = load_ml_model()
+    cache = load_categorization_cache(cache_file)
+    lookups = load_category_lookups()
+    tier_counts = Counter()
+    unparseable_dates = []
+    categorized = categorize_transactions(
+        transactions, model, pipeline, cache=cache, lookups=lookups, tier_counts=tier_counts,
+        unparseable_dates=unparseable_dates
+    )
+    cache.save()
     
     print(f"Categorized {len(categorized)} transactions")
 
     print("\n2. Creating DataFrame...")
     df = pd.DataFrame(categorized)
+    for field in EMAIL_KEY_FIELDS:
+        df[field] = transactions[field].values
     
     print(f"Created DataFrame with {len(df)} rows")
 
@@ -133,9 +266,16 @@ def transform_transactions():
     
     print(f"   Total transactions: {total}")
     print(f"   Null dates: {null_dates} ({null_dates/total*100:.1f}%)")
+    if unparseable_dates:
+        examples = ', '.join(repr(date_str) for date_str in list(dict.fromkeys(unparseable_dates))[:5])
+        print(f"     {len(unparseable_dates)} of them in an unknown format, e.g. {examples}")
     print(f"   Null merchants: {null_merchants} ({null_merchants/total*100:.1f}%)")
     print(f"   Null amounts: {null_amounts} ({null_amounts/total*100:.1f}%)")
     print(f"   Null categories: {null_categories} ({null_categories/total*100:.1f}%)")
+    print(f"   Merchants: {df['merchant_name'].nunique()} raw, {df['canonical_merchant'].nunique()} canonical")
+    print(f"   Categorized by:")
+    for tier in ['override', 'override_normalized', 'labeled', 'labeled_normalized', 'cache', 'model']:
+        print(f"     {tier}: {tier_counts[tier]} ({tier_counts[tier]/total*100:.1f}%)")
 
     print("\n5. Category Distribution:")
     cat_counts = df['category'].value_counts()
@@ -143,16 +283,25 @@ def transform_transactions():
         print(f"   {cat}: {count}")
     
     print("\n6. Saving to silver layer...")
-    output_path = Path("data/silver/transactions")
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    df.to_parquet(output_path / "transactions.parquet", index=False)
+    written, stale = write_silver_partitions(df, manifest, silver_dir)
+
+    #New partition files land before the manifest names them, and replaced ones are only deleted after,
+    #so a crash at any point leaves silver readable; the next run removes whatever the manifest doesn't list
+    manifest['inputs'] = inputs
+    save_silver_manifest(manifest, silver_dir)
+    for path in stale:
+        path.unlink()
     
-    print(f"Saved to {output_path / 'transactions.parquet'}")
+    print(f"Wrote {len(written)} partitions to {silver_dir} ({len(stale)} merged with existing rows)")
     
     print("\n" + "=" * 60)
     print("TRANSFORMATION COMPLETE!")
     print("=" * 60)
 
 if __name__ == "__main__":
-    transform_transactions()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Categorize new bronze transactions into the silver layer")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="re-categorize all of bronze, e.g. after retraining the model")
+    args = parser.parse_args()
+
+    transform_transactions(full_rebuild=args.full_rebuild)
\ No newline at end of file
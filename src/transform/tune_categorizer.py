@@ -0,0 +1,168 @@
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import hstack, csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+sys.path.insert(0, 'src/extract')
+from bronze_store import BRONZE_DIR
+from category_lookup import LABELED_FILE
+from feature_pipeline import FeaturePipeline, amount_buckets
+from train_categorizer import load_training_data
+from training_cache import TRAINING_CACHE_DIR
+from transaction_dates import parse_dates
+
+#Merchant text featurizers to try, as TfidfVectorizer settings
+TEXT_FEATURES = {
+    'word-1': {'analyzer': 'word', 'ngram_range': (1, 1)},
+    'word-1-2': {'analyzer': 'word', 'ngram_range': (1, 2)},
+    'char-2-4': {'analyzer': 'char_wb', 'ngram_range': (2, 4)},
+    'char-3-5': {'analyzer': 'char_wb', 'ngram_range': (3, 5)},
+}
+CARD_ENCODINGS = ['index', 'onehot']
+DAY_ENCODINGS = ['raw', 'cyclic']
+C_VALUES = [0.1, 1.0, 10.0]
+#(text, card, day, C) train_model uses; always part of the search so the report has a baseline
+CURRENT_CONFIG = ('word-1-2', 'index', 'raw', 1.0)
+TUNE_FOLDS = 5
+TUNE_SAMPLES = 16
+
+def search_space(samples=TUNE_SAMPLES, seed=42):
+    """The full grid of (text, card, day, C) configurations, or a random sample of it plus CURRENT_CONFIG"""
+    grid = list(itertools.product(TEXT_FEATURES, CARD_ENCODINGS, DAY_ENCODINGS, C_VALUES))
+    if samples and samples < len(grid):
+        others = [config for config in grid if config != CURRENT_CONFIG]
+        grid = [CURRENT_CONFIG] + random.Random(seed).sample(others, samples - 1)
+    return grid
+
+def encode_cards(card_idx, encoding, n_cards):
+    """Card index as one numeric column ('index') or one 0/1 column per card ('onehot')"""
+    if encoding == 'onehot':
+        rows = np.arange(len(card_idx))
+        return csr_matrix((np.ones(len(card_idx)), (rows, card_idx)), shape=(len(card_idx), n_cards))
+    return csr_matrix(card_idx.reshape(-1, 1))
+
+def encode_days(days, encoding):
+    """Day of month as one numeric column ('raw'), or its sine and cosine so the 31st sits next to the 1st ('cyclic')"""
+    if encoding == 'cyclic':
+        angle = 2 * np.pi * (days - 1) / 31
+        return csr_matrix(np.column_stack([np.sin(angle), np.cos(angle)]))
+    return csr_matrix(days.reshape(-1, 1))
+
+#Feature blocks tune() precomputes once and hands to each worker when it starts
+_shared = {}
+
+def _init_worker(shared):
+    _shared.update(shared)
+
+def evaluate(config, fold):
+    """Fit one configuration on a fold's training rows and score it on the held-out rows
+
+    Latency is per held-out row: the merchant text transform (timed when the
+    blocks were precomputed) plus assembling the features and predicting.
+    """
+    text, card, day, C = config
+    train_idx, test_idx = _shared['folds'][fold]
+    text_train, text_test, text_seconds = _shared['text'][text, fold]
+    numeric = hstack([_shared['buckets'], _shared['cards'][card], _shared['days'][day]]).tocsr()
+    labels = _shared['labels']
+
+    start = time.perf_counter()
+    model = LogisticRegression(class_weight='balanced', max_iter=2000, random_state=42, C=C)
+    model.fit(hstack([text_train, numeric[train_idx]]), labels[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = model.predict(hstack([text_test, numeric[test_idx]]))
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        'accuracy': accuracy_score(labels[test_idx], predictions),
+        'macro_f1': f1_score(labels[test_idx], predictions, average='macro', zero_division=0),
+        'fit_seconds': fit_seconds,
+        'latency_us': (text_seconds + predict_seconds) / len(test_idx) * 1e6
+    }
+
+def tune(labeled_file=LABELED_FILE, bronze_dir=BRONZE_DIR, cache_dir=TRAINING_CACHE_DIR, samples=TUNE_SAMPLES,
+         folds=TUNE_FOLDS, workers=None):
+    """Cross-validate featurizer and regularization settings in parallel and report accuracy against latency
+
+    Each text featurizer is fit once per fold and the card, day and amount
+    blocks once overall; the (configuration, fold) fits are then fanned out over
+    a process pool that receives those blocks once per worker. Nothing is saved.
+    Returns one summary dict per configuration, best first.
+    """
+    transactions, _ = load_training_data(labeled_file, bronze_dir, cache_dir=cache_dir)
+    if len(transactions) < 50:
+        print("ERROR: Not enough transactions found.")
+        return []
+
+    labels = transactions['category'].to_numpy()
+    merchants = transactions['merchant_name'].to_numpy()
+    cards = FeaturePipeline(vectorizer=None)
+    cards.add_cards(transactions['card_name'])
+    card_idx = cards.card_indexes(transactions['card_name'])
+    days = parse_dates(transactions['transaction_date']).days
+    buckets = amount_buckets(transactions['amount'])
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(merchants, labels))
+    configs = search_space(samples)
+
+    print(f"Precomputing features for {len(transactions)} transactions, {folds} folds...")
+    text = {}
+    for name in sorted({config[0] for config in configs}):
+        for fold, (train_idx, test_idx) in enumerate(splits):
+            vectorizer = TfidfVectorizer(lowercase=True, **TEXT_FEATURES[name])
+            text_train = vectorizer.fit_transform(merchants[train_idx])
+            start = time.perf_counter()
+            text_test = vectorizer.transform(merchants[test_idx])
+            text[name, fold] = (text_train, text_test, time.perf_counter() - start)
+
+    shared = {
+        'labels': labels,
+        'folds': splits,
+        'text': text,
+        'buckets': csr_matrix(buckets.reshape(-1, 1)),
+        'cards': {encoding: encode_cards(card_idx, encoding, len(cards.card_mapping)) for encoding in CARD_ENCODINGS},
+        'days': {encoding: encode_days(days, encoding) for encoding in DAY_ENCODINGS}
+    }
+
+    tasks = [(config, fold) for config in configs for fold in range(folds)]
+    workers = workers or os.cpu_count()
+    print(f"Evaluating {len(configs)} configurations ({len(tasks)} fits) on {min(workers, len(tasks))} workers...\n")
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(shared,)) as executor:
+            scores = list(executor.map(evaluate, *zip(*tasks)))
+    else:
+        _init_worker(shared)
+        scores = [evaluate(config, fold) for config, fold in tasks]
+    _shared.clear()
+
+    results = []
+    for i, config in enumerate(configs):
+        fold_scores = scores[i * folds:(i + 1) * folds]
+        accuracies = [score['accuracy'] for score in fold_scores]
+        results.append({
+            'config': config,
+            'accuracy': float(np.mean(accuracies)),
+            'accuracy_std': float(np.std(accuracies)),
+            **{key: float(np.mean([score[key] for score in fold_scores]))
+               for key in ['macro_f1', 'fit_seconds', 'latency_us']}
+        })
+    results.sort(key=lambda result: (-result['accuracy'], result['latency_us']))
+
+    print(f"=== TUNING RESULTS ({folds}-fold CV, best first) ===")
+    print(f"{'Text':<10} {'Card':<7} {'Day':<7} {'C':>5} {'Accuracy':>15} {'Macro F1':>9} {'Fit':>7} {'us/row':>8}")
+    for result in results:
+        text_name, card, day, C = result['config']
+        accuracy = f"{result['accuracy']:.2%} ±{result['accuracy_std']:.1%}"
+        marker = "  (current)" if result['config'] == CURRENT_CONFIG else ""
+        print(f"{text_name:<10} {card:<7} {day:<7} {C:>5g} {accuracy:>15} {result['macro_f1']:>9.3f} "
+              f"{result['fit_seconds']:>6.2f}s {result['latency_us']:>8.1f}{marker}")
+    return results
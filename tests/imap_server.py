@@ -0,0 +1,297 @@
+"""Local IMAP stand-in for offline extraction tests and benchmarks
+
+Serves an INBOX of synthetic Discover, Chase and Capital One alerts
+built from the templates in tests/fixtures/. Messages are generated on demand
+from their UID, so a million-message mailbox costs no memory up front. Speaks
+just enough IMAP4rev1 for imaplib and extract_transactions: CAPABILITY, LOGIN,
+SELECT/EXAMINE, STATUS, NOOP, LOGOUT and UID SEARCH/FETCH.
+
+Run standalone with: python tests/imap_server.py --messages 100000 --port 1143
+"""
+import argparse
+import base64
+import email
+import re
+import socketserver
+import threading
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+#The values baked into each fixture, which synthetic messages swap out
+TEMPLATES = {
+    'discover': ('discover_alert.eml', 'STARBUCKS STORE 22093', 'January 5, 2025', '5.47'),
+    'chase': ('chase_alert.eml', 'SHELL OIL 57444', 'Jan 10, 2025 at 8:14 AM ET', '45.00'),
+    'capitalone': ('capitalone_alert.eml', 'CHIPOTLE 2129', 'January 12, 2025', '11.45'),
+}
+
+#One in four messages is a Chase statement notice: right sender, wrong subject
+KINDS = ['discover', 'chase', 'capitalone', 'statement']
+
+MERCHANTS = [
+    'STARBUCKS STORE 22093', 'SHELL OIL 57444', 'CHIPOTLE 2129', 'AMAZON MKTPL*2K4', 'TRADER JOE S #552',
+    'UBER *TRIP', 'NETFLIX.COM', 'TARGET 00012345', 'WHOLEFDS MKT 10234', 'SPOTIFY USA',
+]
+
+BOUNDARY = '===============0000000000000000000=='
+
+def load_template(name):
+    """Split a fixture into (headers, [(content type, decoded text)])"""
+    msg = email.message_from_bytes((FIXTURES / name).read_bytes())
+    headers = {key: msg[key] for key in ('From', 'To', 'Subject', 'Date')}
+    parts = [
+        (part.get_content_type(), part.get_payload(decode=True).decode())
+        for part in msg.walk() if not part.is_multipart()
+    ]
+    return headers, parts
+
+def format_date(day, kind):
+    if kind == 'chase':
+        return f"{day:%b} {day.day}, {day.year} at 8:14 AM ET"
+    return f"{day:%B} {day.day}, {day.year}"
+
+class SyntheticMailbox:
+    """A mailbox of `count` alerts with UIDs 1..count, each rendered from its UID"""
+
+    def __init__(self, count, uidvalidity=1):
+        self.count = count
+        self.uidvalidity = uidvalidity
+        self.templates = {kind: (load_template(spec[0]), spec[1:]) for kind, spec in TEMPLATES.items()}
+
+    @property
+    def uidnext(self):
+        return self.count + 1
+
+    def kind(self, uid):
+        return KINDS[uid % len(KINDS)]
+
+    def sender(self, uid):
+        kind = self.kind(uid)
+        return self.templates['chase' if kind == 'statement' else kind][0][0]['From']
+
+    @lru_cache(maxsize=4096)
+    def message(self, uid):
+        """Return (headers, [(content type, base64 body)]) for one UID"""
+        kind = self.kind(uid)
+        (headers, parts), old_values = self.templates['chase' if kind == 'statement' else kind]
+        headers = dict(headers, **{'Message-ID': f"<{uid}.{self.uidvalidity}@synthetic.example.com>"})
+
+        if kind == 'statement':
+            headers['Subject'] = 'Your credit card statement is ready'
+            parts = [(content_type, 'Your statement is ready to view online.') for content_type, _ in parts]
+        else:
+            new_values = (
+                MERCHANTS[uid % len(MERCHANTS)],
+                format_date(date(2024, 1, 1) + timedelta(days=uid % 365), kind),
+                f"{(uid * 7919) % 50000 / 100 + 1:.2f}",
+            )
+            replace = lambda text: self._replace(text, old_values, new_values)
+            headers['Subject'] = replace(headers['Subject'])
+            parts = [(content_type, replace(text)) for content_type, text in parts]
+
+        return headers, [
+            (content_type, base64.encodebytes(text.encode()).replace(b'\n', b'\r\n'))
+            for content_type, text in parts
+        ]
+
+    @staticmethod
+    def _replace(text, old_values, new_values):
+        for old, new in zip(old_values, new_values):
+            text = text.replace(old, new)
+        return text
+
+    def header_block(self, uid, fields=None):
+        headers, _ = self.message(uid)
+        lines = [f"{key}: {value}\r\n" for key, value in headers.items()
+                 if fields is None or key.upper() in fields]
+        if fields is None:
+            lines.insert(0, f'Content-Type: multipart/alternative; boundary="{BOUNDARY}"\r\nMIME-Version: 1.0\r\n')
+        return (''.join(lines) + '\r\n').encode()
+
+    def part(self, uid, number):
+        _, parts = self.message(uid)
+        return parts[number - 1][1]
+
+    def rfc822(self, uid):
+        _, parts = self.message(uid)
+        body = b''
+        for content_type, data in parts:
+            body += (
+                f'--{BOUNDARY}\r\nContent-Type: {content_type}; charset="utf-8"\r\n'
+                'MIME-Version: 1.0\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+            ).encode() + data
+        return self.header_block(uid) + body + f'--{BOUNDARY}--\r\n'.encode()
+
+    def bodystructure(self, uid):
+        _, parts = self.message(uid)
+        leaves = ''
+        for content_type, data in parts:
+            subtype = content_type.split('/')[1].upper()
+            lines = data.count(b'\n')
+            leaves += f'("TEXT" "{subtype}" ("CHARSET" "utf-8") NIL NIL "BASE64" {len(data)} {lines} NIL NIL NIL)'
+        return f'({leaves} "ALTERNATIVE" ("BOUNDARY" "{BOUNDARY}") NIL NIL)'
+
+def parse_message_set(message_set, largest):
+    """Expand an IMAP message set like 1:5,9,12:* into a sorted list of numbers <= largest"""
+    numbers = set()
+    for item in message_set.split(','):
+        start, _, end = item.partition(':')
+        start = largest if start == '*' else int(start)
+        end = start if not end else largest if end == '*' else int(end)
+        low, high = min(start, end), max(start, end)
+        numbers.update(range(max(low, 1), min(high, largest) + 1))
+    return sorted(numbers)
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    """One client connection: reads tagged commands and writes responses"""
+
+    def send(self, data):
+        self.wfile.write(data)
+        self.server.count('bytes_sent', len(data))
+
+    def handle(self):
+        self.send(b'* OK [CAPABILITY IMAP4rev1] Local IMAP stand-in ready\r\n')
+        self.wfile.flush()
+
+        for line in self.rfile:
+            self.server.count('bytes_received', len(line))
+            self.server.count('round_trips')
+
+            tag, _, rest = line.decode().rstrip('\r\n').partition(' ')
+            command, _, args = rest.partition(' ')
+            handler = getattr(self, f'do_{command.upper()}', None)
+
+            if handler is None:
+                self.send(f'{tag} BAD Unknown command {command}\r\n'.encode())
+            else:
+                handler(tag, args)
+            self.wfile.flush()
+
+            if command.upper() == 'LOGOUT':
+                break
+
+    def do_CAPABILITY(self, tag, args):
+        self.send(f'* CAPABILITY IMAP4rev1\r\n{tag} OK CAPABILITY completed\r\n'.encode())
+
+    def do_NOOP(self, tag, args):
+        self.send(f'{tag} OK NOOP completed\r\n'.encode())
+
+    def do_LOGIN(self, tag, args):
+        self.send(f'{tag} OK LOGIN completed\r\n'.encode())
+
+    def do_SELECT(self, tag, args, mode='READ-WRITE'):
+        box = self.server.mailbox
+        self.send((
+            f'* {box.count} EXISTS\r\n* 0 RECENT\r\n'
+            f'* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid\r\n* OK [UIDNEXT {box.uidnext}] Predicted next UID\r\n'
+            f'{tag} OK [{mode}] SELECT completed\r\n'
+        ).encode())
+
+    def do_EXAMINE(self, tag, args):
+        self.do_SELECT(tag, args, mode='READ-ONLY')
+
+    def do_STATUS(self, tag, args):
+        box = self.server.mailbox
+        name = args.split(' ')[0]
+        self.send((
+            f'* STATUS {name} (MESSAGES {box.count} UIDVALIDITY {box.uidvalidity} UIDNEXT {box.uidnext})\r\n'
+            f'{tag} OK STATUS completed\r\n'
+        ).encode())
+
+    def do_LOGOUT(self, tag, args):
+        self.send(f'* BYE Logging out\r\n{tag} OK LOGOUT completed\r\n'.encode())
+
+    def do_UID(self, tag, args):
+        command, _, args = args.partition(' ')
+        if command.upper() == 'SEARCH':
+            self.uid_search(tag, args)
+        elif command.upper() == 'FETCH':
+            self.uid_fetch(tag, args)
+        else:
+            self.send(f'{tag} BAD Unsupported UID command {command}\r\n'.encode())
+
+    def uid_search(self, tag, args):
+        box = self.server.mailbox
+        uids = range(1, box.count + 1)
+
+        for key, value in re.findall(r'(\w+) ("[^"]*"|\S+)', args):
+            if key.upper() == 'UID':
+                uids = parse_message_set(value, box.count)
+            elif key.upper() == 'FROM':
+                needle = value.strip('"').lower()
+                uids = [uid for uid in uids if needle in box.sender(uid).lower()]
+
+        self.send(f"* SEARCH {' '.join(map(str, uids))}\r\n{tag} OK SEARCH completed\r\n".encode())
+
+    def uid_fetch(self, tag, args):
+        box = self.server.mailbox
+        message_set, _, items = args.partition(' ')
+        items = items.upper()
+
+        sections = re.findall(r'BODY(?:\.PEEK)?\[([^\]]*)\]', items)
+        for uid in parse_message_set(message_set, box.count):
+            response = f'* {uid} FETCH (UID {uid}'.encode()
+            if 'BODYSTRUCTURE' in items:
+                response += f' BODYSTRUCTURE {box.bodystructure(uid)}'.encode()
+
+            literals = []
+            if re.search(r'\bRFC822\b', items):
+                literals.append(('RFC822', box.rfc822(uid)))
+            for section in sections:
+                if section.startswith('HEADER.FIELDS'):
+                    fields = set(re.search(r'\(([^)]*)\)', section).group(1).split())
+                    literals.append((f'BODY[{section}]', box.header_block(uid, fields)))
+                elif section.isdigit():
+                    literals.append((f'BODY[{section}]', box.part(uid, int(section))))
+
+            for name, data in literals:
+                response += f' {name} {{{len(data)}}}\r\n'.encode() + data
+            self.send(response + b')\r\n')
+
+        self.send(f'{tag} OK FETCH completed\r\n'.encode())
+
+class LocalIMAPServer(socketserver.ThreadingTCPServer):
+    """Plain-text IMAP server on localhost that counts bytes and round-trips
+
+    Use as a context manager to serve from a background thread:
+
+        with LocalIMAPServer(SyntheticMailbox(10_000)) as server:
+            host, port = server.server_address
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox, host='127.0.0.1', port=0):
+        super().__init__((host, port), IMAPHandler)
+        self.mailbox = mailbox
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def count(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'round_trips': 0, 'bytes_sent': 0, 'bytes_received': 0}
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic alert mailbox over plain IMAP")
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--port', type=int, default=1143)
+    args = parser.parse_args()
+
+    server = LocalIMAPServer(SyntheticMailbox(args.messages), port=args.port)
+    print(f"Serving {args.messages} messages on 127.0.0.1:{args.port}")
+    server.serve_forever()
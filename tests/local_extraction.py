@@ -0,0 +1,25 @@
+"""Point extract_transactions at a LocalIMAPServer, for tests and benchmarks
+
+Every store extraction writes to (tracker, bronze, raw archive, quarantine log)
+is redirected under data_dir.
+"""
+import sys
+sys.path.insert(0, 'src/extract')
+import extract_transactions
+from bronze_store import BronzeWriter
+from email_tracker import EmailTracker, SQLiteTrackerBackend
+from raw_archive import RawArchive
+
+def point_extraction_at(server, data_dir, setattr=setattr):
+    """Configure extract_transactions for server; tests pass monkeypatch.setattr so it is undone afterwards"""
+    host, port = server.server_address
+    setattr(extract_transactions, 'IMAP_SERVER', host)
+    setattr(extract_transactions, 'IMAP_PORT', port)
+    setattr(extract_transactions, 'IMAP_SSL', False)
+    setattr(extract_transactions, 'EMAIL', 'test@example.com')
+    setattr(extract_transactions, 'PASSWORD', 'password')
+    setattr(extract_transactions, 'tracker',
+            EmailTracker(SQLiteTrackerBackend(str(data_dir / 'tracker.db'), None, None)))
+    setattr(extract_transactions, 'bronze', BronzeWriter(data_dir / 'bronze'))
+    setattr(extract_transactions, 'raw_archive', RawArchive(data_dir / 'raw'))
+    setattr(extract_transactions, 'QUARANTINE_FILE', str(data_dir / 'unparseable.jsonl'))
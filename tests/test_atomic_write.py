@@ -0,0 +1,24 @@
+import json
+import sys
+import pytest
+sys.path.insert(0, 'src/extract')
+from atomic_write import atomic_output, write_atomic, write_json_atomic
+
+def test_writes_replace_the_file(tmp_path):
+    write_json_atomic(tmp_path / 'state.json', {'a': 1})
+    assert json.loads((tmp_path / 'state.json').read_text()) == {'a': 1}
+
+    write_atomic(tmp_path / 'state.json', b'{"a": 2}')
+    assert json.loads((tmp_path / 'state.json').read_text()) == {'a': 2}
+    assert [path.name for path in tmp_path.iterdir()] == ['state.json']
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    write_atomic(tmp_path / 'state.json', 'old')
+
+    with pytest.raises(RuntimeError):
+        with atomic_output(tmp_path / 'state.json') as tmp_file:
+            tmp_file.write_text('half')
+            raise RuntimeError('crashed mid-write')
+
+    assert (tmp_path / 'state.json').read_text() == 'old'
+    assert [path.name for path in tmp_path.iterdir()] == ['state.json']
@@ -0,0 +1,56 @@
+import json
+import sys
+import pandas as pd
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+sys.path.insert(0, 'tests')
+from bronze_reader import TRANSACTION_FIELDS, read_bronze, segment_tasks
+from bronze_store import BronzeWriter, iter_bronze_records
+from test_bronze_store import make_transaction
+from transform_transactions import load_ml_model, categorize_transactions
+
+def write_bronze(bronze_dir, count):
+    bronze_dir.mkdir(exist_ok=True)
+    legacy = {**make_transaction(99), 'card_name': None}
+    del legacy['amount']
+    (bronze_dir / 'transaction_20250101_chase_99.json').write_text(json.dumps(legacy))
+
+    writer = BronzeWriter(bronze_dir, max_segment_bytes=4000)
+    for i in range(count):
+        writer.append(make_transaction(i), f"1-{i}")
+    writer.close()
+
+def test_parallel_read_matches_serial_iteration(tmp_path):
+    write_bronze(tmp_path, 60)
+    expected = pd.DataFrame(list(iter_bronze_records(tmp_path)))
+
+    frame = read_bronze(tmp_path, workers=2, chunk_bytes=500)
+    assert frame.columns.tolist() == expected.columns.tolist()
+    assert frame.astype(object).where(frame.notna(), None).values.tolist() == \
+        expected.astype(object).where(expected.notna(), None).values.tolist()
+
+    projected = read_bronze(tmp_path, fields=TRANSACTION_FIELDS, workers=2, chunk_bytes=500)
+    assert projected.columns.tolist() == TRANSACTION_FIELDS
+    assert projected['merchant_name'].tolist() == expected['merchant_name'].tolist()
+
+def test_segment_tasks_are_line_aligned_and_drop_torn_line(tmp_path):
+    write_bronze(tmp_path, 10)
+    segment = tmp_path / 'segments' / 'segment-000001.jsonl'
+    with open(segment, 'ab') as f:
+        f.write(b'{"torn": ')
+
+    tasks = segment_tasks(segment, chunk_bytes=300)
+    data = segment.read_bytes()
+    assert len(tasks) > 1
+    assert all(start == 0 or data[start - 1:start] == b'\n' for _, _, start, _ in tasks)
+    assert len(read_bronze(tmp_path, workers=1, chunk_bytes=300)) == 11
+
+def test_categorize_accepts_bronze_frame(tmp_path):
+    write_bronze(tmp_path, 20)
+    model, pipeline = load_ml_model()
+    frame = read_bronze(tmp_path, fields=TRANSACTION_FIELDS, workers=1)
+    records = [{key: value for key, value in record.items() if key in TRANSACTION_FIELDS}
+               for record in iter_bronze_records(tmp_path)]
+
+    assert categorize_transactions(frame, model, pipeline, chunk_size=8) == \
+        categorize_transactions(records, model, pipeline, chunk_size=8)
@@ -0,0 +1,64 @@
+import json
+import sys
+sys.path.insert(0, 'src/extract')
+from bronze_store import BronzeWriter, iter_bronze_records, load_manifest
+
+def make_transaction(i):
+    return {
+        'card_name': 'Chase',
+        'merchant_name': f'MERCHANT {i}',
+        'transaction_date': 'Jan 10, 2025 at 8:14 AM ET',
+        'amount': float(i),
+        'raw_email_data': '<p>alert</p>'
+    }
+
+def test_records_stream_back_in_order(tmp_path):
+    writer = BronzeWriter(tmp_path)
+    for i in range(5):
+        writer.append(make_transaction(i), f"1-{i}")
+    writer.close()
+
+    records = list(iter_bronze_records(tmp_path))
+    assert [r['merchant_name'] for r in records] == [f'MERCHANT {i}' for i in range(5)]
+    assert records[0]['email_id'] == '1-0'
+
+def test_segments_rotate_and_seal(tmp_path):
+    writer = BronzeWriter(tmp_path, max_segment_bytes=600)
+    for i in range(10):
+        writer.append(make_transaction(i), f"1-{i}")
+    writer.close()
+
+    segments = load_manifest(tmp_path)['segments']
+    assert len(segments) > 1
+    assert all(segment['sealed'] for segment in segments[:-1])
+    assert not segments[-1]['sealed']
+    assert sum(segment['records'] for segment in segments) == 10
+    assert len(list(iter_bronze_records(tmp_path))) == 10
+
+def test_torn_line_is_skipped_and_trimmed(tmp_path):
+    writer = BronzeWriter(tmp_path)
+    writer.append(make_transaction(0), "1-0")
+    writer.close()
+
+    #Simulate a crash halfway through writing a record
+    segment = tmp_path / 'segments' / load_manifest(tmp_path)['segments'][-1]['name']
+    with open(segment, 'a') as f:
+        f.write('{"email_id": "1-1", "card_na')
+
+    assert len(list(iter_bronze_records(tmp_path))) == 1
+
+    writer = BronzeWriter(tmp_path)
+    writer.append(make_transaction(2), "1-2")
+    writer.close()
+
+    assert [r['email_id'] for r in iter_bronze_records(tmp_path)] == ['1-0', '1-2']
+
+def test_legacy_json_files_are_still_read(tmp_path):
+    with open(tmp_path / 'transaction_20250101_chase_7.json', 'w') as f:
+        json.dump(make_transaction(7), f, indent=2)
+
+    writer = BronzeWriter(tmp_path)
+    writer.append(make_transaction(8), "1-8")
+    writer.close()
+
+    assert [r['merchant_name'] for r in iter_bronze_records(tmp_path)] == ['MERCHANT 7', 'MERCHANT 8']
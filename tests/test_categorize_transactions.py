@@ -0,0 +1,97 @@
+import random
+import sys
+from collections import Counter
+sys.path.insert(0, 'src/transform')
+from categorization_cache import CategorizationCache
+from category_lookup import MerchantLookup
+from feature_pipeline import amount_bucket, amount_buckets
+from transaction_dates import parse_dates
+from transform_transactions import load_ml_model, categorize_transaction, categorize_transactions, parse_date
+
+def test_amount_buckets_match_amount_bucket():
+    amounts = [None, float('nan'), 0, 0.0, -5, 1.99, 2.0, 9.99, 10.0, 29.99, 30, 74.99, 75, 149.99, 150, 1234.5]
+    assert list(amount_buckets(amounts)) == [amount_bucket(amount) for amount in amounts]
+
+def test_batch_matches_per_row():
+    model, pipeline = load_ml_model()
+    vocabulary = sorted(pipeline.vectorizer.vocabulary_)
+    rng = random.Random(7)
+
+    transactions = [
+        {
+            'merchant_name': ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))),
+            'amount': rng.choice([None, 0, 4.5, 12.0, 80.25, 420.0]),
+            'card_name': rng.choice(['Chase', 'Discover', 'CapitalOne', 'Unknown']),
+            'transaction_date': rng.choice(['January 5, 2025', 'Jan 10, 2025 at 8:14 AM ET', 'not a date', None]),
+        }
+        for _ in range(300)
+    ]
+    transactions.append({'merchant_name': 'NO OTHER FIELDS'})
+
+    expected = [categorize_transaction(t, model, pipeline) for t in transactions]
+    assert categorize_transactions(transactions, model, pipeline, chunk_size=64) == expected
+
+def test_cache_hits_match_model_and_survive_restart(tmp_path):
+    model, pipeline = load_ml_model()
+    transactions = [
+        {'merchant_name': 'STARBUCKS', 'amount': 5.47, 'card_name': 'Discover', 'transaction_date': 'January 5, 2025'},
+        {'merchant_name': 'SHELL OIL', 'amount': 45.0, 'card_name': 'Chase', 'transaction_date': 'Jan 10, 2025 at 8:14 AM ET'},
+    ] * 3
+    expected = categorize_transactions(transactions, model, pipeline)
+
+    cache = CategorizationCache('v1', tmp_path / 'cache.json')
+    assert categorize_transactions(transactions, model, pipeline, cache=cache) == expected
+    cache.save()
+
+    reopened = CategorizationCache('v1', tmp_path / 'cache.json')
+    assert categorize_transactions(transactions, model, pipeline, cache=reopened) == expected
+    assert reopened.misses == 0 and reopened.hits == 2
+
+    assert len(CategorizationCache('v2', tmp_path / 'cache.json').entries) == 0
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = CategorizationCache('v1', tmp_path / 'cache.json', max_entries=2)
+    cache.put(('A', 1, 0, 1), 'Dining')
+    cache.put(('B', 1, 0, 1), 'Shopping')
+    cache.get(('A', 1, 0, 1))
+    cache.put(('C', 1, 0, 1), 'Bills')
+
+    assert list(cache.entries) == [('A', 1, 0, 1), ('C', 1, 0, 1)]
+
+def test_lookup_tiers_run_before_the_model():
+    model, pipeline = load_ml_model()
+    lookups = [
+        ('override', MerchantLookup({'SHELL OIL 57444': 'Bills'})),
+        ('labeled', MerchantLookup({'SHELL OIL 57444': 'Transportation', 'STARBUCKS STORE 22093': 'Dining',
+                                    'CHIPOTLE 2129': 'Dining', 'CHIPOTLE 3300': 'Shopping'})),
+    ]
+    transactions = [
+        {'merchant_name': 'SHELL OIL 57444', 'amount': 45.0, 'card_name': 'Chase'},
+        {'merchant_name': 'Starbucks Store #1180', 'amount': 5.0, 'card_name': 'Discover'},
+        {'merchant_name': 'CHIPOTLE 9999', 'amount': 11.0, 'card_name': 'CapitalOne'},
+        {'merchant_name': 'NETFLIX.COM', 'amount': 15.49, 'card_name': 'Discover'},
+    ]
+    tier_counts = Counter()
+
+    result = categorize_transactions(transactions, model, pipeline, lookups=lookups,
+                                     tier_counts=tier_counts)
+
+    assert [row['category'] for row in result[:2]] == ['Bills', 'Dining']
+    #CHIPOTLE's normalized key is ambiguous, so it falls through to the model like NETFLIX
+    assert result[2:] == categorize_transactions(transactions[2:], model, pipeline)
+    assert tier_counts == Counter({'override': 1, 'labeled_normalized': 1, 'model': 2})
+
+def test_parse_dates_matches_parse_date_and_reports_unknown_formats():
+    date_strs = ['January 5, 2025', ' Jan 10, 2025 at 8:14 AM ET ', 'Sept 3, 2025', 'September 31, 2025',
+                 'Jan 10, 2025 at 8:14 AM', 'May 5, 2025', '', None, 'January 5, 2025']
+    parsed = parse_dates(date_strs)
+
+    assert parsed.iso == [parse_date(date_str) for date_str in date_strs]
+    assert list(parsed.days) == [5, 10, 15, 15, 15, 5, 15, 15, 5]
+    assert str(parsed.dates[1]) == '2025-01-10'
+    assert parsed.unparseable == [2, 3, 4]
+
+    unparseable = []
+    categorize_transactions([{'merchant_name': 'SHELL', 'transaction_date': 'Sept 3, 2025'}], *load_ml_model(),
+                            unparseable_dates=unparseable)
+    assert unparseable == ['Sept 3, 2025']
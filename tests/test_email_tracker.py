@@ -0,0 +1,83 @@
+import sys
+import pytest
+sys.path.insert(0, 'src/extract')
+from email_tracker import EmailTracker, SQLiteTrackerBackend, FileTrackerBackend
+
+def sqlite_backend(tmp_path):
+    return SQLiteTrackerBackend(
+        str(tmp_path / 'processed_emails.db'),
+        legacy_tracker_file=str(tmp_path / 'processed_emails.txt'),
+        legacy_checkpoint_file=str(tmp_path / 'sync_checkpoints.json')
+    )
+
+def file_backend(tmp_path):
+    return FileTrackerBackend(str(tmp_path / 'processed_emails.txt'), str(tmp_path / 'sync_checkpoints.json'))
+
+backends = pytest.mark.parametrize('make_backend', [sqlite_backend, file_backend])
+
+@backends
+def test_batched_marks_survive_reopen(tmp_path, make_backend):
+    tracker = EmailTracker(make_backend(tmp_path))
+    tracker.mark_processed_many([f"7-{uid}" for uid in range(1, 1201)])
+    tracker.mark_processed("7-5000")
+    tracker.close()
+
+    tracker = EmailTracker(make_backend(tmp_path))
+    candidates = [f"7-{uid}" for uid in range(1195, 1206)] + ["7-5000"]
+    assert tracker.filter_unprocessed(candidates) == [f"7-{uid}" for uid in range(1201, 1206)]
+    assert tracker.is_processed("7-1")
+    assert not tracker.is_processed("8-1")
+
+@backends
+def test_checkpoints_reset_on_uidvalidity_change(tmp_path, make_backend):
+    tracker = EmailTracker(make_backend(tmp_path))
+    tracker.set_checkpoint('inbox', 7, 120)
+    tracker.close()
+
+    tracker = EmailTracker(make_backend(tmp_path))
+    assert tracker.get_checkpoint('inbox', 7) == 120
+    assert tracker.get_checkpoint('inbox', 8) == 0
+
+@backends
+def test_checkpoint_advances_and_restarts_after_uidvalidity_change(tmp_path, make_backend):
+    tracker = EmailTracker(make_backend(tmp_path))
+    assert tracker.get_checkpoint('inbox', 7) == 0
+    tracker.set_checkpoint('inbox', 7, 120)
+    tracker.set_checkpoint('inbox', 7, 150)
+    assert tracker.get_checkpoint('inbox', 7) == 150
+
+    #A rebuilt mailbox starts over from UID 0 and the new checkpoint replaces the old one
+    assert tracker.get_checkpoint('inbox', 8) == 0
+    tracker.set_checkpoint('inbox', 8, 3)
+    tracker.set_checkpoint('archive', 7, 40)
+    tracker.close()
+
+    tracker = EmailTracker(make_backend(tmp_path))
+    assert tracker.get_checkpoint('inbox', 8) == 3
+    assert tracker.get_checkpoint('inbox', 7) == 0
+    assert tracker.get_checkpoint('archive', 7) == 40
+
+@backends
+def test_compact_drops_ids_covered_by_checkpoint(tmp_path, make_backend):
+    tracker = EmailTracker(make_backend(tmp_path))
+    tracker.mark_processed_many(["41", "6-3", "7-100", "7-120", "7-121", "7-150"])
+    tracker.set_checkpoint('inbox', 7, 120)
+    tracker.compact()
+
+    assert tracker.processed_among(["41", "6-3", "7-100", "7-120", "7-121", "7-150"]) == {"7-121", "7-150"}
+
+def test_sqlite_backend_migrates_text_tracker(tmp_path):
+    (tmp_path / 'processed_emails.txt').write_text("7-1\n7-2\n")
+
+    tracker = EmailTracker(sqlite_backend(tmp_path))
+    assert tracker.processed_among(["7-1", "7-2", "7-3"]) == {"7-1", "7-2"}
+    assert not (tmp_path / 'processed_emails.txt').exists()
+
+def test_file_backend_trims_torn_line(tmp_path):
+    (tmp_path / 'processed_emails.txt').write_text("7-1\n7-")
+
+    tracker = EmailTracker(file_backend(tmp_path))
+    tracker.mark_processed("7-2")
+    tracker.close()
+
+    assert (tmp_path / 'processed_emails.txt').read_text() == "7-1\n7-2\n"
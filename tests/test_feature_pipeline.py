@@ -0,0 +1,65 @@
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack, csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+sys.path.insert(0, 'src/transform')
+from feature_pipeline import FeaturePipeline, amount_bucket
+from transaction_dates import parse_dates
+from transform_transactions import categorize_transactions, load_ml_model
+
+FRAME = pd.DataFrame({
+    'merchant_name': ['STARBUCKS', 'SHELL OIL', 'NEW MERCHANT', 'SPOTIFY'],
+    'amount': [5.47, None, 0.0, 1234.5],
+    'card_name': ['Discover', 'Chase', None, 'Amex'],
+    'transaction_date': ['January 5, 2025', 'Jan 10, 2025 at 8:14 AM ET', None, 'not a date'],
+})
+
+def per_row_features(pipeline, row):
+    """The per-row hstack training and transform used to build separately"""
+    card = 'Unknown' if row['card_name'] is None else row['card_name']
+    amount = None if pd.isna(row['amount']) else row['amount']
+    numeric = [[amount_bucket(amount), pipeline.card_mapping.get(card, 0), parse_dates([row['transaction_date']]).days[0]]]
+    return hstack([pipeline.vectorizer.transform([row['merchant_name']]), csr_matrix(numeric)])
+
+def test_batch_single_row_and_per_row_features_agree():
+    _, pipeline = load_ml_model()
+    batch = pipeline.transform(FRAME)
+    keys, _ = pipeline.keys(FRAME['merchant_name'], FRAME['amount'], FRAME['card_name'], FRAME['transaction_date'])
+
+    assert (batch != pipeline.transform_keys(keys)).nnz == 0
+    for i, row in FRAME.iterrows():
+        assert (batch[i] != per_row_features(pipeline, row)).nnz == 0
+        assert (batch[i] != pipeline.transform(FRAME.iloc[[i]])).nnz == 0
+    #Missing and zero amounts share the unknown bucket; unmapped cards fall back to index 0
+    assert [key[1:3] for key in keys] == [(1, 2), (2, 1), (2, 0), (5, 0)]
+
+def test_fit_pickles_and_extends_cards():
+    pipeline = FeaturePipeline(TfidfVectorizer()).fit(FRAME['merchant_name'], FRAME['card_name'])
+    assert pipeline.card_mapping == {'Amex': 0, 'Chase': 1, 'Discover': 2, 'Unknown': 3}
+
+    restored = pickle.loads(pickle.dumps(pipeline))
+    restored.add_cards(['Chase', 'Citi'])
+    assert restored.card_mapping == {'Amex': 0, 'Chase': 1, 'Discover': 2, 'Unknown': 3, 'Citi': 4}
+    assert np.array_equal(restored.transform(FRAME).toarray(), pipeline.transform(FRAME).toarray())
+
+class RecordingCache(dict):
+    def put(self, key, category):
+        self[key] = category
+
+def test_legacy_model_keeps_raw_merchants():
+    model, pipeline = load_ml_model()
+    assert not pipeline.canonical_merchants
+
+    raw = FRAME.assign(merchant_name=['STARBUCKS STORE 22093', 'SHELL OIL 57444', 'NEW MERCHANT', 'AMZN Mktp US*2K4'])
+    cache = RecordingCache()
+    rows = categorize_transactions(raw, model, pipeline, cache=cache)
+    assert {key[0] for key in cache} == set(raw['merchant_name'])
+    assert [row['category'] for row in rows] == [str(category) for category in model.predict(pipeline.transform(raw))]
+    assert [row['canonical_merchant'] for row in rows] == ['STARBUCKS', 'SHELL OIL', 'NEW MERCHANT', 'AMAZON MKTPLACE']
+
+def test_pipelines_pickled_without_the_flag_are_canonical():
+    pipeline = FeaturePipeline(TfidfVectorizer()).fit(FRAME['merchant_name'], FRAME['card_name'])
+    del pipeline.__dict__['canonical_merchants']
+    assert pickle.loads(pickle.dumps(pipeline)).canonical_merchants
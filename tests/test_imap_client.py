@@ -0,0 +1,69 @@
+import sys
+sys.path.insert(0, 'src/extract')
+from imap_client import (
+    build_message_set, parse_fetch_response, find_literal, parse_bodystructure, select_body_part
+)
+
+def test_build_message_set_compresses_runs():
+    assert build_message_set([5, 1, 2, 3, 10, 7, 8]) == '1:3,5,7:8,10'
+    assert build_message_set(['12', '11']) == '11:12'
+    assert build_message_set([42]) == '42'
+    assert build_message_set([]) == ''
+
+def test_parse_fetch_response_groups_literals_by_message():
+    msg_data = [
+        (b'1 (UID 5 RFC822 {5}', b'first'),
+        b')',
+        (b'2 (RFC822 {6}', b'second'),
+        b' UID 9)',
+        None,
+        (b'3 (UID 12 BODYSTRUCTURE ("text" "html" NIL NIL NIL "7bit" 10 1) BODY[HEADER.FIELDS (FROM SUBJECT)] {7}', b'headers'),
+        b')'
+    ]
+
+    parsed = parse_fetch_response(msg_data)
+
+    assert [uid for uid, _, _ in parsed] == [5, 9, 12]
+    assert find_literal(parsed[0][2], rb'RFC822') == b'first'
+    #UID sent after the literal still belongs to the second message
+    assert find_literal(parsed[1][2], rb'RFC822') == b'second'
+    assert find_literal(parsed[2][2], rb'BODY\[HEADER[^\]]*\]') == b'headers'
+    assert b'BODYSTRUCTURE' in parsed[2][1]
+
+def test_parse_fetch_response_skips_messages_without_uid():
+    assert parse_fetch_response([(b'1 (RFC822 {3}', b'abc'), b')']) == []
+
+def test_select_body_part_single_part():
+    structure = parse_bodystructure(b'1 (UID 3 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "BASE64" 120 2))')
+
+    assert structure[:2] == ['TEXT', 'PLAIN']
+    assert structure[2] == ['CHARSET', 'utf-8']
+    assert select_body_part(structure) == ('1', 'base64')
+
+def test_select_body_part_prefers_last_html_part():
+    metadata = (
+        b'1 (UID 3 BODYSTRUCTURE ('
+        b'("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 20 1 NIL NIL NIL NIL)'
+        b'(("text" "html" ("charset" "utf-8") NIL NIL "quoted-printable" 40 2 NIL NIL NIL NIL)'
+        b'("image" "png" ("name" {8}) NIL NIL "base64" 300 NIL NIL NIL NIL) "related" NIL NIL NIL)'
+        b' "mixed" ("boundary" "b1") NIL NIL NIL))'
+    )
+
+    assert select_body_part(parse_bodystructure(metadata)) == ('2.1', 'quoted-printable')
+
+def test_select_body_part_walks_attached_messages():
+    metadata = (
+        b'1 (UID 3 BODYSTRUCTURE ('
+        b'("text" "plain" NIL NIL NIL "7bit" 20 1)'
+        b'("message" "rfc822" NIL NIL NIL "7bit" 500 ("date" "subject" NIL NIL NIL NIL NIL NIL NIL "<id>")'
+        b' (("text" "plain" NIL NIL NIL "7bit" 10 1)("text" "html" NIL NIL NIL "base64" 30 1) "alternative") 12)'
+        b' "mixed"))'
+    )
+
+    assert select_body_part(parse_bodystructure(metadata)) == ('2.2', 'base64')
+
+def test_select_body_part_without_text_parts():
+    metadata = b'1 (UID 3 BODYSTRUCTURE (("image" "png" NIL NIL NIL "base64" 300)("application" "pdf" NIL NIL NIL "base64" 900) "mixed"))'
+
+    assert select_body_part(parse_bodystructure(metadata)) is None
+    assert parse_bodystructure(b'1 (UID 3 RFC822.SIZE 40)') is None
@@ -0,0 +1,149 @@
+import json
+import sys
+import pyarrow.parquet as pq
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+from bronze_store import BronzeWriter
+from raw_archive import content_hash
+from silver_store import load_silver_manifest, save_silver_manifest, read_new_bronze, read_silver, empty_manifest
+from transform_transactions import transform_transactions
+
+JANUARY = 'year=2025/month=01'
+
+def alert(i, date='Jan 10, 2025 at 8:14 AM ET'):
+    return {
+        'card_name': 'Chase',
+        'merchant_name': f'STARBUCKS STORE {i}',
+        'transaction_date': date,
+        'amount': 4.0 + i,
+        'raw_email_hash': None
+    }
+
+def append_alerts(bronze_dir, ids, date='Jan 10, 2025 at 8:14 AM ET'):
+    writer = BronzeWriter(bronze_dir)
+    for i in ids:
+        writer.append(alert(i, date), f"1-{i}")
+    writer.close()
+
+def silver_rows(silver_dir):
+    return read_silver(silver_dir)
+
+def partition_files(silver_dir):
+    return {path.parent.relative_to(silver_dir).as_posix(): path.name for path in silver_dir.glob('year=*/month=*/*')}
+
+def test_only_new_records_are_transformed(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    bronze_dir.mkdir()
+    (bronze_dir / 'transaction_20250101_chase_42.json').write_text(json.dumps(alert(42)))
+    append_alerts(bronze_dir, range(3))
+
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert len(silver_rows(silver_dir)) == 4
+    first = partition_files(silver_dir)
+
+    #Nothing new: nothing rewritten
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert partition_files(silver_dir) == first
+
+    append_alerts(bronze_dir, range(3, 5))
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert list(partition_files(silver_dir)) == [JANUARY] and partition_files(silver_dir) != first
+    assert sorted(silver_rows(silver_dir)['amount']) == [4.0, 5.0, 6.0, 7.0, 8.0, 46.0]
+
+    transform_transactions(full_rebuild=True, bronze_dir=bronze_dir, silver_dir=silver_dir,
+                           cache_file=tmp_path / 'cache.json')
+    assert list(load_silver_manifest(silver_dir)['partitions']) == [JANUARY]
+    assert len(silver_rows(silver_dir)) == 6
+
+def test_re_extracted_emails_are_skipped(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    append_alerts(bronze_dir, range(3))
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+
+    #An aborted extract run appended 1-2 again on retry, and 1-3 twice within one run
+    append_alerts(bronze_dir, [2, 3, 3])
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert sorted(silver_rows(silver_dir)['email_id']) == ['1-0', '1-1', '1-2', '1-3']
+
+def test_legacy_alerts_fetched_again_by_uid_are_skipped(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    bronze_dir.mkdir()
+    for i in range(2):
+        legacy = {**alert(i), 'raw_email_data': f'<p>alert {i}</p>'}
+        del legacy['raw_email_hash']
+        (bronze_dir / f'transaction_20250101_chase_{i}.json').write_text(json.dumps(legacy))
+
+    #The first UID-based sync fetches alert 0 again, archiving its body instead of embedding it
+    writer = BronzeWriter(bronze_dir)
+    writer.append({**alert(0), 'raw_email_hash': content_hash('<p>alert 0</p>')}, "7-100")
+    writer.close()
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert sorted(silver_rows(silver_dir)['amount']) == [4.0, 5.0]
+
+    #Alert 1 comes back in a later sync, after its legacy record is already in silver
+    writer = BronzeWriter(bronze_dir)
+    writer.append({**alert(1), 'raw_email_hash': content_hash('<p>alert 1</p>')}, "7-101")
+    writer.close()
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    assert sorted(silver_rows(silver_dir)['amount']) == [4.0, 5.0]
+
+def test_rewritten_segment_is_reported_not_reread(tmp_path):
+    bronze_dir = tmp_path / 'bronze'
+    append_alerts(bronze_dir, range(3))
+    records, inputs, changed = read_new_bronze(empty_manifest(), bronze_dir)
+    assert len(records) == 3 and not changed
+
+    segment = bronze_dir / 'segments' / 'segment-000001.jsonl'
+    segment.write_bytes(segment.read_bytes().replace(b'STORE 0', b'STORE 9'))
+    append_alerts(bronze_dir, [3])
+
+    records, _, changed = read_new_bronze({'inputs': inputs, 'parts': []}, bronze_dir)
+    assert records.empty and changed == ['segments/segment-000001.jsonl']
+
+def test_orphan_part_from_crashed_run_is_removed(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    append_alerts(bronze_dir, range(2))
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+
+    orphan = silver_dir / JANUARY / 'part-20000101T000000000000.parquet'
+    silver_rows(silver_dir).to_parquet(orphan, index=False)
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+
+    assert not orphan.exists()
+    assert len(silver_rows(silver_dir)) == 2
+
+def test_older_silver_schema_is_rebuilt(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    append_alerts(bronze_dir, range(2))
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+
+    manifest = load_silver_manifest(silver_dir)
+    del manifest['schema_version']
+    save_silver_manifest(manifest, silver_dir)
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+
+    assert load_silver_manifest(silver_dir)['partitions'] != manifest['partitions']
+    assert list(silver_rows(silver_dir)['canonical_merchant']) == ['STARBUCKS', 'STARBUCKS']
+
+def test_only_touched_months_are_rewritten_and_reads_prune(tmp_path):
+    bronze_dir, silver_dir = tmp_path / 'bronze', tmp_path / 'silver'
+    append_alerts(bronze_dir, [1], 'Jan 20, 2025 at 8:14 AM ET')
+    append_alerts(bronze_dir, [2], 'January 5, 2025')
+    append_alerts(bronze_dir, [3], 'March 2, 2025')
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    first = partition_files(silver_dir)
+    assert set(first) == {JANUARY, 'year=2025/month=03'}
+
+    append_alerts(bronze_dir, [4], 'January 12, 2025')
+    transform_transactions(bronze_dir=bronze_dir, silver_dir=silver_dir, cache_file=tmp_path / 'cache.json')
+    second = partition_files(silver_dir)
+    assert second[JANUARY] != first[JANUARY] and second['year=2025/month=03'] == first['year=2025/month=03']
+
+    january = silver_dir / JANUARY / second[JANUARY]
+    assert pq.read_table(january)['transaction_date'].to_pylist() == ['2025-01-05', '2025-01-12', '2025-01-20']
+    column = pq.ParquetFile(january).metadata.row_group(0).column(2)
+    assert column.compression == 'ZSTD' and 'RLE_DICTIONARY' in column.encodings
+
+    assert sorted(read_silver(silver_dir, start='2025-01-10')['transaction_date']) == \
+        ['2025-01-12', '2025-01-20', '2025-03-02']
+    assert list(read_silver(silver_dir, start='2025-02-01', end='2025-02-28')['transaction_date']) == []
@@ -0,0 +1,84 @@
+import imaplib
+import json
+import sys
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'tests')
+import extract_transactions
+from bronze_store import iter_bronze_records
+from imap_server import LocalIMAPServer, SyntheticMailbox
+from local_extraction import point_extraction_at
+
+def test_extract_against_local_server(tmp_path, monkeypatch):
+    box = SyntheticMailbox(40)
+
+    with LocalIMAPServer(box) as server:
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        extract_transactions.extract_all_transactions(batch_size=8, pool_size=2)
+
+        records = list(iter_bronze_records(tmp_path / 'bronze'))
+        assert len(records) == 30
+        assert {r['card_name'] for r in records} == {'Discover', 'Chase', 'CapitalOne'}
+        assert all(r['merchant_name'] and r['transaction_date'] and r['amount'] for r in records)
+
+        #UID 1 is a Chase alert rendered with the second merchant and amount (7919 % 50000) / 100 + 1
+        first = next(r for r in records if r['email_id'] == f"{box.uidvalidity}-1")
+        assert (first['card_name'], first['merchant_name'], first['amount']) == ('Chase', 'SHELL OIL 57444', 80.19)
+
+        #The second run starts from the checkpoint and fetches nothing
+        server.reset_stats()
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        extract_transactions.extract_all_transactions(batch_size=8, pool_size=2)
+        assert len(list(iter_bronze_records(tmp_path / 'bronze'))) == 30
+        assert server.stats['bytes_sent'] < 2000
+
+def test_abort_mid_batch_marks_what_was_saved(tmp_path, monkeypatch):
+    box = SyntheticMailbox(40)
+    fetch_bodies = extract_transactions.fetch_bodies
+    calls = []
+
+    def aborting_fetch_bodies(mail, body_parts, batch_size):
+        calls.append(len(body_parts))
+        for i, item in enumerate(fetch_bodies(mail, body_parts, batch_size)):
+            if len(calls) == 1 and i == 3:
+                raise imaplib.IMAP4.abort('connection reset')
+            yield item
+
+    with LocalIMAPServer(box) as server:
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        monkeypatch.setattr(extract_transactions, 'fetch_bodies', aborting_fetch_bodies)
+        extract_transactions.extract_all_transactions(batch_size=8, pool_size=1)
+        assert len(list(iter_bronze_records(tmp_path / 'bronze'))) < 30
+
+        #The retry fetches only what the aborted batch didn't save, so no email lands in bronze twice
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        extract_transactions.extract_all_transactions(batch_size=8, pool_size=1)
+        email_ids = [r['email_id'] for r in iter_bronze_records(tmp_path / 'bronze')]
+        assert len(email_ids) == len(set(email_ids)) == 30
+
+def test_unparseable_alert_is_quarantined_not_retried(tmp_path, monkeypatch):
+    box = SyntheticMailbox(40)
+    chase = extract_transactions.parsers.parser_for_card('Chase')
+    parse = chase.parse
+
+    def parse_except_shell(email_body):
+        if 'SHELL OIL 57444' in email_body:
+            raise UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+        return parse(email_body)
+
+    with LocalIMAPServer(box) as server:
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        monkeypatch.setattr(chase, 'parse', parse_except_shell)
+        stats = {}
+        for _ in extract_transactions.stream_transactions(batch_size=8, pool_size=2, stats=stats):
+            pass
+
+        #UIDs 1 and 21 are the Chase alerts for SHELL OIL 57444
+        assert (stats['processed'], stats['quarantined'], stats['failed']) == (38, 2, 0)
+        assert len(list(iter_bronze_records(tmp_path / 'bronze'))) == 28
+        entries = [json.loads(line) for line in (tmp_path / 'unparseable.jsonl').read_text().splitlines()]
+        assert sorted(entry['email_id'] for entry in entries) == ['1-1', '1-21']
+        assert all(entry['error'].startswith('UnicodeDecodeError') for entry in entries)
+
+        #The checkpoint moved past the bad alert, so the next run fetches nothing
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+        assert extract_transactions.tracker.get_checkpoint('inbox', box.uidvalidity) == 40
@@ -0,0 +1,27 @@
+import sys
+import pytest
+sys.path.insert(0, 'src/transform')
+from merchant_normalizer import canonical_merchant
+
+@pytest.mark.parametrize('raw, canonical', [
+    ('STARBUCKS STORE 22093', 'STARBUCKS'),
+    ('Starbucks Store #1180', 'STARBUCKS'),
+    ('SQ *BLUE BOTTLE #12 OAKLAND CA', 'BLUE BOTTLE'),
+    ('TST* BULL CITY BURGER - DURHAM', 'BULL CITY BURGER'),
+    ('SHELL OIL 57444', 'SHELL OIL'),
+    ('SPOTIFY P39261', 'SPOTIFY'),
+    ("MCDONALD'S F17954", 'MCDONALDS'),
+    ('7-ELEVEN 35192 DURHAM NC', '7-ELEVEN'),
+    ('AMZN MKTP US*2K4AB1ZX2', 'AMAZON MKTPLACE'),
+    ('PAYPAL *P357D2CDD7', 'PAYPAL'),
+    ('UBER *TRIP', 'UBER TRIP'),
+    ('NETFLIX.COM', 'NETFLIX.COM'),
+    ('', ''),
+])
+def test_canonical_merchant(raw, canonical):
+    assert canonical_merchant(raw) == canonical
+
+def test_canonical_names_are_fixed_points():
+    for raw in ['WHOLEFDS MKT 10436', 'CIRCLE K 23693 CARY NC', 'DD *DOORDASH CHIPOTLE', 'SQ *', '76 - 0461550600']:
+        canonical = canonical_merchant(raw)
+        assert canonical and canonical_merchant(canonical) == canonical
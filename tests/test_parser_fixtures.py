@@ -0,0 +1,86 @@
+import email
+import random
+import sys
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+from email_parser import (
+    TransactionParser, DiscoverParser, ChaseParser, CapitalOneParser, ParserRegistry,
+    strip_html_tags, strip_html_tags_slow
+)
+
+FIXTURES = Path('tests/fixtures')
+
+registry = ParserRegistry([
+    DiscoverParser(),
+    ChaseParser(),
+    CapitalOneParser()
+])
+
+def load_fixture(name):
+    """Return (From, Subject, HTML body) for a fixture email"""
+    msg = email.message_from_bytes((FIXTURES / name).read_bytes())
+    html = next(part for part in msg.walk() if part.get_content_type() == 'text/html')
+    return msg['From'], msg['Subject'], html.get_payload(decode=True).decode()
+
+def test_fast_strip_matches_htmlparser():
+    for eml in FIXTURES.glob('*.eml'):
+        _, _, html = load_fixture(eml.name)
+        assert strip_html_tags(html) == strip_html_tags_slow(html), eml.name
+
+def test_fast_strip_falls_back_on_unclosed_markup():
+    for html in ['<p>a < b</p>', '<td>x<!-- open', '<style>p {}', 'fish &amp chips &c']:
+        assert strip_html_tags(html) == strip_html_tags_slow(html), html
+
+def outcome(strip, html):
+    """Stripped text, or the exception type for markup HTMLParser rejects (e.g. '<![a')"""
+    try:
+        return strip(html)
+    except AssertionError as e:
+        return type(e)
+
+def test_fast_strip_matches_htmlparser_on_random_markup():
+    pieces = ['<', '>', '/', "'", '"', '=', ' ', '\t', '\n', 'a', 'div', 'p', 'href', 'script', 'STYLE', '!', '--',
+              '?', '[', '&amp;', '&#38;', '&', ';', 'x', '</', '<!', '<![CDATA[', ']]>']
+    rng = random.Random(42)
+    for _ in range(20000):
+        html = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 20)))
+        assert outcome(strip_html_tags, html) == outcome(strip_html_tags_slow, html), html
+
+def test_registry_routes_and_parses_fixtures():
+    expected = {
+        'discover_alert.eml': ('Discover', 'STARBUCKS STORE 22093', 'January 5, 2025', 5.47),
+        'chase_alert.eml': ('Chase', 'SHELL OIL 57444', 'Jan 10, 2025 at 8:14 AM ET', 45.00),
+        'capitalone_alert.eml': ('CapitalOne', 'CHIPOTLE 2129', 'January 12, 2025', 11.45),
+    }
+
+    for name, (card_name, merchant_name, transaction_date, amount) in expected.items():
+        email_from, email_subject, html = load_fixture(name)
+        parser = registry.find_parser(email_from, email_subject)
+        transaction = parser.parse(html)
+
+        assert transaction['card_name'] == card_name
+        assert transaction['merchant_name'] == merchant_name
+        assert transaction['transaction_date'] == transaction_date
+        assert transaction['amount'] == amount
+
+def test_registry_rejects_other_mail_from_known_senders():
+    assert registry.find_parser('Chase <no.reply.alerts@chase.com>', 'Your statement is ready') is None
+    assert registry.find_parser('Someone <someone@example.com>', 'Transaction Alert') is None
+    assert registry.find_parser(None, None) is None
+
+def test_registry_dispatches_by_sender_then_subject():
+    class ChaseRefundParser(TransactionParser):
+        card_name = "Chase Refund"
+        sender = 'no.reply.alerts@chase.com'
+        subject = 'You received a refund'
+
+    chase = ChaseParser()
+    refunds = ChaseRefundParser()
+    routes = ParserRegistry([DiscoverParser(), chase, refunds])
+
+    assert routes.find_parser('Chase <No.Reply.Alerts@Chase.com>', 'You made a $45.00 transaction') is chase
+    assert routes.find_parser('no.reply.alerts@chase.com', 'You received a refund') is refunds
+    assert routes.find_parser('no.reply.alerts@chase.com', 'You received a refund!') is None
+    assert sorted(routes.senders) == ['discover@services.discover.com', 'no.reply.alerts@chase.com']
+    assert routes.parser_for_card('Chase Refund') is refunds
+    assert routes.parser_for_card('Amex') is None
@@ -0,0 +1,83 @@
+import email
+import sys
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+from raw_archive import RawArchive, content_hash, load_raw_email, DICT_TRAINING_SAMPLES
+from transaction_record import Transaction
+
+FIXTURES = Path('tests/fixtures')
+
+def fixture_bodies():
+    bodies = []
+    for eml in sorted(FIXTURES.glob('*.eml')):
+        msg = email.message_from_bytes(eml.read_bytes())
+        html = next(part for part in msg.walk() if part.get_content_type() == 'text/html')
+        bodies.append(html.get_payload(decode=True).decode())
+    return bodies
+
+def alert_variants(count):
+    """Fixture bodies with the amount varied, like a stream of real alerts"""
+    bodies = fixture_bodies()
+    return [bodies[i % len(bodies)].replace('$', f'${i}', 1) for i in range(count)]
+
+def test_round_trip_and_dedupe(tmp_path):
+    archive = RawArchive(tmp_path)
+    body = fixture_bodies()[0]
+
+    body_hash = archive.put(body)
+    assert archive.put(body) == body_hash == content_hash(body)
+    assert archive.get(body_hash) == body
+    archive.close()
+
+    assert len((tmp_path / 'index.jsonl').read_text().splitlines()) == 1
+
+def test_dictionary_shrinks_later_bodies(tmp_path):
+    archive = RawArchive(tmp_path)
+    bodies = alert_variants(DICT_TRAINING_SAMPLES + 30)
+    hashes = [archive.put(body) for body in bodies]
+    archive.close()
+
+    reopened = RawArchive(tmp_path)
+    assert [reopened.get(body_hash) for body_hash in hashes] == bodies
+
+    entries = reopened.index
+    before = [entries[h]['length'] for h in hashes[:DICT_TRAINING_SAMPLES - 1]]
+    after = [entries[h]['length'] for h in hashes[DICT_TRAINING_SAMPLES:]]
+    assert all(entries[h]['dict'] for h in hashes[DICT_TRAINING_SAMPLES:])
+    assert sum(after) / len(after) < sum(before) / len(before) / 2
+
+def test_torn_index_line_is_ignored(tmp_path):
+    archive = RawArchive(tmp_path)
+    body_hash = archive.put('<p>one</p>')
+    archive.close()
+
+    with open(tmp_path / 'index.jsonl', 'a') as f:
+        f.write('{"hash": "abc", "pa')
+
+    reopened = RawArchive(tmp_path)
+    assert reopened.get(body_hash) == '<p>one</p>'
+    assert 'abc' not in reopened
+
+    second_hash = reopened.put('<p>two</p>')
+    reopened.close()
+    assert RawArchive(tmp_path).get(second_hash) == '<p>two</p>'
+
+def test_load_raw_email_handles_legacy_and_archived_records(tmp_path):
+    archive = RawArchive(tmp_path)
+    body_hash = archive.put('<p>archived</p>')
+
+    assert load_raw_email({'raw_email_data': '<p>inline</p>'}, archive) == '<p>inline</p>'
+    assert load_raw_email({'raw_email_hash': body_hash}, archive) == '<p>archived</p>'
+    assert load_raw_email({'merchant_name': 'SHELL'}, archive) is None
+
+def test_transaction_refers_to_archived_email(tmp_path):
+    archive = RawArchive(tmp_path)
+    record = {'email_id': '1-7', 'card_name': 'Chase', 'merchant_name': 'SHELL OIL 57444', 'amount': 80.19,
+              'transaction_date': 'Jan 10, 2025 at 8:14 AM ET', 'raw_email_hash': archive.put('<p>alert</p>'),
+              'extracted_at': '2025-01-10T08:15:00'}
+    transaction = Transaction.from_record({**record, 'raw_email_data': '<p>alert</p>'})
+
+    assert not hasattr(transaction, '__dict__')
+    assert transaction.to_record() == {key: value for key, value in record.items() if key != 'extracted_at'}
+    assert transaction.raw_email(archive) == '<p>alert</p>'
+    assert Transaction(merchant_name='SHELL').raw_email(archive) is None
@@ -0,0 +1,84 @@
+import json
+import mailbox
+import sys
+from pathlib import Path
+sys.path.insert(0, 'src/extract')
+from bronze_store import iter_bronze_records
+from email_tracker import EmailTracker, SQLiteTrackerBackend
+from replay_transactions import parse_messages, replay_mailbox, replay_archive
+
+FIXTURES = Path('tests/fixtures')
+
+def build_mbox(path):
+    box = mailbox.mbox(path)
+    for eml in sorted(FIXTURES.glob('*.eml')):
+        box.add(eml.read_bytes())
+    box.add(b"From: someone@example.com\nSubject: hello\n\nnot an alert\n")
+    box.close()
+
+def replay_tracker(tmp_path):
+    return EmailTracker(SQLiteTrackerBackend(str(tmp_path / 'replayed.db'), None, None))
+
+def test_replay_mbox_is_idempotent(tmp_path):
+    build_mbox(tmp_path / 'alerts.mbox')
+    bronze_dir = tmp_path / 'bronze'
+
+    stats = replay_mailbox(str(tmp_path / 'alerts.mbox'), bronze_dir, tmp_path / 'raw',
+                           replay_tracker(tmp_path), workers=2, chunk_size=2)
+    assert stats == {'saved': 3, 'unmatched': 1, 'duplicates': 0, 'errors': 0}
+
+    records = list(iter_bronze_records(bronze_dir))
+    assert sorted(r['merchant_name'] for r in records) == ['CHIPOTLE 2129', 'SHELL OIL 57444', 'STARBUCKS STORE 22093']
+    assert all(r['email_id'].startswith('replay-') and r['raw_email_hash'] for r in records)
+
+    stats = replay_mailbox(str(tmp_path / 'alerts.mbox'), bronze_dir, tmp_path / 'raw',
+                           replay_tracker(tmp_path), workers=2)
+    assert stats['saved'] == 0
+    assert len(list(iter_bronze_records(bronze_dir))) == 3
+
+def test_replay_skips_alerts_already_archived(tmp_path):
+    build_mbox(tmp_path / 'alerts.mbox')
+    replay_mailbox(str(tmp_path / 'alerts.mbox'), tmp_path / 'bronze', tmp_path / 'raw',
+                   replay_tracker(tmp_path), workers=2)
+
+    #A fresh replay tracker knows nothing, but the raw archive already holds these bodies
+    fresh_tracker = EmailTracker(SQLiteTrackerBackend(str(tmp_path / 'other.db'), None, None))
+    stats = replay_mailbox(str(tmp_path / 'alerts.mbox'), tmp_path / 'bronze', tmp_path / 'raw',
+                           fresh_tracker, workers=2)
+    assert stats == {'saved': 0, 'unmatched': 1, 'duplicates': 3, 'errors': 0}
+    assert len(list(iter_bronze_records(tmp_path / 'bronze'))) == 3
+
+def test_replay_skips_alerts_in_legacy_bronze(tmp_path):
+    build_mbox(tmp_path / 'alerts.mbox')
+    bronze_dir = tmp_path / 'bronze'
+    bronze_dir.mkdir()
+
+    #Legacy per-email JSON embeds the body, which was never put in the raw archive
+    chase = (FIXTURES / 'chase_alert.eml').read_bytes()
+    [(_, transaction, _)] = parse_messages([('legacy', chase)])
+    (bronze_dir / 'transaction_20250101_chase_7.json').write_text(json.dumps(transaction))
+
+    stats = replay_mailbox(str(tmp_path / 'alerts.mbox'), bronze_dir, tmp_path / 'raw',
+                           replay_tracker(tmp_path), workers=2)
+    assert stats == {'saved': 2, 'unmatched': 1, 'duplicates': 1, 'errors': 0}
+
+def test_replay_maildir(tmp_path):
+    box = mailbox.Maildir(tmp_path / 'maildir')
+    for eml in sorted(FIXTURES.glob('*.eml')):
+        box.add(eml.read_bytes())
+
+    stats = replay_mailbox(str(tmp_path / 'maildir'), tmp_path / 'bronze', tmp_path / 'raw',
+                           replay_tracker(tmp_path), workers=2)
+    assert stats['saved'] == 3
+
+def test_replay_archive_reparses_into_new_bronze(tmp_path):
+    build_mbox(tmp_path / 'alerts.mbox')
+    replay_mailbox(str(tmp_path / 'alerts.mbox'), tmp_path / 'bronze', tmp_path / 'raw',
+                   replay_tracker(tmp_path), workers=2)
+
+    stats = replay_archive(tmp_path / 'bronze', tmp_path / 'bronze_replay', tmp_path / 'raw', workers=2)
+    assert stats['saved'] == 3
+
+    original = {r['email_id']: r['amount'] for r in iter_bronze_records(tmp_path / 'bronze')}
+    replayed = {r['email_id']: r['amount'] for r in iter_bronze_records(tmp_path / 'bronze_replay')}
+    assert replayed == original
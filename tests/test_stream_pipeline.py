@@ -0,0 +1,95 @@
+import sys
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+sys.path.insert(0, 'src/load')
+sys.path.insert(0, 'src/pipeline')
+sys.path.insert(0, 'tests')
+import extract_transactions
+from bronze_store import iter_bronze_records
+from imap_server import LocalIMAPServer, SyntheticMailbox
+from local_extraction import point_extraction_at
+from load_to_postgres import backfill_canonical_merchants, find_new_rows, insert_rows
+from silver_store import read_silver
+from stream_pipeline import run_streaming_pipeline
+from transform_transactions import transform_transactions
+
+def test_stream_from_local_server(tmp_path, monkeypatch):
+    with LocalIMAPServer(SyntheticMailbox(40)) as server:
+        point_extraction_at(server, tmp_path, monkeypatch.setattr)
+
+        loaded = []
+        batches = extract_transactions.stream_transactions(batch_size=8, pool_size=2)
+        total_rows, total_loaded = run_streaming_pipeline(
+            batches, sink=lambda frame: loaded.append(frame) or len(frame),
+            micro_batch_size=5, silver_dir=tmp_path / 'silver',
+            cache_file=tmp_path / 'cache.json'
+        )
+
+    assert total_rows == total_loaded == 30
+    assert all(len(frame) <= 5 for frame in loaded)
+
+    #Bronze and the partitioned silver dataset hold exactly what was streamed
+    assert len(list(iter_bronze_records(tmp_path / 'bronze'))) == 30
+    silver = read_silver(tmp_path / 'silver')
+    streamed = pd.concat(loaded)
+    assert sorted(silver['merchant_name']) == sorted(streamed['merchant_name'])
+    assert silver['category'].notna().all() and silver['transaction_date'].notna().all()
+    assert 'SHELL OIL' in set(silver['canonical_merchant'])
+    assert 'email_id' not in streamed
+
+    #A batch transform afterwards finds the streamed emails already in silver
+    transform_transactions(bronze_dir=tmp_path / 'bronze', silver_dir=tmp_path / 'silver',
+                           cache_file=tmp_path / 'cache.json')
+    assert len(read_silver(tmp_path / 'silver')) == 30
+
+def sqlite_engine():
+    engine = create_engine('sqlite://')
+
+    @event.listens_for(engine, 'connect')
+    def attach_silver(dbapi_connection, _):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS silver")
+
+    return engine
+
+def test_find_new_rows_skips_loaded_transactions():
+    engine = sqlite_engine()
+    rows = pd.DataFrame({
+        'transaction_date': ['2025-01-05', '2025-01-06', '2025-03-01'],
+        'merchant_name': ['STARBUCKS', 'SHELL OIL', 'CHIPOTLE'],
+        'amount': [5.47, 45.0, 11.45],
+        'card_name': ['Discover', 'Chase', 'CapitalOne'],
+        'category': ['Dining', 'Transportation', 'Dining'],
+    })
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE silver.transactions (
+                transaction_date DATE, merchant_name TEXT, amount NUMERIC, card_name TEXT, category TEXT
+            )
+        """))
+        conn.commit()
+    first, _ = find_new_rows(rows.iloc[:2], engine)
+    insert_rows(first, engine)
+
+    new_rows, existing_count = find_new_rows(rows, engine, date_range_only=True)
+    assert existing_count == 2
+    assert list(new_rows['merchant_name']) == ['CHIPOTLE']
+
+def test_backfill_canonical_merchants():
+    engine = sqlite_engine()
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE silver.transactions (merchant_name TEXT, canonical_merchant TEXT)"))
+        conn.execute(text("""
+            INSERT INTO silver.transactions VALUES
+                ('STARBUCKS STORE 22093', NULL), ('STARBUCKS STORE 22093', NULL), ('SQ *BLUE BOTTLE #12', NULL),
+                ('SHELL OIL 57444', 'SHELL')
+        """))
+        conn.commit()
+
+    assert backfill_canonical_merchants(engine) == 2
+    assert backfill_canonical_merchants(engine) == 0
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT canonical_merchant FROM silver.transactions")).fetchall()
+    assert [row[0] for row in rows] == ['STARBUCKS', 'STARBUCKS', 'BLUE BOTTLE', 'SHELL']
@@ -0,0 +1,73 @@
+import json
+import pickle
+import sys
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+from bronze_store import BronzeWriter
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from train_categorizer import (
+    MODEL_FILE, TRAINING_STATE_FILE, compare_modes, load_trained_model, train_incremental, train_model
+)
+from transform_transactions import categorize_transactions
+
+MERCHANTS = {
+    'SAFEWAY': 'Groceries', 'WHOLEFDS MKT': 'Groceries', 'STARBUCKS STORE': 'Dining', 'CHIPOTLE': 'Dining',
+    'SHELL OIL': 'Transportation', 'UBER *TRIP': 'Transportation', 'TARGET': 'Shopping', 'SPOTIFY': 'Subscriptions',
+    'BLUE BOTTLE': 'Dining'
+}
+
+def write_bronze(bronze_dir):
+    writer = BronzeWriter(bronze_dir)
+    for i in range(20):
+        for merchant in MERCHANTS:
+            writer.append({
+                'card_name': ['Chase', 'Discover'][i % 2],
+                'merchant_name': f'{merchant} {1000 + i}',
+                'transaction_date': f'January {i + 1}, 2025',
+                'amount': 5.0 + i
+            }, f"{merchant}-{i}")
+    writer.close()
+
+def write_labels(labeled_file, merchants):
+    labeled_file.write_text(json.dumps({merchant: MERCHANTS[merchant] for merchant in merchants}))
+
+def predict(models_dir, merchant):
+    model, pipeline, _ = load_trained_model(models_dir)
+    transaction = {'merchant_name': merchant, 'amount': 4.5, 'card_name': 'Chase', 'transaction_date': 'January 3, 2025'}
+    return categorize_transactions([transaction], model, pipeline)[0]['category']
+
+def test_incremental_folds_in_new_labels(tmp_path, capsys):
+    bronze_dir, models_dir, labeled_file = tmp_path / 'bronze', tmp_path / 'models', tmp_path / 'labeled.json'
+    write_bronze(bronze_dir)
+    write_labels(labeled_file, [merchant for merchant in MERCHANTS if merchant != 'BLUE BOTTLE'])
+
+    train_model(models_dir, labeled_file, bronze_dir, tmp_path / 'cache')
+    with open(models_dir / MODEL_FILE, 'rb') as f:
+        assert isinstance(pickle.load(f), LogisticRegression)
+
+    #A full model is replaced by an online one trained on everything
+    train_incremental(models_dir, labeled_file, bronze_dir, tmp_path / 'cache')
+    model, pipeline, state = load_trained_model(models_dir)
+    assert isinstance(model, SGDClassifier)
+    assert pipeline.card_mapping == {'Chase': 0, 'Discover': 1}
+    assert 'BLUE BOTTLE' not in state['labels']
+
+    write_labels(labeled_file, MERCHANTS)
+    capsys.readouterr()
+    train_incremental(models_dir, labeled_file, bronze_dir, tmp_path / 'cache')
+    assert "Folding in 1 newly labeled merchants (20 transactions) with 80" in capsys.readouterr().out
+    assert json.loads((models_dir / TRAINING_STATE_FILE).read_text())['labels'] == MERCHANTS
+    assert predict(models_dir, 'BLUE BOTTLE #7') == 'Dining'
+    assert predict(models_dir, 'SHELL OIL 57444') == 'Transportation'
+
+    train_incremental(models_dir, labeled_file, bronze_dir, tmp_path / 'cache')
+    assert "No newly labeled merchants" in capsys.readouterr().out
+
+def test_compare_modes_reports_both(tmp_path, capsys):
+    bronze_dir, labeled_file = tmp_path / 'bronze', tmp_path / 'labeled.json'
+    write_bronze(bronze_dir)
+    write_labels(labeled_file, MERCHANTS)
+
+    compare_modes(labeled_file, bronze_dir, tmp_path / 'cache')
+    rows = capsys.readouterr().out.split("=== MODE COMPARISON")[1].splitlines()[2:]
+    assert [row.split()[0] for row in rows] == ['full', 'incremental']
@@ -0,0 +1,86 @@
+import json
+import sys
+import pytest
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+from bronze_reader import EMAIL_KEY_FIELDS, TRANSACTION_FIELDS, read_bronze
+from bronze_store import BronzeWriter
+import training_cache
+from training_cache import MANIFEST_FILE, label_rows, load_labeled_rows, training_inputs
+
+LABELS = {'SHELL OIL': 'Transportation', 'STARBUCKS STORE 10': 'Dining'}
+
+def append_bronze(bronze_dir, merchants):
+    writer = BronzeWriter(bronze_dir)
+    for i, merchant in enumerate(merchants):
+        writer.append({'card_name': None, 'merchant_name': merchant, 'transaction_date': 'January 5, 2025',
+                       'amount': 10.0 + i}, f"{merchant}-{i}")
+    writer.close()
+
+def uncached(bronze_dir, labels):
+    return label_rows(training_inputs(read_bronze(bronze_dir, fields=TRANSACTION_FIELDS + EMAIL_KEY_FIELDS)), labels)
+
+def test_cache_matches_full_scan_as_bronze_and_labels_change(tmp_path):
+    bronze_dir, cache_dir = tmp_path / 'bronze', tmp_path / 'cache'
+    append_bronze(bronze_dir, ['SHELL OIL 57444', 'STARBUCKS STORE 10', 'TARGET 00012'])
+
+    rows = load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+    assert rows.to_dict('records') == uncached(bronze_dir, LABELS).to_dict('records')
+    assert rows['canonical_merchant'].tolist() == ['SHELL OIL', 'STARBUCKS']
+    assert rows['card_name'].tolist() == ['Unknown', 'Unknown']
+
+    #New bronze is appended as its own part and labeled on its own
+    append_bronze(bronze_dir, ['SHELL OIL 11111', 'TARGET 00013'])
+    rows = load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+    assert rows.to_dict('records') == uncached(bronze_dir, LABELS).to_dict('records')
+    assert len(json.loads((cache_dir / MANIFEST_FILE).read_text())['parts']) == 2
+
+    #New labels re-label the cached rows; nothing is read from bronze
+    labels = {**LABELS, 'TARGET': 'Shopping'}
+    rows = load_labeled_rows(labels, 'b', tmp_path / 'no-bronze-here', cache_dir)
+    assert rows.to_dict('records') == uncached(bronze_dir, labels).to_dict('records')
+    assert len(rows) == 5
+
+def test_rewritten_bronze_rebuilds_cache(tmp_path):
+    bronze_dir, cache_dir = tmp_path / 'bronze', tmp_path / 'cache'
+    append_bronze(bronze_dir, ['SHELL OIL 1', 'SHELL OIL 2'])
+    assert len(load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)) == 2
+
+    segment = next((bronze_dir / 'segments').glob('*.jsonl'))
+    segment.write_text(segment.read_text().replace('SHELL OIL 2', 'TARGET 2'))
+    rows = load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+    assert rows['merchant_name'].tolist() == ['SHELL OIL 1']
+
+def test_alert_saved_twice_is_cached_once(tmp_path):
+    bronze_dir, cache_dir = tmp_path / 'bronze', tmp_path / 'cache'
+    append_bronze(bronze_dir, ['SHELL OIL 1'])
+    load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+
+    #A retried extract appends the same email again, once in a later run and once twice within it
+    writer = BronzeWriter(bronze_dir)
+    for email_id in ['SHELL OIL 1-0', 'SHELL OIL 2-0', 'SHELL OIL 2-0']:
+        writer.append({'card_name': None, 'merchant_name': email_id[:-2], 'transaction_date': 'January 5, 2025',
+                       'amount': 10.0}, email_id)
+    writer.close()
+    assert load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)['email_id'].tolist() == ['SHELL OIL 1-0', 'SHELL OIL 2-0']
+
+def test_crash_before_manifest_save_does_not_duplicate_rows(tmp_path, monkeypatch):
+    bronze_dir, cache_dir = tmp_path / 'bronze', tmp_path / 'cache'
+    append_bronze(bronze_dir, ['SHELL OIL 1'])
+    load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+    append_bronze(bronze_dir, ['SHELL OIL 2'])
+
+    def crash(manifest, cache_dir):
+        raise OSError('killed before the manifest was saved')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(training_cache, '_save_manifest', crash)
+        with pytest.raises(OSError):
+            load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+
+    #The next run reads the same bronze as new again and labels it once
+    rows = load_labeled_rows(LABELS, 'a', bronze_dir, cache_dir)
+    assert rows.to_dict('records') == uncached(bronze_dir, LABELS).to_dict('records')
+    #The crashed run's part and labeled files were unrecorded and removed
+    assert len(list(cache_dir.glob('part-*.parquet'))) == 2
+    assert len(list(cache_dir.glob('labeled-*.parquet'))) == 1
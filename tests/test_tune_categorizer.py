@@ -0,0 +1,28 @@
+import sys
+import numpy as np
+sys.path.insert(0, 'src/extract')
+sys.path.insert(0, 'src/transform')
+sys.path.insert(0, 'tests')
+from test_train_categorizer import MERCHANTS, write_bronze, write_labels
+from tune_categorizer import CURRENT_CONFIG, encode_days, search_space, tune
+
+def test_search_space_samples_around_current_config():
+    assert len(search_space(0)) == 48
+    sampled = search_space(6)
+    assert len(sampled) == 6 and sampled[0] == CURRENT_CONFIG and len(set(sampled)) == 6
+
+def test_cyclic_days_wrap_month_end():
+    encoded = encode_days(np.array([1, 16, 31]), 'cyclic').toarray()
+    assert np.linalg.norm(encoded[0] - encoded[2]) < np.linalg.norm(encoded[0] - encoded[1])
+
+def test_parallel_tune_matches_serial(tmp_path, capsys):
+    bronze_dir, labeled_file = tmp_path / 'bronze', tmp_path / 'labeled.json'
+    write_bronze(bronze_dir)
+    write_labels(labeled_file, MERCHANTS)
+
+    parallel = tune(labeled_file, bronze_dir, tmp_path / 'cache', samples=4, folds=3, workers=2)
+    serial = tune(labeled_file, bronze_dir, tmp_path / 'cache', samples=4, folds=3, workers=1)
+    assert sorted(result['config'] for result in parallel) == sorted(search_space(4))
+    assert {result['config']: result['accuracy'] for result in parallel} == \
+        {result['config']: result['accuracy'] for result in serial}
+    assert "(current)" in capsys.readouterr().out